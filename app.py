@@ -2,11 +2,11 @@ import streamlit as st
 import json
 import logging
 import traceback
-from pathlib import Path
-from pymongo import MongoClient
-from urllib.parse import quote_plus
-import importlib.util
-from database.mongodb_utils import get_collection_data_by_area
+from datetime import datetime
+from functools import partial
+from database.mongodb_utils import AREA_ROLES
+from database.area_data import get_area_data, SCREEN_AREAS, AREA_COLLECTIONS
+from database.auth import authenticate, issue_session_token, resume_session, revoke_session
 
 # Page config - DEVE SER A PRIMEIRA CHAMADA STREAMLIT
 FAVICON = "assets/premium_favicon.png"
@@ -19,82 +19,52 @@ st.set_page_config(
 )
 
 from utils.modal import show_manage_modal
+from utils.preload import run_parallel, prefetch_in_background
+from utils.write_status import show_write_status
+from utils.screen_registry import ScreenRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _start_session(user):
+    st.session_state['user'] = user['login']
+    st.session_state['user_data'] = user
+    st.session_state['authenticated'] = True
+    # O token fica só no session_state (servidor), nunca na URL do navegador
+    st.session_state['session_token'] = issue_session_token(user)
+
 # Initialize session state
 if 'user' not in st.session_state:
     st.session_state['user'] = None
     st.session_state['user_data'] = None
     st.session_state['authenticated'] = False
 
-# --- Função para obter a URI do MongoDB via st.secrets ---
-def get_mongo_uri():
-    username = st.secrets["mongodb"]["username"]
-    password = st.secrets["mongodb"]["password"]
-    cluster = st.secrets["mongodb"]["cluster"]
-    password_escaped = quote_plus(password)
-    uri = f"mongodb+srv://{username}:{password_escaped}@{cluster}/?retryWrites=true&w=majority&appName=BusinessOperationsReview"
-    return uri
-# --------------------------------------------------------
-
-# Função para buscar dados de qualquer collection do MongoDB
-def get_collection_data(collection_name):
-    try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
-        collection = db[collection_name]
-        data = list(collection.find({}, {"_id": 0}))
-        return data
-    except Exception as e:
-        logger.error(f"Erro ao carregar dados da coleção '{collection_name}': {e}")
-        st.error(f"Erro ao carregar dados da coleção '{collection_name}'.")
-        return []
-
-# Função para buscar usuários autorizados (collection 'users')
-def get_authorized_users():
+# login_user: um find_one indexado por 'login' (database.auth), sem carregar a collection 'users'
+def login_user(email: str, password: str) -> bool:
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
-        collection = db['users']
-        data = list(collection.find({}))  # Incluir _id
-        return data
+        user = authenticate(email.strip(), password)
     except Exception as e:
-        logger.error(f"Erro ao carregar usuários: {e}")
-        st.error(f"Erro ao carregar usuários.")
-        return []
-
-# login_user usando a collection 'users'
-def login_user(email: str, password: str) -> bool:
-    authorized_users = get_authorized_users()
-    user = next((u for u in authorized_users if u["login"] == email and u["password"] == password), None)
+        logger.error(f"Erro ao autenticar usuário: {e}")
+        st.error("Erro ao carregar usuários.")
+        return False
     if user:
-        st.session_state['user'] = email
-        st.session_state['user_data'] = user
-        st.session_state['authenticated'] = True
+        _start_session(user)
         # Limpar cache/modal do session_state ao fazer login
-        modal_keys = [
-            'show_manage_modal', 'modal_page', 'active_modal_tab', 'modal_open',
-            'permit_action_plans_cache', 'permit_monthly_highlights_cache', 'permit_monthly_opportunities_cache',
-            'timesheet_action_plans_cache', 'timesheet_monthly_highlights_cache', 'timesheet_monthly_opportunities_cache',
-            'accounting_action_plans_cache', 'accounting_monthly_highlights_cache', 'accounting_monthly_opportunities_cache',
-        ]
+        modal_keys = ['show_manage_modal', 'modal_page', 'active_modal_tab', 'modal_open']
         for k in modal_keys:
             if k in st.session_state:
                 del st.session_state[k]
-        # Limpar também todos os *_data_cache
+        # Limpar também todos os *_data_loaded
         for k in list(st.session_state.keys()):
-            if k.endswith('_data_cache'):
+            if k.endswith('_data_loaded'):
                 del st.session_state[k]
         return True
     return False
 
 def logout_user():
     """Clear session state and logout user, removing all user/session/cache data."""
+    revoke_session(st.session_state.get('session_token'))
     # Limpar todas as chaves do session_state, exceto as internas do Streamlit
     for k in list(st.session_state.keys()):
         if not k.startswith('_'):
@@ -169,99 +139,71 @@ def show_edit_profile_modal():
                     logger.error(f"Error updating profile: {str(e)}")
                     st.error("Error updating profile. Please try again.")
 
+def show_screen_module(screen, user_data):
+    """Importa o módulo da tela (pages.<screen>) e executa seu show_screen"""
+    try:
+        # Definir a página atual no session_state para o modal saber qual role usar
+        st.session_state['current_page'] = screen.id
+        module = __import__(screen.module, fromlist=['show_screen'])
+        if not hasattr(module, 'show_screen'):
+            raise AttributeError(f"Módulo {screen.module} não possui função show_screen")
+        
+        module.show_screen(user_data)
+    except Exception as e:
+        error_details = traceback.format_exc()
+        logger.error(f"Erro ao carregar módulo {screen.id}: {str(e)}\n{error_details}")
+        st.error(f"Erro ao carregar módulo {screen.id}: {str(e)}")
+        if st.checkbox("Mostrar detalhes do erro", key=f"show_error_details_{screen.id}"):
+            st.code(error_details)
+
 def show_main_content():
     """Display main content based on user roles and screens"""
     user_data = st.session_state['user_data']
     if not user_data:
         return
 
-    # Load available screens from JSON
-    try:
-        available_screens_data = get_collection_data("screens")
-        # Create mapping only for title->description
-        screen_mapping = {screen['title']: screen.get('description', screen['title']) for screen in available_screens_data}
-    except Exception as e:
-        logger.error(f"Erro ao carregar telas disponíveis do banco: {e}")
-        st.error("Erro ao carregar configuração de telas disponíveis.")
-        return
-
-    # Get available screens for user
-    user_screens = user_data.get('screens', [])
+    # Telas do usuário a partir do registro em memória (sem I/O na montagem das abas)
+    registry = get_screen_registry()
+    user_screens = registry.for_user(user_data)
     if not user_screens:
         st.warning("Nenhuma tela disponível para seu perfil.")
         return
 
-    # screens = ... (lista vinda do banco)
-    valid_screens = []
-    for screen in user_screens:
-        module_path = f"pages.{screen}"
-        if importlib.util.find_spec(module_path):
-            valid_screens.append(screen)
-
-    # Create tabs for available screens using descriptions from JSON
-    tab_titles = [screen_mapping.get(screen, screen) for screen in valid_screens]
-    tabs = st.tabs(tab_titles)
-    
-    # Load and display each screen's content
-    for tab, screen in zip(tabs, valid_screens):
-        with tab:
-            try:
-                # Definir a página atual no session_state para o modal saber qual role usar
-                st.session_state['current_page'] = screen
-                
-                # The screen title is now the same as the module name
-                module_name = screen
-                logger.info(f"Tentando carregar módulo: pages.{module_name}")
-                
-                # Check if module file exists
-                module_path = Path(f"pages/{module_name}.py")
-                if not module_path.exists():
-                    raise FileNotFoundError(f"Arquivo do módulo não encontrado: {module_path}")
-                
-                # Dynamically import the screen module
-                module = __import__(f"pages.{module_name}", fromlist=['show_screen'])
-                if not hasattr(module, 'show_screen'):
-                    raise AttributeError(f"Módulo {module_name} não possui função show_screen")
-                
-                module.show_screen(user_data)
-            except Exception as e:
-                error_details = traceback.format_exc()
-                logger.error(f"Erro ao carregar módulo {screen}: {str(e)}\n{error_details}")
-                st.error(f"Erro ao carregar módulo {screen}: {str(e)}")
-                if st.checkbox("Mostrar detalhes do erro", key=f"show_error_details_{screen}"):
-                    st.code(error_details)
+    screens = {screen.id: screen for screen in user_screens}
+    valid_screens = list(screens)
+    if LAZY_SCREENS:
+        # Modo lazy: só a tela ativa carrega dados e é renderizada
+        if st.session_state.get('active_screen') not in valid_screens:
+            last_screen = st.session_state.get('last_active_screen')
+            st.session_state['active_screen'] = last_screen if last_screen in valid_screens else valid_screens[0]
+        st.segmented_control(
+            "Screens",
+            options=valid_screens,
+            format_func=lambda screen: screens[screen].title,
+            key="active_screen",
+            label_visibility="collapsed"
+        )
+        active_screen = st.session_state['active_screen'] or valid_screens[0]
+        st.session_state['last_active_screen'] = active_screen
+        preload_user_data_with_progress(user_data, [active_screen])
+        prefetch_other_screens([screen for screen in valid_screens if screen != active_screen])
+        show_screen_module(screens[active_screen], user_data)
+    else:
+        # Create tabs for available screens using descriptions from JSON
+        tabs = st.tabs([screen.title for screen in user_screens])
+        for tab, screen in zip(tabs, user_screens):
+            with tab:
+                show_screen_module(screen, user_data)
     
     # Exibir o modal de gerenciamento de dados fora do loop de tabs para evitar conflitos
-    # Só abrir se o usuário clicou no botão e tem permissão
+    # Só abrir se o usuário clicou no botão e é admin da tela do modal
     if st.session_state.get('show_manage_modal', False):
         # Usar a página que foi definida quando o botão foi clicado, não a última do loop
-        modal_page = st.session_state.get('modal_page', '')
-        user_data = st.session_state.get('user_data', {})
-        
-        # Log para debug
-        print(f"DEBUG: show_manage_modal=True, modal_page={modal_page}")
-        print(f"DEBUG: user_roles={user_data.get('roles', [])}")
-        
-        # Verificar se o usuário tem permissão para a página do modal
-        has_permission = False
-        if modal_page == 'permit_control' and "permits_admin" in user_data.get("roles", []):
-            has_permission = True
-            print("DEBUG: Permissão concedida para permit_control")
-        elif modal_page == 'timesheet_analysis' and "timesheet_admin" in user_data.get("roles", []):
-            has_permission = True
-            print("DEBUG: Permissão concedida para timesheet_analysis")
-        elif modal_page == 'accounting_indicators' and "accounting_admin" in user_data.get("roles", []):
-            has_permission = True
-            print("DEBUG: Permissão concedida para accounting_indicators")
-        else:
-            print(f"DEBUG: Sem permissão - modal_page={modal_page}, roles={user_data.get('roles', [])}")
-        
-        if has_permission:
-            print("DEBUG: Abrindo modal...")
+        modal_screen = registry.get(st.session_state.get('modal_page', ''))
+        if modal_screen is not None and modal_screen.is_admin(user_data):
             show_manage_modal()
         else:
             # Resetar o flag se não tem permissão
-            print("DEBUG: Resetando flag show_manage_modal")
             st.session_state['show_manage_modal'] = False
 
 # IMPORT LOADERS DAS TELAS GOOGLE DRIVE
@@ -278,56 +220,99 @@ DATA_LOADERS = {
     # ... adicione outras telas aqui
 }
 
+# Role de administrador de cada tela (modal de gerenciamento e controles de admin)
+SCREEN_ADMIN_ROLES = {
+    **{screen: AREA_ROLES[area] for screen, area in SCREEN_AREAS.items()},
+    "it_projects": "ti_admin",
+}
+
+@st.cache_resource(show_spinner=False)
+def get_screen_registry():
+    """Registro de telas compartilhado pelo processo (módulo, título, loader, role de admin)"""
+    return ScreenRegistry(loaders=DATA_LOADERS, admin_roles=SCREEN_ADMIN_ROLES)
+
+# Timeout (segundos) de cada fonte no preload
+PRELOAD_TIMEOUTS = {
+    "sheet": 90,
+    "mongo": 20,
+}
+
+# Modo lazy: só a tela ativa é carregada/renderizada; as demais carregam na primeira abertura
+LAZY_SCREENS = st.secrets.get("app", {}).get("lazy_screens", True)
+# Pré-carrega em segundo plano as telas ainda não abertas (apenas no modo lazy)
+PREFETCH_SCREENS = st.secrets.get("app", {}).get("prefetch_screens", True)
+
+def screen_preload_tasks(screen):
+    """Tarefas de carga de uma tela: loader do registro de telas + barra lateral do ano corrente"""
+    tasks = {}
+    registered = get_screen_registry().get(screen)
+    if registered is not None and registered.loader:
+        # Com raise_errors o erro de carga chega ao preload em vez de um DataFrame vazio
+        tasks[screen] = (partial(registered.loader, raise_errors=True), PRELOAD_TIMEOUTS["sheet"])
+    area = SCREEN_AREAS.get(screen)
+    if area:
+        area_data = get_area_data(area)
+        for collection_name in AREA_COLLECTIONS:
+            tasks[f"{area}:{collection_name}"] = (
+                partial(area_data.period, collection_name, datetime.now().year),
+                PRELOAD_TIMEOUTS["mongo"],
+            )
+    return tasks
+
 # Função para pré-carregar dados das telas permitidas com barra de progresso
+# Planilhas e coleções do MongoDB das telas são buscadas em paralelo
 
-def preload_user_data_with_progress(user_data):
-    user_screens = user_data.get('screens', [])
-    total = len(user_screens)
-    if total == 0:
+def preload_user_data_with_progress(user_data, screens=None):
+    user_screens = screens if screens is not None else user_data.get('screens', [])
+    pending_screens = [screen for screen in user_screens if f"{screen}_data_loaded" not in st.session_state]
+    if not pending_screens:
+        return
+    tasks = {}
+    for screen in pending_screens:
+        tasks.update(screen_preload_tasks(screen))
+    if not tasks:
         return
+
     progress_bar = st.progress(0, text="Carregando dados das telas...")
-    for idx, screen in enumerate(user_screens):
-        loader = DATA_LOADERS.get(screen)
-        cache_key = f"{screen}_data_cache"
-        if loader and cache_key not in st.session_state:
-            try:
-                # Para timesheet_analysis, são dois DataFrames
-                if screen == "timesheet_analysis":
-                    df_t1, df_t2 = loader()
-                    st.session_state[cache_key] = (df_t1, df_t2)
-                else:
-                    st.session_state[cache_key] = loader()
-            except Exception as e:
-                st.warning(f"Erro ao carregar dados da tela {screen}: {e}")
-        # Carregar dados do MongoDB para cada tela
-        if screen == "accounting_indicators":
-            area = "accounting"
-        elif screen == "timesheet_analysis":
-            area = "timesheet"
-        elif screen == "permit_control":
-            area = "permit"
+    def on_progress(done, total, name, error):
+        progress_bar.progress(done / total, text=f"Carregando dados: {name} ({done}/{total})")
+
+    results = run_parallel(tasks, on_progress=on_progress)
+    for screen in pending_screens:
+        if screen not in results:
+            continue
+        _, error = results[screen]
+        if error is not None:
+            st.warning(f"Erro ao carregar dados da tela {screen}: {error}")
         else:
-            area = None
-        if area:
-            # Action Plans
-            ap_key = f"{screen.split('_')[0]}_action_plans_cache"
-            if ap_key not in st.session_state:
-                st.session_state[ap_key] = get_collection_data_by_area('action_plans', area_filter=area)
-            # Monthly Highlights
-            mh_key = f"{screen.split('_')[0]}_monthly_highlights_cache"
-            if mh_key not in st.session_state:
-                st.session_state[mh_key] = get_collection_data_by_area('monthly_highlights', include_id=True, area_filter=area)
-            # Monthly Opportunities
-            mo_key = f"{screen.split('_')[0]}_monthly_opportunities_cache"
-            if mo_key not in st.session_state:
-                st.session_state[mo_key] = get_collection_data_by_area('monthly_opportunities', include_id=True, area_filter=area)
-        progress_bar.progress((idx + 1) / total, text=f"Carregando dados: {screen} ({idx+1}/{total})")
+            # Os dados ficam no dataset_store do processo; a sessão guarda só a marca
+            st.session_state[f"{screen}_data_loaded"] = True
     progress_bar.empty()
 
+def prefetch_other_screens(screens):
+    """Aquece em segundo plano os caches de processo das telas ainda não abertas"""
+    if not PREFETCH_SCREENS:
+        return
+    prefetched = st.session_state.setdefault('prefetched_screens', set())
+    tasks = {}
+    for screen in screens:
+        if screen in prefetched or f"{screen}_data_loaded" in st.session_state:
+            continue
+        prefetched.add(screen)
+        tasks.update(screen_preload_tasks(screen))
+    prefetch_in_background(tasks)
+
+# Sessão expirada ou revogada: volta para o login
+if st.session_state['authenticated'] and resume_session(st.session_state.get('session_token')) is None:
+    logout_user()
+    st.rerun()
+
 # Main application flow
 if not st.session_state['authenticated']:
     show_login()
 else:
     show_header()
-    preload_user_data_with_progress(st.session_state['user_data'])
-    show_main_content()
\ No newline at end of file
+    show_write_status()
+    if not LAZY_SCREENS:
+        preload_user_data_with_progress(st.session_state['user_data'])
+    show_main_content()
@@ -0,0 +1,73 @@
+"""
+Benchmark local: memória e tempo de filtros/agrupamentos com o schema tipado.
+
+Compara a aba sintética da T1 do timesheet lida "crua" (colunas object, float64)
+com a mesma aba após SCHEMA_T1.apply (categoricals, numéricos reduzidos), medindo
+o uso de memória e o tempo de isin/groupby como os das páginas e de filtrar_dados_*.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_dtypes.py
+    python benchmarks/bench_dtypes.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.schema import memory_usage
+from database.database_timesheet_analysis import SCHEMA_T1, T1_NUMERIC_COLUMNS
+from database.ingestion import values_to_frame
+from bench_ingestion import synthetic_sheet
+
+REPEAT = 20
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def operations(df, observed):
+    teams = ["Framing", "Roofing"]
+    return {
+        "isin team_t1": lambda: df[df["team_t1"].isin(teams)],
+        "== corporation_t1": lambda: df[df["corporation_t1"] == "Corp A"],
+        "groupby team_t1": lambda: df.groupby("team_t1", observed=observed).agg(
+            Error_Count=("team_t1", "count"),
+            Added_Value=("add_value_t1", "sum"),
+            Removed_Value=("remove_value_t1", "sum"),
+        ),
+        "groupby month": lambda: df.groupby("month").size(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    sheet = synthetic_sheet(args.rows)
+    raw = values_to_frame([list(sheet.columns)] + sheet.astype(object).values.tolist(), T1_NUMERIC_COLUMNS)
+    raw = raw.rename(columns=SCHEMA_T1.renames)
+    raw["date_t1"] = pd.to_datetime(raw["date_t1"], format="%m/%d/%Y")
+    raw["year"] = raw["date_t1"].dt.year.astype(int)
+    raw["month"] = raw["date_t1"].dt.month.astype(int)
+    typed = SCHEMA_T1.apply(sheet)
+
+    print(f"{args.rows} linhas")
+    print(f"  memória object : {memory_usage(raw) / 2**20:8.1f} MiB")
+    print(f"  memória tipada : {memory_usage(typed) / 2**20:8.1f} MiB")
+    raw_ops = operations(raw, observed=False)
+    typed_ops = operations(typed, observed=True)
+    for name in raw_ops:
+        print(f"  {name:<18} object {timed(raw_ops[name]):8.2f} ms | tipado {timed(typed_ops[name]):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark local: custo de um acerto de cache dos filtros por tamanho do dataset.
+
+Compara o custo de montar a chave de cache como o st.cache_data faz (hash do
+DataFrame inteiro, aproximado por pd.util.hash_pandas_object) com um acerto do
+DatasetStore.memoized (fingerprint do dataset + tupla de filtros), para a aba
+sintética da T1 do timesheet já tipada.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_filter_cache.py
+    python benchmarks/bench_filter_cache.py --rows 10000,1000000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.snapshot_store import SNAPSHOT_DIR_ENV
+from database.dataset_store import DatasetStore
+from database.filter_index import FilterIndex
+from database.database_timesheet_analysis import SCHEMA_T1
+from bench_ingestion import synthetic_sheet
+
+REPEAT = 1000
+
+
+def run(rows):
+    # Snapshots do benchmark ficam fora do diretório do app (um diretório por tamanho)
+    os.environ[SNAPSHOT_DIR_ENV] = tempfile.mkdtemp(prefix="bench-snapshots-")
+    store = DatasetStore()
+    typed = SCHEMA_T1.apply(synthetic_sheet(rows))
+    store.register("bench", lambda previous: typed, ttl=3600)
+
+    @store.memoized("bench")
+    def filtrar(ano=None, mes=None, teams=None):
+        index = store.derived("bench", "filter_index", lambda df: FilterIndex(df, ["team_t1"]))
+        return index.select(year=ano, month=mes, isin={"team_t1": teams})
+
+    filters = dict(ano=2024, mes=3, teams=["Framing", "Roofing"])
+    start = time.perf_counter()
+    filtrar(**filters)
+    miss_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        filtrar(**filters)
+    hit_us = (time.perf_counter() - start) / REPEAT * 1e6
+
+    start = time.perf_counter()
+    pd.util.hash_pandas_object(typed).sum()
+    hash_ms = (time.perf_counter() - start) * 1000
+
+    stats = filtrar.cache.stats()
+    print(f"{rows:>9} linhas | miss {miss_ms:8.2f} ms | hit {hit_us:8.2f} µs | hash do DataFrame {hash_ms:8.2f} ms | {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,100000,1000000", help="tamanhos separados por vírgula")
+    args = parser.parse_args()
+    for rows in (int(r) for r in args.rows.split(",")):
+        run(rows)
+
+
+if __name__ == "__main__":
+    main()
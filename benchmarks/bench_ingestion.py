@@ -0,0 +1,100 @@
+"""
+Benchmark local: tempo de parse e pico de memória de cada backend de ingestão.
+
+Gera uma aba sintética no formato da T1 do timesheet (10k, 100k e 1M linhas),
+grava como CSV e XLSX em um diretório temporário e mede cada backend de
+database.ingestion lendo o arquivo local (sem rede). O backend values_api é
+medido a partir dos arrays crus que o gspread devolveria.
+
+Uso (na raiz do repositório; calamine requer `pip install python-calamine`):
+    python benchmarks/bench_ingestion.py
+    python benchmarks/bench_ingestion.py --rows 10000,100000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from database import ingestion
+from database.database_timesheet_analysis import T1_TEXT_COLUMNS, T1_NUMERIC_COLUMNS
+
+DEFAULT_ROWS = "10000,100000,1000000"
+
+
+def synthetic_sheet(rows, seed=42):
+    """DataFrame com os valores como aparecem na exportação (datas e moeda formatadas)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D")
+    add_hours = rng.integers(0, 10, rows)
+    payrate = rng.choice([18.0, 22.5, 25.0, 30.0], rows)
+    add_value = add_hours * payrate
+    remove_value = rng.integers(0, 5, rows) * payrate
+    return pd.DataFrame({
+        "Date": dates.strftime("%m/%d/%Y"),
+        "Nome": rng.choice([f"Employee {i}" for i in range(200)], rows),
+        "Error": rng.choice(["Late", "Missing punch", "Overtime", "Other"], rows),
+        "Team": rng.choice(["Framing", "Siding", "Roofing", "Drywall"], rows),
+        "Corporation": rng.choice(["Corp A", "Corp B", "Corp C"], rows),
+        "Payrate": payrate,
+        "Add time/hour": add_hours,
+        "Remove time/hour": rng.integers(0, 5, rows),
+        "ADD $": [f"${v:,.2f}" for v in add_value],
+        "REMOVE $": [f"${v:,.2f}" for v in remove_value],
+        "TOTAL": [f"${v:,.2f}" for v in add_value - remove_value],
+    })
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def run(rows, workdir):
+    sheet = synthetic_sheet(rows)
+    csv_path = os.path.join(workdir, f"sheet_{rows}.csv")
+    xlsx_path = os.path.join(workdir, f"sheet_{rows}.xlsx")
+    sheet.to_csv(csv_path, index=False)
+    sheet.to_excel(xlsx_path, index=False, engine="xlsxwriter")
+    values = [list(sheet.columns)] + sheet.astype(object).values.tolist()
+
+    backends = {
+        "csv": lambda: ingestion._read_csv(csv_path, T1_TEXT_COLUMNS, T1_NUMERIC_COLUMNS),
+        "values_api": lambda: ingestion.values_to_frame(values, T1_NUMERIC_COLUMNS),
+    }
+    if ingestion.FILE_BACKENDS["calamine"][3]():
+        backends["calamine"] = lambda: ingestion._read_calamine(xlsx_path, T1_TEXT_COLUMNS, T1_NUMERIC_COLUMNS)
+    backends["openpyxl"] = lambda: ingestion._read_openpyxl(xlsx_path, T1_TEXT_COLUMNS, T1_NUMERIC_COLUMNS)
+
+    for name, fn in backends.items():
+        try:
+            df, elapsed, peak = measure(fn)
+        except Exception as e:
+            print(f"{rows:>9} linhas | {name:<10} | falhou: {e}")
+            continue
+        assert len(df) == rows, f"{name} leu {len(df)} linhas"
+        print(f"{rows:>9} linhas | {name:<10} | {elapsed:8.2f}s | pico {peak / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="tamanhos separados por vírgula")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in (int(r) for r in args.rows.split(",")):
+            run(rows, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark local: quantos MongoClient são construídos por renderização de página.
+
+Substitui o MongoClient de database.mongodb_utils por um mongomock em memória que
+conta as construções e reproduz a sequência de chamadas de um render do
+timesheet_analysis (preload + show_screen + sidebar).
+
+Uso (na raiz do repositório, requer `pip install mongomock`):
+    python benchmarks/bench_mongo_clients.py
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+from mongomock.store import ServerStore
+from bson import ObjectId
+
+from database import mongodb_utils
+
+RENDERS = 20
+
+_store = ServerStore()
+
+
+class CountingClient(mongomock.MongoClient):
+    constructions = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingClient.constructions += 1
+        super().__init__(_store=_store)
+
+
+def seed(db):
+    admin_id = ObjectId()
+    db['users'].insert_one({'_id': admin_id, 'name': 'Admin', 'login': 'admin@example.com', 'roles': ['timesheet_admin']})
+    for month in range(1, 13):
+        db['monthly_highlights'].insert_one({'user_id': admin_id, 'area': 'timesheet', 'year': 2025, 'month': month, 'positive': [], 'negative': []})
+        db['monthly_opportunities'].insert_one({'user_id': admin_id, 'area': 'timesheet', 'year': 2025, 'month': month, 'opportunity_list': []})
+        db['action_plans'].insert_one({'user_id': admin_id, 'area': 'timesheet', 'created_at': datetime(2025, month, 1), 'subplans': []})
+
+
+def render_page():
+    """Reproduz as chamadas ao MongoDB de um render do timesheet_analysis."""
+    for collection_name in ('action_plans', 'monthly_highlights', 'monthly_opportunities'):
+        mongodb_utils.get_collection_data_by_area(collection_name, include_id=True, area_filter='timesheet')
+    highlights = mongodb_utils.get_collection_data_by_area('monthly_highlights', include_id=True, area_filter='timesheet')
+    mongodb_utils.get_user_names([h['user_id'] for h in highlights])
+
+
+def main():
+    mongodb_utils.MongoClient = CountingClient
+    mongodb_utils.get_mongo_client.clear()
+    seed(mongodb_utils.get_database())
+    CountingClient.constructions = 0
+
+    start = time.perf_counter()
+    for _ in range(RENDERS):
+        render_page()
+    elapsed = time.perf_counter() - start
+
+    print(f"renders: {RENDERS}")
+    print(f"MongoClient construídos: {CountingClient.constructions}")
+    print(f"clientes por render: {CountingClient.constructions / RENDERS:.2f}")
+    print(f"tempo médio por render: {elapsed / RENDERS * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
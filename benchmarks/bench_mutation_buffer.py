@@ -0,0 +1,149 @@
+"""
+Benchmark local: chamadas à API para 100 escritas, uma a uma x MutationBuffer.
+
+Usa uma aba falsa em memória (sem rede) que conta as chamadas e simula a
+latência de ida e volta de cada uma. O mesmo lote de escritas (appends, edições
+e remoções) é gravado chamada a chamada, como os writers faziam, e pelo
+database.mutation_buffer; ao final o conteúdo das duas abas é comparado.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_mutation_buffer.py
+    python benchmarks/bench_mutation_buffer.py --writes 100 --latency 150
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mutation_buffer import MutationBuffer
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def batch_update(self, body):
+        self.worksheet._round_trip()
+        for request in sorted(body["requests"], key=lambda r: -r["deleteDimension"]["range"]["startIndex"]):
+            del self.worksheet.rows[request["deleteDimension"]["range"]["startIndex"]]
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def values_append(self, range, params=None, body=None):
+        self.worksheet._round_trip()
+        rows = [list(values) for values in body["values"]]
+        self.worksheet.rows.extend(rows)
+        response = self.worksheet._appended(len(rows))
+        response["updates"]["updatedData"] = {"values": rows}
+        return response
+
+
+class FakeWorksheet:
+    """Aba em memória com a parte da API do gspread usada pelos writers"""
+
+    def __init__(self, rows, latency):
+        self.id = 0
+        self.title = "Sheet1"
+        self.rows = [["A", "B", "C"]] + [list(row) for row in rows]
+        self.latency = latency
+        self.calls = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def _round_trip(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def _appended(self, count):
+        first = len(self.rows) - count + 1
+        return {"updates": {"updatedRange": f"Sheet1!A{first}:C{len(self.rows)}"}}
+
+    def append_row(self, values, value_input_option=None):
+        self._round_trip()
+        self.rows.append(list(values))
+        return self._appended(1)
+
+    def append_rows(self, rows, value_input_option=None):
+        self._round_trip()
+        self.rows.extend(list(values) for values in rows)
+        return self._appended(len(rows))
+
+    def update(self, range_name, values, value_input_option=None):
+        self._round_trip()
+        self._write(range_name, values[0])
+
+    def batch_update(self, data, value_input_option=None):
+        self._round_trip()
+        for item in data:
+            self._write(item["range"], item["values"][0])
+
+    def delete_rows(self, start_index, end_index=None):
+        self._round_trip()
+        del self.rows[start_index - 1:(end_index or start_index)]
+
+    def _write(self, range_name, values):
+        row = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        self.rows[row - 1] = list(values)
+
+
+def workload(writes, existing, seed=7):
+    """Lote de escritas com as linhas na numeração de antes do lote (como no MutationBuffer)"""
+    rng = random.Random(seed)
+    updates = sorted(rng.sample(range(2, existing + 2), writes // 5))
+    deletes = sorted(rng.sample([r for r in range(2, existing + 2) if r not in updates], writes // 10), reverse=True)
+    appends = writes - len(updates) - len(deletes)
+    return (
+        [("update", row, [f"u{row}", row, "x"]) for row in updates]
+        + [("delete", row, None) for row in deletes]
+        + [("append", None, [f"n{i}", i, "y"]) for i in range(appends)]
+    )
+
+
+def run(writes, latency):
+    existing = [[f"r{i}", i, "z"] for i in range(500)]
+    batch = workload(writes, len(existing))
+
+    # Uma chamada por escrita, na ordem em que o buffer as aplica
+    direct = FakeWorksheet(existing, latency)
+    start = time.perf_counter()
+    for kind, row, values in batch:
+        if kind == "update":
+            direct.update(f"A{row}:C{row}", [values])
+        elif kind == "delete":
+            direct.delete_rows(row)
+        else:
+            direct.append_row(values)
+    direct_ms = (time.perf_counter() - start) * 1000
+
+    buffered = FakeWorksheet(existing, latency)
+    buffer = MutationBuffer(lambda gid: buffered, max_writes=writes + 1, max_delay=None)
+    start = time.perf_counter()
+    pending = []
+    for kind, row, values in batch:
+        if kind == "update":
+            pending.append(buffer.update("bench", row, values))
+        elif kind == "delete":
+            pending.append(buffer.delete("bench", row))
+        else:
+            pending.append(buffer.append("bench", values))
+    buffer.commit()
+    buffered_ms = (time.perf_counter() - start) * 1000
+
+    ok = sum(1 for write in pending if write.ok)
+    print(f"{writes} escritas | uma a uma: {direct.calls:4d} chamadas, {direct_ms:8.1f} ms"
+          f" | buffer: {buffered.calls:4d} chamadas, {buffered_ms:8.1f} ms"
+          f" | {ok}/{len(pending)} ok | conteúdo igual: {direct.rows == buffered.rows}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=100, help="número de escritas do lote")
+    parser.add_argument("--latency", type=float, default=50, help="latência simulada por chamada (ms)")
+    args = parser.parse_args()
+    run(args.writes, args.latency / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import pandas as pd
+
+PERIOD_KEYS = ["year", "month", "day"]
+
+class AggregateCube:
+    """
+    Cubo de agregados de um dataset: uma linha por combinação de
+    (year, month, day, dimensões) com a contagem de linhas e a soma das medidas.
+
+    É construído uma vez por versão do dataset; gráficos e tabelas viram fatias
+    do cubo (poucas centenas de linhas) em vez de groupby sobre os dados crus.
+    As instâncias são imutáveis: extended()/patched() devolvem um novo cubo, para
+    que sessões que ainda usam a versão anterior não vejam dados pela metade.
+
+    Args:
+        df: DataFrame tipado (com year/month)
+        date_column: coluna de data que fornece o dia
+        dimensions: colunas de dimensão
+        measures: colunas numéricas somadas
+    """
+
+    def __init__(self, df, date_column, dimensions, measures=()):
+        self.date_column = date_column
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.keys = PERIOD_KEYS + self.dimensions
+        self.rows = len(df)
+        self.table = self._aggregate(df)
+
+    def _aggregate(self, df, sign=1):
+        frame = pd.DataFrame({
+            "year": df["year"].astype(int),
+            "month": df["month"].astype(int),
+            "day": df[self.date_column].dt.day.astype(int),
+            **{column: df[column] for column in self.dimensions},
+            **{column: df[column].astype(float) * sign for column in self.measures},
+            "count": sign,
+        })
+        table = frame.groupby(self.keys, dropna=False, observed=True, sort=False).sum().reset_index()
+        # O cubo é pequeno: dimensões como object evitam conflitos de dicionário ao combinar cubos
+        for column in self.dimensions:
+            table[column] = table[column].astype(object)
+        return table
+
+    def _combined(self, tables, rows):
+        table = pd.concat(tables, ignore_index=True)
+        table = table.groupby(self.keys, dropna=False, sort=False).sum().reset_index()
+        cube = object.__new__(AggregateCube)
+        cube.date_column = self.date_column
+        cube.dimensions = self.dimensions
+        cube.measures = self.measures
+        cube.keys = self.keys
+        cube.rows = rows
+        cube.table = table[table["count"] != 0].reset_index(drop=True)
+        return cube
+
+    def extended(self, df):
+        """Novo cubo incluindo as linhas de df a partir da posição self.rows (carga só com linhas novas)"""
+        appended = df.iloc[self.rows:]
+        if appended.empty:
+            return self
+        return self._combined([self.table, self._aggregate(appended)], len(df))
+
+    def patched(self, added=None, removed=None, rows=None):
+        """Novo cubo somando as linhas added e subtraindo as linhas removed"""
+        tables = [self.table]
+        if added is not None and len(added):
+            tables.append(self._aggregate(added))
+        if removed is not None and len(removed):
+            tables.append(self._aggregate(removed, sign=-1))
+        return self._combined(tables, self.rows if rows is None else rows)
+
+    def select(self, year=None, month=None, equals=None, isin=None):
+        """Linhas do cubo que atendem aos filtros (mesma semântica de FilterIndex)"""
+        mask = pd.Series(True, index=self.table.index)
+        if year:
+            mask &= self.table["year"] == year
+        if month:
+            mask &= self.table["month"] == month
+        for column, value in (equals or {}).items():
+            if value is not None:
+                mask &= self.table[column] == value
+        for column, values in (isin or {}).items():
+            if values:
+                mask &= self.table[column].isin(values)
+        return self.table[mask]
+
+    def rollup(self, by, year=None, month=None, equals=None, isin=None):
+        """
+        Agrega a fatia filtrada pelas colunas by (linhas com dimensão vazia ficam
+        de fora, como no groupby do pandas), devolvendo count e as medidas.
+        """
+        selected = self.select(year, month, equals, isin)
+        return selected.groupby(by, as_index=False)[["count"] + self.measures].sum()
+
+    def totals(self, year=None, month=None, equals=None, isin=None):
+        """Series com count e a soma de cada medida na fatia filtrada"""
+        return self.select(year, month, equals, isin)[["count"] + self.measures].sum()
+
+def with_date(frame, name="Date"):
+    """Monta a coluna de data a partir de year/month/day de um rollup"""
+    return frame.assign(**{name: pd.to_datetime(frame[PERIOD_KEYS])})
@@ -0,0 +1,177 @@
+import threading
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from database.mongodb_utils import (
+    find_by_period,
+    get_collection_data_by_area,
+    insert_document,
+    update_document,
+    delete_document,
+)
+from database.write_queue import write_queue
+from utils.cache import TTLCache
+
+# Área de cada página (usada pelo modal e pelo preload)
+SCREEN_AREAS = {
+    'timesheet_analysis': 'timesheet',
+    'permit_control': 'permit',
+    'accounting_indicators': 'accounting',
+}
+
+AREA_COLLECTIONS = ('monthly_highlights', 'monthly_opportunities', 'action_plans')
+
+# Segurança para escritas feitas por outros processos
+AREA_CACHE_TTL = 300
+
+# AreaData de cada área (também usado pelos workers do write_queue, fora do script)
+_AREAS = {}
+_AREAS_LOCK = threading.Lock()
+
+def _matches(document, filter_query):
+    """Filtro de igualdade simples do modal (_id ou year/month/user_id), comparando como texto"""
+    return all(str(document.get(key)) == str(value) for key, value in filter_query.items())
+
+def _in_period(collection_name, document, year, month):
+    if collection_name == 'action_plans':
+        created_at = document.get('created_at')
+        return hasattr(created_at, 'year') and created_at.year == year and (not month or created_at.month == month)
+    return document.get('year') == year and (not month or document.get('month') == month)
+
+class AreaData:
+    """
+    Acesso aos dados de uma área (highlights, opportunities e action plans).
+
+    As leituras são servidas de um cache versionado compartilhado entre sessões;
+    as escritas feitas pelos métodos insert/update/delete incrementam a versão,
+    e só então as próximas leituras voltam ao MongoDB.
+    """
+
+    def __init__(self, area):
+        self.area = area
+        self.version = 0
+        self._cache = TTLCache(maxsize=256, ttl=AREA_CACHE_TTL)
+        self._lock = threading.Lock()
+        # Escritas enfileiradas ainda não gravadas: {job_id: (coleção, tipo, filtro, documento)}
+        self._pending = {}
+
+    def _cached(self, key, fetch):
+        version = self.version
+        data = self._cache.get((version,) + key)
+        if data is None:
+            data = fetch()
+            # Descarta o resultado se houve uma escrita durante a consulta
+            if version == self.version:
+                self._cache.set((version,) + key, data)
+        return data
+
+    def _overlay(self, collection_name, documents, period=None):
+        """Aplica as escritas pendentes (atualização otimista) sobre o resultado em cache"""
+        pending = [p for p in list(self._pending.values()) if p[0] == collection_name]
+        if not pending:
+            return documents
+        documents = list(documents)
+        for _, kind, filter_query, document in pending:
+            if kind == 'insert':
+                if period is None or _in_period(collection_name, document, *period):
+                    documents.append(document)
+            elif kind == 'update':
+                documents = [{**d, **document} if _matches(d, filter_query) else d for d in documents]
+            else:
+                documents = [d for d in documents if not _matches(d, filter_query)]
+        return documents
+
+    def period(self, collection_name, year, month=None):
+        """Documentos do ano/mês (month 0/None = ano completo), com a projeção da barra lateral"""
+        year = int(year)
+        month = int(month) if month else 0
+        documents = self._cached(
+            ('period', collection_name, year, month),
+            lambda: find_by_period(collection_name, self.area, year, month)
+        )
+        return self._overlay(collection_name, documents, (year, month))
+
+    def sidebar(self, year, month=None):
+        """Retorna (highlights, opportunities, action_plans) do período"""
+        return (
+            self.period('monthly_highlights', year, month),
+            self.period('monthly_opportunities', year, month),
+            self.period('action_plans', year, month),
+        )
+
+    def all_documents(self, collection_name):
+        """Todos os documentos da área, com _id (usado pelo modal de gerenciamento)"""
+        documents = self._cached(
+            ('all', collection_name),
+            lambda: get_collection_data_by_area(collection_name, include_id=True, area_filter=self.area)
+        )
+        return self._overlay(collection_name, documents)
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+        self._cache.invalidate()
+
+    def insert(self, collection_name, document):
+        result = insert_document(collection_name, document)
+        self.invalidate()
+        return result
+
+    def update(self, collection_name, filter_query, update_fields):
+        result = update_document(collection_name, filter_query, update_fields)
+        self.invalidate()
+        return result
+
+    def delete(self, collection_name, filter_query):
+        result = delete_document(collection_name, filter_query)
+        self.invalidate()
+        return result
+
+    def submit(self, kind, collection_name, *args, label=None, owner=None):
+        """
+        Versão não bloqueante de insert/update/delete: a escrita vai para o
+        write_queue e as leituras já a refletem (otimista) até ela terminar.
+
+        Args:
+            kind: 'insert' (document), 'update' (filter_query, update_fields) ou 'delete' (filter_query)
+            label: texto das notificações; owner: sessão notificada
+        """
+        if kind == 'insert':
+            # _id definido antes de enfileirar: uma nova tentativa ou a releitura do
+            # journal repete o mesmo documento em vez de criar uma duplicata
+            args = ({**args[0], '_id': args[0].get('_id') or ObjectId()},) + args[1:]
+        filter_query, document = (None, args[0]) if kind == 'insert' else (args[0], args[1] if kind == 'update' else None)
+        job = write_queue.submit(f"area.{kind}", f"mongo:{collection_name}", self.area, collection_name, *args, label=label, owner=owner)
+        with self._lock:
+            self._pending[job.id] = (collection_name, kind, filter_query, document)
+        return job
+
+    def _finish(self, job):
+        # Invalida antes de remover a escrita otimista: a próxima leitura já vem do banco
+        self.invalidate()
+        with self._lock:
+            self._pending.pop(job.id, None)
+
+def get_area_data(area):
+    """Retorna o AreaData da área, compartilhado por todo o processo"""
+    with _AREAS_LOCK:
+        if area not in _AREAS:
+            _AREAS[area] = AreaData(area)
+        return _AREAS[area]
+
+def _on_write_finished(job):
+    if job.op.startswith('area.'):
+        get_area_data(job.args[0])._finish(job)
+
+def _insert(area, collection_name, document):
+    try:
+        return insert_document(collection_name, document, raise_errors=True) is not None
+    except DuplicateKeyError as e:
+        # _id já gravado por uma tentativa anterior (timeout após o insert) ou antes de um restart
+        if '_id' in (e.details or {}).get('keyPattern', {}):
+            return True
+        raise
+
+write_queue.listen(_on_write_finished)
+write_queue.register('area.insert', _insert)
+write_queue.register('area.update', lambda area, collection_name, filter_query, update_fields: update_document(collection_name, filter_query, update_fields, raise_errors=True) or True)
+write_queue.register('area.delete', lambda area, collection_name, filter_query: delete_document(collection_name, filter_query, raise_errors=True) or True)
@@ -0,0 +1,187 @@
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+import streamlit as st
+from bson import ObjectId
+from database.mongodb_utils import get_database
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Configuráveis em st.secrets["auth"]
+DEFAULT_PBKDF2_ITERATIONS = 310000
+DEFAULT_SESSION_TTL_HOURS = 12
+
+HASH_PREFIX = "pbkdf2_sha256"
+
+# Campos do usuário carregados no login (a senha nunca vai para o session_state)
+USER_PROJECTION = {"login": 1, "name": 1, "roles": 1, "screens": 1}
+
+# Tokens revogados (token -> exp); removidos depois que expiram, pois aí já são recusados.
+# Os tokens só vivem no session_state, então não sobrevivem a um restart e a lista
+# do processo basta
+_revoked = {}
+_revoked_lock = threading.Lock()
+_process_secret = secrets.token_bytes(32)
+
+def _config():
+    return st.secrets.get("auth", {})
+
+def pbkdf2_iterations():
+    return int(_config().get("pbkdf2_iterations", DEFAULT_PBKDF2_ITERATIONS))
+
+def session_ttl_hours():
+    return float(_config().get("session_ttl_hours", DEFAULT_SESSION_TTL_HOURS))
+
+@st.cache_resource(show_spinner=False)
+def _session_cache():
+    """Sessões válidas (token -> usuário) compartilhadas pelo processo, com o mesmo prazo do exp dos tokens"""
+    return TTLCache(maxsize=4096, ttl=session_ttl_hours() * 3600)
+
+def _session_secret():
+    # Sem segredo configurado, os tokens valem só enquanto o processo estiver no ar
+    secret = _config().get("session_secret")
+    return secret.encode("utf-8") if secret else _process_secret
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def hash_password(password, iterations=None):
+    """Hash PBKDF2-SHA256 com salt aleatório: 'pbkdf2_sha256$iterações$salt$hash'"""
+    iterations = iterations or pbkdf2_iterations()
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_PREFIX}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+def verify_password(password, stored):
+    """
+    Confere a senha com o valor armazenado.
+
+    Returns:
+        (confere, precisa_regravar): precisa_regravar é True para senhas legadas
+        em texto puro ou com custo menor que o configurado
+    """
+    if not stored or password is None:
+        return False, False
+    if not stored.startswith(HASH_PREFIX + "$"):
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _b64decode(salt), int(iterations))
+    except Exception:
+        return False, False
+    return hmac.compare_digest(digest, _b64decode(expected)), int(iterations) < pbkdf2_iterations()
+
+@st.cache_resource(show_spinner=False)
+def ensure_user_indexes():
+    """Garante o índice único de 'login' uma única vez por processo"""
+    try:
+        get_database()['users'].create_index("login", unique=True)
+        return True
+    except Exception as e:
+        logger.warning(f"Não foi possível criar o índice único de login: {e}")
+        return False
+
+def authenticate(login, password):
+    """
+    Busca o usuário pelo índice de 'login' (um find_one com projeção) e confere a
+    senha. Senhas legadas são regravadas com hash no primeiro login bem-sucedido.
+
+    Returns:
+        documento do usuário (sem a senha) ou None
+    """
+    if not login or not password:
+        return None
+    ensure_user_indexes()
+    users = get_database()['users']
+    user = users.find_one({"login": login}, {**USER_PROJECTION, "password": 1})
+    if user is None:
+        # Custo equivalente ao de uma senha errada, para não revelar logins existentes
+        hash_password(password)
+        return None
+    ok, needs_upgrade = verify_password(password, user.pop("password", None))
+    if not ok:
+        return None
+    if needs_upgrade:
+        try:
+            users.update_one({"_id": user["_id"]}, {"$set": {"password": hash_password(password)}})
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar o hash de senha de {login}: {e}")
+    return user
+
+def set_password(user_id, password):
+    """Grava uma nova senha (com hash) para o usuário"""
+    result = get_database()['users'].update_one({"_id": ObjectId(user_id)}, {"$set": {"password": hash_password(password)}})
+    return result.matched_count > 0
+
+def issue_session_token(user):
+    """Token de sessão assinado (HMAC-SHA256) e guardado no cache de sessões"""
+    payload = {"sub": str(user["_id"]), "exp": int(time.time() + session_ttl_hours() * 3600), "nonce": secrets.token_hex(8)}
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = _b64encode(hmac.new(_session_secret(), body.encode("ascii"), hashlib.sha256).digest())
+    token = f"{body}.{signature}"
+    _session_cache().set(token, user)
+    return token
+
+def _token_payload(token):
+    """Payload de um token com assinatura válida e não expirado (ou None)"""
+    try:
+        body, signature = token.split(".")
+        expected = _b64encode(hmac.new(_session_secret(), body.encode("ascii"), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            return None
+        payload = json.loads(_b64decode(body))
+    except Exception:
+        return None
+    if payload.get("exp", 0) < time.time():
+        return None
+    return payload
+
+def _prune_revoked():
+    now = time.time()
+    for token in [token for token, exp in _revoked.items() if exp < now]:
+        del _revoked[token]
+
+def resume_session(token):
+    """
+    Usuário de um token de sessão válido. Tokens já vistos pelo processo vêm do
+    cache (sem consulta); se saíram do cache, um find_one por _id recarrega o usuário.
+    """
+    if not token:
+        return None
+    with _revoked_lock:
+        if token in _revoked:
+            return None
+    payload = _token_payload(token)
+    if payload is None:
+        return None
+    user = _session_cache().get(token)
+    if user is None:
+        try:
+            user = get_database()['users'].find_one({"_id": ObjectId(payload.get("sub"))}, USER_PROJECTION)
+        except Exception as e:
+            logger.warning(f"Não foi possível restaurar a sessão: {e}")
+            return None
+        if user is None:
+            return None
+        _session_cache().set(token, user)
+    return user
+
+def revoke_session(token):
+    """Invalida o token (logout)"""
+    if not token:
+        return
+    payload = _token_payload(token)
+    if payload is not None:
+        with _revoked_lock:
+            _prune_revoked()
+            _revoked[token] = payload["exp"]
+    _session_cache().invalidate(token)
@@ -0,0 +1,46 @@
+import pandas as pd
+
+DIMENSIONS = ["Transaction type", "Aging Intervals", "Category"]
+
+class BalanceSeries:
+    """
+    Série de fechamentos mensais do accounting, calculada uma vez por versão.
+
+    Cada Date do dataset é um retrato (snapshot) dos saldos em aberto. O
+    fechamento de um mês é o último retrato do mês; numa única passada vetorizada
+    a série guarda o Open balance desse retrato por tipo, Aging Interval e
+    Category, para todos os anos. O gráfico anual só filtra essa tabela pequena.
+
+    Args:
+        df: DataFrame tipado do accounting (Date, year, month, Open balance)
+    """
+
+    def __init__(self, df):
+        dates = df["Date"].dt.normalize()
+        closing_date = dates.groupby([df["year"], df["month"]]).transform("max")
+        at_close = df[dates == closing_date].assign(Date=dates[dates == closing_date])
+        self.table = (
+            at_close.groupby(["year", "month", "Date"] + DIMENSIONS, observed=True, dropna=False)["Open balance"]
+            .sum()
+            .reset_index()
+        )
+        for column in DIMENSIONS:
+            self.table[column] = self.table[column].astype(object)
+
+    def closing(self, year=None, tipo=None, aging=None, categorias=None, by_aging=False):
+        """
+        Open balance de fechamento de cada mês (colunas Date[, Aging Intervals],
+        Open balance), com os mesmos filtros de filtrar_dados_accounting.
+        """
+        table = self.table
+        mask = pd.Series(True, index=table.index)
+        if year:
+            mask &= table["year"] == year
+        if tipo and tipo != 'All':
+            mask &= table["Transaction type"] == tipo
+        if aging and aging != 'All':
+            mask &= table["Aging Intervals"] == aging
+        if categorias:
+            mask &= table["Category"].isin(categorias)
+        by = ["Date", "Aging Intervals"] if by_aging else ["Date"]
+        return table[mask].groupby(by, as_index=False)["Open balance"].sum()
@@ -1,36 +1,62 @@
 import pandas as pd
-import streamlit as st
 import logging
+import io
+import os
+from urllib.request import urlopen
+from database.dataset_store import dataset_store, resolve_source
+from database.sheet_sync import ContentSync
+from database.schema import DatasetSchema
+from database.filter_index import FilterIndex
+from database.aggregate_cube import AggregateCube
+from database.balance_series import BalanceSeries
 
 logger = logging.getLogger(__name__)
 
-@st.cache_data(ttl=600)
-def load_data_accounting_indicators():
+CSV_URL = "https://docs.google.com/spreadsheets/d/1lk5ENgYagn9cBhvOtLVSJ6lVZdblrt3KteSMbqE_GSQ/export?format=csv"
+DATASET_NAME = "accounting_indicators"
+
+# Schema aplicado na carga: a página recebe o DataFrame já tipado
+SCHEMA = DatasetSchema(
+    text=["Transaction type", "INV Num", "Customer full name", "EPO Number", "Category", "Aging Intervals"],
+    numeric=["INV Amount", "Open balance", "Aging days"],
+    dates={"Date": None},
+    categories=["Transaction type", "Category", "Aging Intervals"],
+    period="Date",
+)
+
+def _read_source(source):
+    if os.path.exists(source):
+        with open(source, "rb") as file:
+            return file.read()
+    with urlopen(source, timeout=60) as response:
+        return response.read()
+
+def _fetch_accounting_indicators(previous=None):
     """Carrega os dados da planilha Google como CSV público, sem autenticação."""
+    raw = _read_source(resolve_source(CSV_URL, "accounting_indicators.csv"))
+    # O CSV público não tem metadados de revisão: o hash do conteúdo evita o parse
+    if _sync.unchanged(raw) and previous is not None:
+        return previous
+    df = pd.read_csv(io.BytesIO(raw))
+    _sync.commit()
+    return SCHEMA.apply(df)
+
+_sync = ContentSync()
+dataset_store.register(DATASET_NAME, _fetch_accounting_indicators, ttl=600, sync=_sync)
+
+def load_data_accounting_indicators(raise_errors=False):
+    """Retorna o DataFrame de accounting do store compartilhado (somente leitura)"""
     try:
-        url = "https://docs.google.com/spreadsheets/d/1lk5ENgYagn9cBhvOtLVSJ6lVZdblrt3KteSMbqE_GSQ/export?format=csv"
-        df = pd.read_csv(url)
-        df = df.rename(columns={
-            "Inv Date": "Inv Date",
-            "Transaction type": "Transaction type",
-            "INV Num": "INV Num",
-            "Customer full name": "Customer full name",
-            "Due date": "Due date",
-            "INV Amount": "INV Amount",
-            "Open balance": "Open balance",
-            "EPO Number": "EPO Number",
-            "Category": "Category",
-            "Aging days": "Aging days",
-            "Aging Intervals": "Aging Intervals",
-            "Date": "Date"
-        })
-        return df
+        return dataset_store.get(DATASET_NAME)
     except Exception as e:
+        # O preload trata o erro (não marca a tela como carregada)
+        if raise_errors:
+            raise
         logger.error(f"Error loading public accounting indicators data: {str(e)}")
         return pd.DataFrame()
 
 def sync_and_reload():
-    st.cache_data.clear()
+    dataset_store.invalidate(DATASET_NAME)
     return load_data_accounting_indicators()
 
 def head_accounting_indicators_public():
@@ -38,17 +64,30 @@ def head_accounting_indicators_public():
     df = load_data_accounting_indicators()
     return df.head()
 
-@st.cache_data
-def filtrar_dados_accounting(df, ano=None, mes=None, categorias=None, tipo=None, aging=None):
-    filtered = df.copy()
-    if tipo and tipo != 'All':
-        filtered = filtered[filtered['Transaction type'] == tipo]
-    if aging and aging != 'All':
-        filtered = filtered[filtered['Aging Intervals'] == aging]
-    if categorias:
-        filtered = filtered[filtered['Category'].isin(categorias)]
-    if ano:
-        filtered = filtered[filtered['year'] == ano]
-    if mes is not None and mes != 0:
-        filtered = filtered[filtered['month'] == mes]
-    return filtered 
\ No newline at end of file
+def _filter_index():
+    return dataset_store.derived(DATASET_NAME, "filter_index", lambda df: FilterIndex(df, ["Transaction type", "Aging Intervals", "Category"]))
+
+def get_accounting_cube():
+    """Cubo de agregados do accounting (Open balance por data, tipo, aging e categoria)"""
+    return dataset_store.derived(
+        DATASET_NAME,
+        "cube",
+        lambda df: AggregateCube(df, "Date", ["Transaction type", "Aging Intervals", "Category"], ["Open balance"]),
+    )
+
+def get_balance_series():
+    """Fechamentos mensais de Open balance (por tipo, aging e categoria), um cálculo por versão"""
+    return dataset_store.derived(DATASET_NAME, "balance_series", BalanceSeries)
+
+@dataset_store.memoized(DATASET_NAME)
+def filtrar_dados_accounting(ano=None, mes=None, categorias=None, tipo=None, aging=None):
+    """Filtra o accounting pelo índice do snapshot atual (somente leitura; sem cópia do DataFrame)"""
+    return _filter_index().select(
+        year=ano,
+        month=mes,
+        equals={
+            "Transaction type": tipo if tipo and tipo != 'All' else None,
+            "Aging Intervals": aging if aging and aging != 'All' else None,
+        },
+        isin={"Category": categorias},
+    )
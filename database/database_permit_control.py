@@ -1,145 +1,354 @@
 import pandas as pd
-import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import os
-from datetime import datetime
 import logging
+import numpy as np
+from database.dataset_store import dataset_store
+from database.sheet_sync import SheetSync
+from database.sheets_client import sheets_client
+from database.mutation_buffer import MutationBuffer
+from database.ingestion import read_sheet, values_to_frame
+from database.schema import DatasetSchema
+from database.filter_index import FilterIndex
+from database.aggregate_cube import AggregateCube
 
 logger = logging.getLogger(__name__)
 
 DOCUMENT_ID = "1Em_Wyj8EiBeo56zGrShKEP9yFCMDVmkR-_EoiNXI3YA"
 GID = "1016235500"
+DATASET_NAME = "permit_control"
 
-def get_url(gid):
-    return f"https://docs.google.com/spreadsheets/d/{DOCUMENT_ID}/export?format=xlsx&gid={gid}"
+# Todas as colunas de origem são texto (datas no formato MM/DD/YYYY)
+TEXT_COLUMNS = ["MODEL", "JOBSITE", "LOT/ADDRESS", "SITUAÇÃO", "SOLICITAÇÃO", "APLICAÇÃO", "EMISSÃO", "OBSERVAÇÃO", "ARQUIVO"]
 
-@st.cache_data(ttl=600)
-def load_data_permit_control():
+# Schema aplicado na carga: a página recebe o DataFrame já tipado
+SCHEMA = DatasetSchema(
+    renames={
+        "MODEL": "Model",
+        "JOBSITE": "Jobsite",
+        "LOT/ADDRESS": "LOT/ADDRESS",
+        "SITUAÇÃO": "Situation",
+        "SOLICITAÇÃO": "Request Date",
+        "APLICAÇÃO": "Application Date",
+        "EMISSÃO": "Issue Date",
+        "OBSERVAÇÃO": "Observation",
+        "ARQUIVO": "Permit File"
+    },
+    text=["Model", "Jobsite", "LOT/ADDRESS", "Situation", "Observation", "Permit File"],
+    dates={"Request Date": "%m/%d/%Y", "Application Date": "%m/%d/%Y", "Issue Date": "%m/%d/%Y"},
+    categories=["Model", "Jobsite", "Situation"],
+    period="Request Date",
+    row_number="sheet_row",
+)
+
+# Colunas que identificam um permit (todas as colunas da planilha)
+KEY_COLUMNS = list(SCHEMA.renames.values())
+
+def _fetch_permit_control(previous=None):
+    # Planilha sem alterações: mantém o snapshot (custa uma chamada de metadados)
+    if _sync.unchanged(GID) and previous is not None:
+        return previous
+    # Só linhas novas no final da aba: busca apenas essas linhas. Sem linhas novas
+    # (ex.: o modifiedTime mudou pelas escritas do próprio app), mantém o snapshot
+    if previous is not None:
+        df = _sync.fetch_appended(GID, previous, SCHEMA)
+        if df is not None:
+            _sync.commit()
+            return df
+
+    raw = read_sheet(DOCUMENT_ID, GID, "permit_control", TEXT_COLUMNS, get_worksheet=dataCredentials)
+    # O estado incremental usa as linhas cruas (antes do descarte de datas inválidas)
+    _sync.remember(GID, raw)
+    _sync.commit()
+    return SCHEMA.apply(raw)
+
+_sync = SheetSync(lambda gid: dataCredentials(gid))
+dataset_store.register(DATASET_NAME, _fetch_permit_control, ttl=600, sync=_sync)
+
+def load_data_permit_control(raise_errors=False):
+    """Retorna o DataFrame de permits do store compartilhado (somente leitura)"""
     try:
-        df = pd.read_excel(get_url(GID), engine="openpyxl")
-
-        df = df.rename(columns={
-            "MODEL": "Model",
-            "JOBSITE": "Jobsite",
-            "LOT/ADDRESS": "LOT/ADDRESS",
-            "SITUAÇÃO": "Situation",
-            "SOLICITAÇÃO": "Request Date",
-            "APLICAÇÃO": "Application Date",
-            "EMISSÃO": "Issue Date",
-            "OBSERVAÇÃO": "Observation",
-            "ARQUIVO": "Permit File"
-        })
-        return df
-    
+        return dataset_store.get(DATASET_NAME)
     except Exception as e:
+        # O preload trata o erro (não marca a tela como carregada)
+        if raise_errors:
+            raise
         logger.error(f"Error loading data: {str(e)}")
-        return pd.DataFrame(), pd.DataFrame()
+        return pd.DataFrame()
 
 def dataCredentials(gid):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    path = os.path.join("antique", "credentials.json")
-    creds = ServiceAccountCredentials.from_json_keyfile_name(path, scope)
-    client = gspread.authorize(creds)
+    """Handle da aba gid a partir do cliente compartilhado (autorizado uma vez por processo)"""
+    return sheets_client.worksheet(DOCUMENT_ID, gid)
+
+def _sheet_row(model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file):
+    """Valores da linha na ordem das colunas da planilha"""
+    return [
+        model,
+        jobsite,
+        lot_address,
+        situation,
+        str(request_date.strftime("%m/%d/%Y")) if request_date else "",
+        str(application_date.strftime("%m/%d/%Y")) if application_date else "",
+        str(issue_date.strftime("%m/%d/%Y")) if issue_date else "",
+        observation,
+        permit_file
+    ]
+
+def _typed_rows(rows, sheet_rows):
+    """Linhas tipadas pelo SCHEMA a partir dos valores da planilha (vazio = ausente, como na carga)"""
+    width = len(KEY_COLUMNS)
+    rows = [[None if v == "" else v for v in values] + [None] * (width - len(values)) for values in rows]
+    return SCHEMA.apply(pd.DataFrame(rows, columns=list(SCHEMA.renames)), row_numbers=sheet_rows)
+
+def _typed_row(values, sheet_row):
+    return _typed_rows([values], [sheet_row])
+
+def row_keys(df):
+    """
+    Chave de conteúdo de cada linha (hash dos campos normalizados como texto da
+    planilha). Identifica o permit sem coluna de ID escondida na planilha e vale
+    tanto para o snapshot tipado quanto para uma linha avulsa (row_data).
+    """
+    columns = {}
+    for column in KEY_COLUMNS:
+        values = df[column]
+        if column in SCHEMA.dates:
+            values = pd.to_datetime(values).dt.strftime("%m/%d/%Y")
+        values = values.astype(object)
+        columns[column] = values.where(values.notna(), "").astype(str)
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False)
+
+def _key(frame):
+    """Chave (int) da primeira linha de frame"""
+    return int(row_keys(frame).iloc[0])
+
+def _build_row_index(df):
+    keys = row_keys(df)
+    return {int(key): positions for key, positions in keys.groupby(keys.to_numpy(), sort=False).indices.items()}
+
+def _row_index():
+    """{chave: posições no snapshot} do snapshot atual (reconstruído a cada nova versão)"""
+    return dataset_store.derived(DATASET_NAME, "row_index", _build_row_index)
+
+def _position(df, sheet_row):
+    """Posição no snapshot da linha da planilha sheet_row (ou None)"""
+    positions = np.flatnonzero(df["sheet_row"].to_numpy() == sheet_row)
+    return int(positions[0]) if len(positions) else None
+
+def _confirm_row(worksheet, key, sheet_row):
+    """
+    Checagem otimista antes de editar/apagar: lê só a linha sheet_row e confere
+    a chave. Se a linha mudou de lugar (inserção/remoção feita fora do app),
+    relocaliza com uma leitura completa da aba.
+
+    Returns:
+        (linha na planilha, deslocada) ou (None, True) se o permit não existe mais
+    """
+    values = worksheet.get(f"A{sheet_row}:I{sheet_row}")
+    current = _typed_row(values[0] if values else [], sheet_row)
+    if len(current) and _key(current) == key:
+        return sheet_row, False
+    logger.warning(f"Permit não está mais na linha {sheet_row}; relocalizando na planilha")
+    typed = SCHEMA.apply(values_to_frame(worksheet.get_all_values()))
+    matches = typed["sheet_row"][row_keys(typed).to_numpy() == np.uint64(key)]
+    # O snapshot está desatualizado em relação à planilha
+    dataset_store.invalidate(DATASET_NAME)
+    if matches.empty:
+        logger.warning("Conflito: o permit foi alterado ou removido por outra pessoa")
+        return None, True
+    return int(matches.iloc[0]), True
+
+def _deleted(df, sheet_row):
+    """Snapshot sem a linha sheet_row, com as linhas de baixo subindo uma posição (None se ela não está no snapshot)"""
+    position = _position(df, sheet_row)
+    if position is None:
+        return None
+    df = SCHEMA.replace(df, position, df.iloc[0:0])
+    rows = df["sheet_row"]
+    return df.assign(sheet_row=rows.where(rows < sheet_row, rows - 1))
+
+def _apply_writes(writes):
+    """
+    Write-through de um lote gravado pelo MutationBuffer (edições, remoções de
+    baixo para cima, appends): ajusta snapshot e cubo numa única mutação.
+    """
+    updates = [w for w in writes if w.kind == "update"]
+    deletes = [w for w in writes if w.kind == "delete"]
+    appends = [w for w in writes if w.kind == "append"]
+    for write in updates:
+        _sync.record_update(GID, write.row)
+    for write in deletes:
+        _sync.record_delete(GID, write.row)
+    if appends:
+        _sync.record_append(GID, appends[0].response)
+    if not writes:
+        return
+    # Linha deslocada por escrita externa ou append sem linha conhecida: recarrega
+    if any(w.context.get("shifted") for w in writes) or any(w.row is None for w in appends):
+        dataset_store.invalidate(DATASET_NAME)
+        return
+
+    updated = [_typed_row(w.values, w.row) for w in updates]
+    appended = _typed_rows([w.values for w in appends], [w.row for w in appends])
+    added = updated + [appended]
+    removed = [w.context["previous"] for w in updates + deletes]
 
-    sheet = client.open_by_key(DOCUMENT_ID)
-    worksheet = sheet.get_worksheet_by_id(int(gid))
-    return worksheet
+    def patch(df):
+        # Linha ausente do snapshot (recarregado ou alterado por outra escrita):
+        # devolve None e o dataset_store invalida o dataset em vez de aplicar o lote
+        for write, row in zip(updates, updated):
+            position = _position(df, write.row)
+            if position is None:
+                logger.warning(f"Linha {write.row} não está no snapshot; recarregando os permits")
+                return None
+            df = SCHEMA.replace(df, position, row)
+        for write in deletes:
+            df = _deleted(df, write.row)
+            if df is None:
+                logger.warning(f"Linha {write.row} não está no snapshot; recarregando os permits")
+                return None
+        return SCHEMA.concat(df, appended) if len(appended) else df
 
-def add_register_permit_control(model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file):
-    """Add a new permit to the database"""
+    dataset_store.mutate(
+        DATASET_NAME,
+        patch,
+        derived={"cube": lambda cube, df: cube.patched(
+            added=pd.concat(added, ignore_index=True),
+            removed=pd.concat(removed, ignore_index=True) if removed else None,
+            rows=len(df),
+        )},
+        since=writes[0].written_at,
+    )
+
+_writes = MutationBuffer(dataCredentials, on_error=lambda gid: sheets_client.forget(DOCUMENT_ID, gid))
+_writes.listen(GID, _apply_writes)
+
+def commit_writes():
+    """Grava agora as escritas enfileiradas com commit=False"""
+    return _writes.commit()
+
+def _result(write, commit):
+    if not commit:
+        return write
+    _writes.flush(GID)
+    return bool(write.ok)
+
+def add_register_permit_control(model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file, commit=True):
+    """
+    Add a new permit to the database.
+    Com commit=False a escrita só é enfileirada (gravada em lote com as demais)
+    e a função devolve o PendingWrite em vez de True/False.
+    """
     try:
-        worksheet = dataCredentials(GID)
-        worksheet.append_row([
-            model,
-            jobsite,
-            lot_address,
-            situation,
-            str(request_date.strftime("%m/%d/%Y")) if request_date else "",
-            str(application_date.strftime("%m/%d/%Y")) if application_date else "",
-            str(issue_date.strftime("%m/%d/%Y")) if issue_date else "",
-            observation,
-            permit_file
-        ])
-        st.cache_data.clear()  # Clear cache to force reload
-        return True
+        values = _sheet_row(model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file)
+        return _result(_writes.append(GID, values), commit)
     except Exception as e:
         logger.error(f"Error adding permit: {str(e)}")
         return False
 
 def sync_and_reload():
-    """Clear cache and reload data"""
-    st.cache_data.clear()
+    """Force a reload of the shared dataset"""
+    dataset_store.invalidate(DATASET_NAME)
     return load_data_permit_control()
 
-def update_permit_control(row_id, model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file):
-    """Update an existing permit in the database"""
-    try:
-        worksheet = dataCredentials(GID)
-        # Get all data to find the correct row
-        all_data = worksheet.get_all_records()
-        if row_id < len(all_data):
-            # Update the row (row_id + 2 because sheet is 1-indexed and has header)
-            row_num = row_id + 2
-            worksheet.update(f'A{row_num}:I{row_num}', [[
-                model,
-                jobsite,
-                lot_address,
-                situation,
-                str(request_date.strftime("%m/%d/%Y")) if request_date else "",
-                str(application_date.strftime("%m/%d/%Y")) if application_date else "",
-                str(issue_date.strftime("%m/%d/%Y")) if issue_date else "",
-                observation,
-                permit_file
-            ]])
-            st.cache_data.clear()  # Clear cache to force reload
-            return True
+def _update_row(key, values, position=None, commit=True):
+    """Edita o permit de chave key (posição no snapshot opcional, quando já conhecida)"""
+    if position is None:
+        positions = _row_index().get(key)
+        if positions is None or not len(positions):
+            logger.warning("Permit não encontrado no snapshot")
+            return False
+        position = int(positions[0])
+    previous_row = dataset_store.get(DATASET_NAME).iloc[[position]]
+    row_num, shifted = _confirm_row(dataCredentials(GID), key, int(previous_row["sheet_row"].iloc[0]))
+    if row_num is None:
         return False
+    write = _writes.update(GID, row_num, values, context={"previous": previous_row, "shifted": shifted})
+    return _result(write, commit)
+
+def _delete_row(key, commit=True):
+    """Remove o permit de chave key"""
+    positions = _row_index().get(key)
+    if positions is None or not len(positions):
+        logger.warning("Permit não encontrado no snapshot")
+        return False
+    previous_row = dataset_store.get(DATASET_NAME).iloc[[int(positions[0])]]
+    row_num, shifted = _confirm_row(dataCredentials(GID), key, int(previous_row["sheet_row"].iloc[0]))
+    if row_num is None:
+        return False
+    write = _writes.delete(GID, row_num, context={"previous": previous_row, "shifted": shifted})
+    return _result(write, commit)
+
+def update_permit_control(row_id, model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file, commit=True):
+    """Update an existing permit in the database (row_id = posição no snapshot; commit: ver add_register_permit_control)"""
+    try:
+        snapshot = dataset_store.get(DATASET_NAME)
+        if not 0 <= row_id < len(snapshot):
+            return False
+        values = _sheet_row(model, jobsite, lot_address, situation, request_date, application_date, issue_date, observation, permit_file)
+        return _update_row(_key(snapshot.iloc[[row_id]]), values, row_id, commit)
     except Exception as e:
         logger.error(f"Error updating permit: {str(e)}")
         return False
 
-def delete_permit(row_data):
-    """Delete a permit from the database"""
+def delete_permit(row_data, commit=True):
+    """Delete a permit from the database (row_data = linha do DataFrame de permits; commit: ver add_register_permit_control)"""
     try:
-        worksheet = dataCredentials(GID)
-        # Find the row that matches all the data
-        all_data = worksheet.get_all_records()
-        
-        # Convert dates in row_data to strings for comparison
-        request_date_str = pd.to_datetime(row_data["Request Date"]).strftime("%m/%d/%Y") if pd.notna(row_data["Request Date"]) else ""
-        application_date_str = pd.to_datetime(row_data["Application Date"]).strftime("%m/%d/%Y") if pd.notna(row_data["Application Date"]) else ""
-        issue_date_str = pd.to_datetime(row_data["Issue Date"]).strftime("%m/%d/%Y") if pd.notna(row_data["Issue Date"]) else ""
-        
-        for idx, row in enumerate(all_data, start=2):  # start=2 because sheet is 1-indexed and has header
-            # Compare dates as strings
-            if (row["MODEL"] == row_data["Model"] and
-                row["JOBSITE"] == row_data["Jobsite"] and
-                row["LOT/ADDRESS"] == row_data["LOT/ADDRESS"] and
-                row["SITUAÇÃO"] == row_data["Situation"] and
-                row["SOLICITAÇÃO"] == request_date_str and
-                (not application_date_str or row["APLICAÇÃO"] == application_date_str) and
-                (not issue_date_str or row["EMISSÃO"] == issue_date_str)):
-                # Delete the row using delete_rows (start index, end index)
-                worksheet.delete_rows(idx, idx)
-                st.cache_data.clear()  # Clear cache to force reload
-                return True
-        return False
+        return _delete_row(_key(pd.DataFrame([row_data])), commit)
     except Exception as e:
         logger.error(f"Error deleting permit: {str(e)}")
         return False
 
-@st.cache_data
-def filtrar_dados_permit(df, ano=None, mes=None, modelo=None, situacao=None, jobsites=None):
-    filtered = df.copy()
-    if modelo and modelo != 'All':
-        filtered = filtered[filtered['Model'] == modelo]
-    if situacao and situacao != 'All':
-        filtered = filtered[filtered['Situation'] == situacao]
-    if jobsites:
-        filtered = filtered[filtered['Jobsite'].isin(jobsites)]
-    if ano:
-        filtered = filtered[filtered['year'] == ano]
-    if mes is not None and mes != 0:
-        filtered = filtered[filtered['month'] == mes]
-    return filtered
\ No newline at end of file
+def _filter_index():
+    return dataset_store.derived(DATASET_NAME, "filter_index", lambda df: FilterIndex(df, ["Model", "Situation", "Jobsite"]))
+
+def get_permit_cube():
+    """Cubo de agregados dos permits (contagem por dia de solicitação, situação, modelo e jobsite)"""
+    return dataset_store.derived(
+        DATASET_NAME,
+        "cube",
+        lambda df: AggregateCube(df, "Request Date", ["Situation", "Model", "Jobsite"]),
+        extend=lambda cube, df: cube.extended(df),
+    )
+
+SITUATION_COLORS = {"Issued": "green", "Applied": "blue"}
+
+def _display_columns(df):
+    """Colunas de exibição da lista de permits, formatadas de uma vez (vetorizado)"""
+    def date_str(column):
+        return df[column].dt.strftime("%m/%d/%Y")
+
+    situation = df["Situation"].astype(object)
+    title = df["Model"].astype(str) + " - " + df["Jobsite"].astype(str)
+    permit_file = df["Permit File"].astype(object)
+    display = pd.DataFrame({
+        "title": title,
+        "location": df["LOT/ADDRESS"],
+        "observation": df["Observation"],
+        "situation": situation,
+        "status": ":" + situation.map(SITUATION_COLORS).fillna("orange") + "[" + situation.astype(str) + "]",
+        "request": date_str("Request Date"),
+        "application": date_str("Application Date"),
+        "issue": date_str("Issue Date"),
+        "permit_file": permit_file.where(permit_file.fillna("").astype(str).str.strip() != ""),
+    }, index=df.index)
+    display["search"] = (
+        title + " " + df["LOT/ADDRESS"].fillna("").astype(str) + " " + situation.fillna("").astype(str)
+        + " " + df["Observation"].fillna("").astype(str)
+    ).str.lower()
+    return display
+
+def get_permit_display():
+    """Colunas de exibição (título, status, datas formatadas, texto de busca) do snapshot atual"""
+    return dataset_store.derived(DATASET_NAME, "display", _display_columns)
+
+@dataset_store.memoized(DATASET_NAME)
+def filtrar_dados_permit(ano=None, mes=None, modelo=None, situacao=None, jobsites=None):
+    """Filtra os permits pelo índice do snapshot atual (somente leitura; sem cópia do DataFrame)"""
+    return _filter_index().select(
+        year=ano,
+        month=mes,
+        equals={
+            "Model": modelo if modelo and modelo != 'All' else None,
+            "Situation": situacao if situacao and situacao != 'All' else None,
+        },
+        isin={"Jobsite": jobsites},
+    )
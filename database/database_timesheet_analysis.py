@@ -1,87 +1,170 @@
 import pandas as pd
-import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from database.dataset_store import dataset_store
+from database.sheet_sync import SheetSync
+from database.sheets_client import sheets_client
+from database.mutation_buffer import MutationBuffer
+from database.ingestion import read_sheet
+from database.schema import DatasetSchema
+from database.filter_index import FilterIndex
+from database.aggregate_cube import AggregateCube
 
 logger = logging.getLogger(__name__)
 
 DOCUMENT_ID = "1_BZtDLtDggKQ_2D-5O_JP53z8eKdWSZxbjD8DnJBDlM"
 GID_T1 = "814204999"
 GID_T2 = "624482067"
+DATASET_NAME = "timesheet_analysis"
 
-def get_url(gid):
-    return f"https://docs.google.com/spreadsheets/d/{DOCUMENT_ID}/export?format=xlsx&gid={gid}"
+# Tipos explícitos das colunas de origem (usados pelo backend de ingestão)
+T1_TEXT_COLUMNS = ["Date", "Nome", "Error", "Team", "Corporation"]
+T1_NUMERIC_COLUMNS = ["Payrate", "Add time/hour", "Remove time/hour", "ADD $", "REMOVE $", "TOTAL"]
+T2_TEXT_COLUMNS = ["Nome", "Empresa", "Team"]
+T2_NUMERIC_COLUMNS = ["USD/hours"]
 
-@st.cache_data(ttl=600)
-def load_data():
+# Schema aplicado na carga: as páginas recebem os DataFrames já tipados
+SCHEMA_T1 = DatasetSchema(
+    renames={
+        "Date": "date_t1",
+        "Nome": "nome_t1",
+        "Error": "error_t1",
+        "Team": "team_t1",
+        "Corporation": "corporation_t1",
+        "Payrate": "payrate_t1",
+        "Add time/hour": "add_time_hour_t1",
+        "Remove time/hour": "remove_time_hour_t1",
+        "ADD $": "add_value_t1",
+        "REMOVE $": "remove_value_t1",
+        "TOTAL": "total_t1"
+    },
+    text=["nome_t1", "error_t1", "team_t1", "corporation_t1"],
+    numeric=["payrate_t1", "add_time_hour_t1", "remove_time_hour_t1", "add_value_t1", "remove_value_t1", "total_t1"],
+    dates={"date_t1": "%m/%d/%Y"},
+    categories=["error_t1", "team_t1", "corporation_t1"],
+    period="date_t1",
+)
+SCHEMA_T2 = DatasetSchema(
+    renames={
+        "Nome": "nome_t2",
+        "Empresa": "empresa_t2",
+        "USD/hours": "usd_hours_t2",
+        "Team": "team_t2"
+    },
+    text=["nome_t2", "empresa_t2", "team_t2"],
+    numeric=["usd_hours_t2"],
+    categories=["empresa_t2", "team_t2"],
+)
+
+def _fetch_timesheet(previous=None):
+    # Planilha sem alterações: mantém o snapshot (custa uma chamada de metadados)
+    if _sync.unchanged(GID_T1) and previous is not None:
+        return previous
+    # Só linhas novas no final das abas: busca apenas essas linhas. Sem linhas novas
+    # (ex.: o modifiedTime mudou pelas escritas do próprio app), mantém o snapshot
+    if previous is not None:
+        df_t1 = _sync.fetch_appended(GID_T1, previous[0], SCHEMA_T1)
+        df_t2 = _sync.fetch_appended(GID_T2, previous[1], SCHEMA_T2)
+        if df_t1 is not None and df_t2 is not None:
+            _sync.commit()
+            if df_t1 is previous[0] and df_t2 is previous[1]:
+                return previous
+            return df_t1, df_t2
+
+    # As duas abas são baixadas em paralelo
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_t1 = executor.submit(read_sheet, DOCUMENT_ID, GID_T1, "timesheet_t1", T1_TEXT_COLUMNS, T1_NUMERIC_COLUMNS, dataCredentials)
+        future_t2 = executor.submit(read_sheet, DOCUMENT_ID, GID_T2, "timesheet_t2", T2_TEXT_COLUMNS, T2_NUMERIC_COLUMNS, dataCredentials)
+        raw_t1 = future_t1.result()
+        raw_t2 = future_t2.result()
+
+    # O estado incremental usa as linhas cruas (antes do descarte de datas inválidas)
+    _sync.remember(GID_T1, raw_t1)
+    _sync.remember(GID_T2, raw_t2)
+    _sync.commit()
+    return SCHEMA_T1.apply(raw_t1), SCHEMA_T2.apply(raw_t2)
+
+_sync = SheetSync(lambda gid: dataCredentials(gid))
+dataset_store.register(DATASET_NAME, _fetch_timesheet, ttl=600, sync=_sync)
+
+def load_data(raise_errors=False):
+    """Retorna (df_t1, df_t2) do store compartilhado; os DataFrames são somente leitura"""
     try:
-        df_t1 = pd.read_excel(get_url(GID_T1), engine="openpyxl")
-        df_t2 = pd.read_excel(get_url(GID_T2), engine="openpyxl")
-
-        df_t1 = df_t1.rename(columns={
-            "Date": "date_t1",
-            "Nome": "nome_t1",
-            "Error": "error_t1",
-            "Team": "team_t1",
-            "Corporation": "corporation_t1",
-            "Payrate": "payrate_t1",
-            "Add time/hour": "add_time_hour_t1",
-            "Remove time/hour": "remove_time_hour_t1",
-            "ADD $": "add_value_t1",
-            "REMOVE $": "remove_value_t1",
-            "TOTAL": "total_t1"
-        })
-
-        df_t2 = df_t2.rename(columns={
-            "Nome": "nome_t2",
-            "Empresa": "empresa_t2",
-            "USD/hours": "usd_hours_t2",
-            "Team": "team_t2"
-        })
-
-        return df_t1, df_t2
+        return dataset_store.get(DATASET_NAME)
     except Exception as e:
+        # O preload trata o erro (não marca a tela como carregada)
+        if raise_errors:
+            raise
         logger.error(f"Error loading data: {str(e)}")
         return pd.DataFrame(), pd.DataFrame()
 
 def dataCredentials(gid):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    path = os.path.join("antique", "credentials.json")
-    creds = ServiceAccountCredentials.from_json_keyfile_name(path, scope)
-    client = gspread.authorize(creds)
+    """Handle da aba gid a partir do cliente compartilhado (autorizado uma vez por processo)"""
+    return sheets_client.worksheet(DOCUMENT_ID, gid)
+
+def _apply_appends(gid, schema, writes, patch, derived=None):
+    """Write-through de um lote de appends: acrescenta as linhas tipadas ao snapshot, sem recarregar"""
+    if not writes:
+        return
+    _sync.record_append(gid, writes[0].response)
+    rows = schema.apply(pd.DataFrame([w.values for w in writes], columns=list(schema.renames)))
+    dataset_store.mutate(DATASET_NAME, lambda data: patch(data, rows), derived=derived, since=writes[0].written_at)
+
+# Datas são gravadas como texto "%m/%d/%Y" e convertidas pelo Sheets (como no append_row original)
+_writes = MutationBuffer(
+    dataCredentials,
+    value_input_option="USER_ENTERED",
+    on_error=lambda gid: sheets_client.forget(DOCUMENT_ID, gid),
+)
+_writes.listen(GID_T1, lambda writes: _apply_appends(
+    GID_T1, SCHEMA_T1, writes,
+    lambda data, rows: (SCHEMA_T1.concat(data[0], rows), data[1]),
+    derived={"cube": lambda cube, data: cube.extended(data[0])},
+))
+_writes.listen(GID_T2, lambda writes: _apply_appends(
+    GID_T2, SCHEMA_T2, writes,
+    lambda data, rows: (data[0], SCHEMA_T2.concat(data[1], rows)),
+))
 
-    sheet = client.open_by_key(DOCUMENT_ID)
-    worksheet = sheet.get_worksheet_by_id(int(gid))
-    return worksheet
+def commit_writes():
+    """Grava agora os registros enfileirados com commit=False"""
+    return _writes.commit()
 
-def add_register(date, name, error, team, corporation, add_hours, remove_hours, add_value, remove_value, total):
-    """Add a new register to the database"""
+def _register_row(date, name, error, team, corporation, add_hours, remove_hours, add_value, remove_value, total):
+    """Valores do registro na ordem das colunas da T1"""
+    return [
+        str(date.strftime("%m/%d/%Y")),
+        name,
+        error,
+        team,
+        corporation,
+        float(add_value / add_hours if add_hours > 0 else 0),  # payrate
+        add_hours,
+        remove_hours,
+        add_value,
+        remove_value,
+        total
+    ]
+
+def add_register(date, name, error, team, corporation, add_hours, remove_hours, add_value, remove_value, total, commit=True):
+    """
+    Add a new register to the database.
+    Com commit=False o registro só é enfileirado (gravado em lote com os demais)
+    e a função devolve o PendingWrite em vez de True/False.
+    """
     try:
-        new_row = [
-            str(date.strftime("%m/%d/%Y")),
-            name,
-            error,
-            team,
-            corporation,
-            float(add_value / add_hours if add_hours > 0 else 0),  # payrate
-            add_hours,
-            remove_hours,
-            add_value,
-            remove_value,
-            total
-        ]
-        dataCredentials(GID_T1).append_row(new_row, value_input_option="USER_ENTERED")
-        st.cache_data.clear()  # Clear cache to force reload
-        return True
+        new_row = _register_row(date, name, error, team, corporation, add_hours, remove_hours, add_value, remove_value, total)
+        write = _writes.append(GID_T1, new_row)
+        if not commit:
+            return write
+        _writes.flush(GID_T1)
+        return bool(write.ok)
     except Exception as e:
         logger.error(f"Error adding register: {str(e)}")
         return False
 
-def add_user(name, payrate, corporation, team):
-    """Add a new user to the database"""
+def add_user(name, payrate, corporation, team, commit=True):
+    """Add a new user to the database (commit=False: ver add_register)"""
     try:
         new_row = [
             name,
@@ -89,29 +172,38 @@ def add_user(name, payrate, corporation, team):
             payrate,
             team
         ]
-        dataCredentials(GID_T2).append_row(new_row, value_input_option="USER_ENTERED")
-        st.cache_data.clear()  # Clear cache to force reload
-        return True
+        write = _writes.append(GID_T2, new_row)
+        if not commit:
+            return write
+        _writes.flush(GID_T2)
+        return bool(write.ok)
     except Exception as e:
         logger.error(f"Error adding user: {str(e)}")
         return False
 
 def sync_and_reload():
-    """Clear cache and reload data"""
-    st.cache_data.clear()
+    """Force a reload of the shared dataset"""
+    dataset_store.invalidate(DATASET_NAME)
     return load_data()
 
-@st.cache_data
-def filtrar_dados_timesheet(df, ano=None, mes=None, corporation=None, teams=None, errors=None):
-    filtered = df.copy()
-    if corporation and corporation != 'All':
-        filtered = filtered[filtered['corporation_t1'] == corporation]
-    if teams:
-        filtered = filtered[filtered['team_t1'].isin(teams)]
-    if errors:
-        filtered = filtered[filtered['error_t1'].isin(errors)]
-    if ano:
-        filtered = filtered[filtered['year'] == ano]
-    if mes is not None and mes != 0:
-        filtered = filtered[filtered['month'] == mes]
-    return filtered
\ No newline at end of file
+def _filter_index():
+    return dataset_store.derived(DATASET_NAME, "filter_index", lambda data: FilterIndex(data[0], ["corporation_t1", "team_t1", "error_t1"]))
+
+def get_timesheet_cube():
+    """Cubo de agregados da T1 (contagem, ADD $ e REMOVE $ por dia, time, erro e corporação)"""
+    return dataset_store.derived(
+        DATASET_NAME,
+        "cube",
+        lambda data: AggregateCube(data[0], "date_t1", ["team_t1", "error_t1", "corporation_t1"], ["add_value_t1", "remove_value_t1"]),
+        extend=lambda cube, data: cube.extended(data[0]),
+    )
+
+@dataset_store.memoized(DATASET_NAME)
+def filtrar_dados_timesheet(ano=None, mes=None, corporation=None, teams=None, errors=None):
+    """Filtra a T1 pelo índice do snapshot atual (somente leitura; sem cópia do DataFrame)"""
+    return _filter_index().select(
+        year=ano,
+        month=mes,
+        equals={"corporation_t1": corporation if corporation and corporation != 'All' else None},
+        isin={"team_t1": teams, "error_t1": errors},
+    )
@@ -0,0 +1,305 @@
+import os
+import time
+import threading
+import logging
+import functools
+from database.snapshot_store import save_snapshot, load_snapshot
+from database.schema import memory_usage
+from utils.cache import TTLCache
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+# Diretório com arquivos locais que substituem as exportações do Google Sheets (testes)
+FIXTURES_DIR_ENV = "DATASET_FIXTURES_DIR"
+
+# Com DATASET_OFFLINE=1 os datasets vêm só dos snapshots locais, sem acessar a origem
+OFFLINE_ENV = "DATASET_OFFLINE"
+
+def using_fixtures():
+    return bool(os.environ.get(FIXTURES_DIR_ENV))
+
+def offline():
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+def resolve_source(url, fixture_name):
+    """
+    Retorna a origem de uma exportação: a URL do Google Sheets ou, se a variável
+    de ambiente DATASET_FIXTURES_DIR estiver definida, o arquivo local fixture_name.
+    """
+    if using_fixtures():
+        return os.path.join(os.environ[FIXTURES_DIR_ENV], fixture_name)
+    return url
+
+class _Entry:
+    def __init__(self, fetch, ttl, sync):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.sync = sync
+        self.snapshot_checked = False
+        self.data = None
+        self.loaded_at = None
+        self.version = 0
+        self.force_refresh = False
+        self.refreshing = False
+        self.lock = threading.Lock()
+        # Estruturas derivadas do snapshot atual: {chave: (snapshot, valor)}
+        self.derived = {}
+        self.derived_lock = threading.Lock()
+        # Snapshot anterior quando o atual só acrescentou linhas no final (carga incremental)
+        self.appended_to = None
+
+    def fingerprint(self):
+        # Só a versão: uma recarga sem alterações (mesmo snapshot) não descarta os memoizados
+        return self.version
+
+    def is_stale(self):
+        return self.loaded_at is None or time.time() - self.loaded_at > self.ttl
+
+class DatasetStore:
+    """
+    Store de datasets compartilhado por todo o processo (stale-while-revalidate).
+
+    - A primeira leitura de um dataset bloqueia até a carga terminar.
+    - Depois do TTL, a leitura devolve o último snapshot válido na hora e dispara
+      a atualização em uma thread em segundo plano.
+    - Todas as sessões recebem o mesmo objeto: os DataFrames devem ser tratados
+      como somente leitura (use assign/rename/copy antes de alterar).
+    - Cada carga é gravada em um snapshot Feather local; num cold start o snapshot
+      é servido na hora e reconciliado com a origem em segundo plano.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._memo_caches = {}
+
+    def register(self, name, fetch, ttl=600, sync=None):
+        """
+        Registra um dataset. fetch(previous) recebe o snapshot atual (None na
+        primeira carga) e devolve o novo, ou o próprio previous se nada mudou.
+        sync (opcional) expõe state()/restore(state) para o fingerprint da origem
+        ser gravado junto com o snapshot local.
+        """
+        if name not in self._entries:
+            self._entries[name] = _Entry(fetch, ttl, sync)
+
+    def _entry(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Dataset não registrado: {name}")
+
+    def _restore_snapshot(self, entry, name):
+        with entry.lock:
+            if entry.snapshot_checked:
+                return
+            entry.snapshot_checked = True
+            snapshot = load_snapshot(name)
+            if snapshot is None:
+                return
+            data, meta = snapshot
+            entry.data = data
+            entry.version += 1
+            # loaded_at = None: o snapshot é considerado velho e será reconciliado
+            entry.loaded_at = None
+            if entry.sync is not None and meta.get("sync"):
+                entry.sync.restore(meta["sync"])
+            logger.info(f"Dataset '{name}' servido do snapshot local")
+
+    def get(self, name):
+        entry = self._entry(name)
+        if not entry.snapshot_checked:
+            self._restore_snapshot(entry, name)
+        if offline():
+            if entry.data is None:
+                raise RuntimeError(f"Dataset '{name}' sem snapshot local (modo offline)")
+            return entry.data
+        if entry.data is None or entry.force_refresh:
+            return self.refresh(name)
+        if entry.is_stale():
+            self._refresh_in_background(entry, name)
+        return entry.data
+
+    def refresh(self, name):
+        """Recarrega o dataset de forma síncrona e devolve o novo snapshot"""
+        entry = self._entry(name)
+        with entry.lock:
+            # Outra thread pode ter recarregado enquanto esperávamos o lock
+            if entry.data is not None and not entry.force_refresh and not entry.is_stale():
+                return entry.data
+            self._load(entry, name)
+            return entry.data
+
+    def _load(self, entry, name):
+        started = time.perf_counter()
+        # O fetch recebe o snapshot atual e pode devolvê-lo intacto quando a origem não mudou
+        data = entry.fetch(entry.data)
+        entry.loaded_at = time.time()
+        entry.force_refresh = False
+        if data is entry.data:
+            logger.info(f"Dataset '{name}' sem alterações na origem")
+            return
+        # O sync informa se a carga só acrescentou linhas (permite estender estruturas derivadas)
+        entry.appended_to = entry.data if getattr(entry.sync, "appended_only", False) else None
+        entry.data = data
+        entry.version += 1
+        logger.info(f"Dataset '{name}' carregado (versão {entry.version}) em {time.perf_counter() - started:.2f}s, {memory_usage(data) / 2**20:.1f} MiB")
+        save_snapshot(name, data, entry.sync.state() if entry.sync is not None else None, entry.version)
+
+    def _refresh_in_background(self, entry, name):
+        with entry.lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+
+        def run():
+            try:
+                with entry.lock:
+                    self._load(entry, name)
+            except Exception as e:
+                # Mantém o último snapshot válido
+                logger.warning(f"Falha ao atualizar dataset '{name}': {e}")
+            finally:
+                entry.refreshing = False
+
+        threading.Thread(target=run, name=f"refresh-{name}", daemon=True).start()
+
+    def derived(self, name, key, build, extend=None):
+        """
+        Devolve build(snapshot) para o snapshot atual do dataset, construído uma
+        única vez por versão (índices, agregados). A chave de cache é o próprio
+        objeto do snapshot, então o valor nunca mistura versões diferentes.
+
+        Com extend(valor, snapshot), quando o snapshot atual só acrescentou linhas
+        ao anterior, o valor antigo é estendido em vez de reconstruído.
+        """
+        entry = self._entry(name)
+        data = self.get(name)
+        cached = entry.derived.get(key)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        with entry.derived_lock:
+            cached = entry.derived.get(key)
+            if cached is not None and cached[0] is data:
+                return cached[1]
+            if extend is not None and cached is not None and entry.appended_to is cached[0] and entry.data is data:
+                value = extend(cached[1], data)
+            else:
+                value = build(data)
+            entry.derived[key] = (data, value)
+            return value
+
+    def mutate(self, name, patch, derived=None, since=None):
+        """
+        Write-through: aplica ao snapshot em memória a alteração que acabou de ser
+        gravada na origem, sem recarregar o dataset nem limpar outros caches.
+
+        Args:
+            patch: função snapshot -> novo snapshot, ou None quando a alteração não
+                se aplica ao snapshot atual (ex.: linha não encontrada); nesse caso
+                o dataset é invalidado
+            derived: {chave: função(valor, novo snapshot) -> novo valor} para
+                atualizar estruturas derivadas (ex.: cubo) em vez de reconstruí-las
+            since: momento (time.time()) em que a escrita começou; se uma carga
+                terminou depois disso, ela pode já conter a escrita e o dataset é
+                apenas invalidado, para não aplicar a alteração duas vezes
+        """
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.data is None:
+                # Nada carregado ainda: a primeira leitura já trará a alteração
+                return
+            if since is not None and entry.loaded_at is not None and entry.loaded_at >= since:
+                entry.force_refresh = True
+                return
+            previous = entry.data
+            data = patch(previous)
+            if data is None:
+                entry.force_refresh = True
+                logger.info(f"Dataset '{name}' invalidado: alteração não aplicável ao snapshot em memória")
+                return
+            with entry.derived_lock:
+                for key, update in (derived or {}).items():
+                    cached = entry.derived.get(key)
+                    if cached is not None and cached[0] is previous:
+                        entry.derived[key] = (data, update(cached[1], data))
+                entry.appended_to = None
+                entry.data = data
+                entry.version += 1
+            sync_state = entry.sync.state() if entry.sync is not None else None
+            version = entry.version
+        logger.info(f"Dataset '{name}' atualizado em memória (versão {version})")
+        # O snapshot local é regravado fora do caminho da requisição; com a versão,
+        # uma gravação que termine depois de outra mais nova é descartada
+        threading.Thread(target=save_snapshot, args=(name, data, sync_state, version), name=f"snapshot-{name}", daemon=True).start()
+
+    def fingerprint(self, name):
+        """Identidade barata do snapshot atual: a versão, que só muda quando o conteúdo muda"""
+        return self._entry(name).fingerprint()
+
+    def memoized(self, name, maxsize=256):
+        """
+        Decorador que memoiza fn(...) por (fingerprint do dataset, argumentos), num
+        LRU limitado com contadores de acertos/erros. Substitui o st.cache_data, que
+        precisaria serializar e hashear o DataFrame inteiro a cada chamada.
+        Listas nos argumentos são tratadas como tuplas.
+        """
+        def decorator(fn):
+            cache = TTLCache(maxsize=maxsize, ttl=None)
+            self._memo_caches[f"{name}.{fn.__name__}"] = cache
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = (self.fingerprint(name), _freeze(args), _freeze(kwargs))
+                value = cache.get(key, _MISSING)
+                if value is _MISSING:
+                    value = fn(*args, **kwargs)
+                    cache.set(key, value)
+                return value
+
+            wrapper.cache = cache
+            return wrapper
+        return decorator
+
+    def cache_stats(self):
+        """{dataset.função: {size, hits, misses}} das funções memoizadas"""
+        return {name: cache.stats() for name, cache in self._memo_caches.items()}
+
+    def invalidate(self, name):
+        """Força a próxima leitura a recarregar o dataset de forma síncrona"""
+        self._entry(name).force_refresh = True
+
+    def version(self, name):
+        return self._entry(name).version
+
+    def loaded_at(self, name):
+        return self._entry(name).loaded_at
+
+    def memory_report(self):
+        """{nome: {versão, linhas, bytes e bytes por coluna}} dos datasets já carregados"""
+        report = {}
+        for name, entry in self._entries.items():
+            data = entry.data
+            if data is None:
+                continue
+            parts = data if isinstance(data, tuple) else (data,)
+            report[name] = {
+                "version": entry.version,
+                "rows": [len(df) for df in parts],
+                "bytes": memory_usage(data),
+                "columns": [df.memory_usage(deep=True, index=False).to_dict() for df in parts],
+            }
+        return report
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+# Instância única do processo
+dataset_store = DatasetStore()
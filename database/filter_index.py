@@ -0,0 +1,76 @@
+import numpy as np
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+def _positions_by_value(series):
+    """{valor: posições ordenadas} de uma coluna (NaN fica de fora)"""
+    return series.groupby(series, observed=True, sort=False).indices
+
+class FilterIndex:
+    """
+    Índice de filtros de um DataFrame, construído uma vez por versão do dataset.
+
+    Para cada dimensão guarda {valor: array ordenado de posições}, além das
+    partições por ano e por (ano, mês). Um filtro vira a interseção dos arrays
+    (do menor para o maior), sem máscaras booleanas sobre o DataFrame inteiro e
+    sem df.copy(): sem filtros o próprio DataFrame é devolvido, e com filtros só
+    as linhas selecionadas são materializadas (take).
+
+    Args:
+        df: DataFrame tipado (somente leitura)
+        dimensions: colunas filtráveis por igualdade/isin
+        period: se True, indexa as colunas derivadas year/month
+    """
+
+    def __init__(self, df, dimensions, period=True):
+        self.df = df
+        self._values = {column: _positions_by_value(df[column]) for column in dimensions}
+        self._years = {}
+        self._months = {}
+        self._periods = {}
+        if period and len(df):
+            self._years = _positions_by_value(df["year"])
+            self._months = _positions_by_value(df["month"])
+            self._periods = df.groupby(["year", "month"], sort=False).indices
+
+    def values(self, column):
+        """Valores presentes na dimensão (com pelo menos uma linha)"""
+        return list(self._values[column])
+
+    def _period_positions(self, year, month):
+        if year and month:
+            return self._periods.get((year, month), _EMPTY)
+        if year:
+            return self._years.get(year, _EMPTY)
+        return self._months.get(month, _EMPTY)
+
+    def positions(self, year=None, month=None, equals=None, isin=None):
+        """
+        Posições das linhas que atendem a todos os filtros, ou None se não há filtro.
+        Valores None/vazios são ignorados; month 0 significa o ano inteiro.
+        """
+        candidates = []
+        if year or month:
+            candidates.append(self._period_positions(year, month))
+        for column, value in (equals or {}).items():
+            if value is not None:
+                candidates.append(self._values[column].get(value, _EMPTY))
+        for column, values in (isin or {}).items():
+            if values:
+                arrays = [self._values[column].get(value, _EMPTY) for value in values]
+                candidates.append(np.unique(np.concatenate(arrays)) if len(arrays) > 1 else arrays[0])
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        result = candidates[0]
+        for positions in candidates[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def select(self, year=None, month=None, equals=None, isin=None):
+        positions = self.positions(year, month, equals, isin)
+        if positions is None:
+            return self.df
+        return self.df.take(positions)
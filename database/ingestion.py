@@ -0,0 +1,137 @@
+import io
+import os
+import logging
+import importlib.util
+import urllib.request
+import pandas as pd
+from database.dataset_store import using_fixtures, FIXTURES_DIR_ENV
+from database.schema import coerce_numeric
+
+logger = logging.getLogger(__name__)
+
+# Força um backend específico (csv, calamine, values_api, openpyxl); vazio = automático
+BACKEND_ENV = "SHEET_INGESTION_BACKEND"
+
+def export_url(document_id, gid, fmt):
+    return f"https://docs.google.com/spreadsheets/d/{document_id}/export?format={fmt}&gid={gid}"
+
+def _finish(df, numeric_columns):
+    for column in numeric_columns or []:
+        if column in df.columns:
+            df[column] = coerce_numeric(df[column])
+    return df
+
+def _read_csv(source, text_columns, numeric_columns):
+    dtype = {column: "object" for column in text_columns or []}
+    # Linhas em branco são mantidas para a posição no DataFrame corresponder à linha da planilha
+    return _finish(pd.read_csv(source, dtype=dtype, skip_blank_lines=False), numeric_columns)
+
+# Tempo máximo (segundos) do download da exportação XLSX
+EXPORT_TIMEOUT = 60
+
+def _read_bytes(source):
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=EXPORT_TIMEOUT) as response:
+            return io.BytesIO(response.read())
+    with open(source, "rb") as file:
+        return io.BytesIO(file.read())
+
+def _xlsx_frame(rows, numeric_columns):
+    """
+    DataFrame a partir das linhas cruas da primeira aba do XLSX. O pd.read_excel
+    descarta linhas em branco no meio da aba, o que desalinharia a posição no
+    DataFrame da linha da planilha; por isso as células são lidas direto do
+    engine e passam pelo mesmo caminho do values_api.
+    """
+    rows = [["" if v is None else v for v in row] for row in rows]
+    if not rows:
+        return pd.DataFrame()
+    # Colunas vazias à direita do cabeçalho (formatação sem dados) são ignoradas
+    header = rows[0]
+    width = max((idx + 1 for idx, v in enumerate(header) if str(v).strip()), default=0)
+    return values_to_frame([row[:width] for row in rows], numeric_columns)
+
+def _read_calamine(source, text_columns, numeric_columns):
+    from python_calamine import CalamineWorkbook
+    sheet = CalamineWorkbook.from_filelike(_read_bytes(source)).get_sheet_by_index(0)
+    return _xlsx_frame(sheet.to_python(skip_empty_area=False), numeric_columns)
+
+def _read_openpyxl(source, text_columns, numeric_columns):
+    from openpyxl import load_workbook
+    workbook = load_workbook(_read_bytes(source), read_only=True, data_only=True)
+    try:
+        return _xlsx_frame(list(workbook.worksheets[0].iter_rows(values_only=True)), numeric_columns)
+    finally:
+        workbook.close()
+
+def values_to_frame(values, numeric_columns=None):
+    """
+    Converte o retorno de worksheet.get_values() (cabeçalho + linhas) em DataFrame.
+    Células vazias viram None e linhas em branco são mantidas (o schema as descarta),
+    para a posição no DataFrame corresponder à linha da planilha.
+    """
+    if not values:
+        return pd.DataFrame()
+    header, rows = values[0], values[1:]
+    width = len(header)
+    rows = [[None if v == "" else v for v in row] + [None] * (width - len(row)) for row in rows]
+    df = pd.DataFrame([row[:width] for row in rows], columns=header)
+    return _finish(df, numeric_columns)
+
+# Backends de arquivo: (formato da exportação, extensão da fixture, leitor, disponível?)
+FILE_BACKENDS = {
+    "csv": ("csv", "csv", _read_csv, lambda: True),
+    "calamine": ("xlsx", "xlsx", _read_calamine, lambda: importlib.util.find_spec("python_calamine") is not None),
+    "openpyxl": ("xlsx", "xlsx", _read_openpyxl, lambda: importlib.util.find_spec("openpyxl") is not None),
+}
+
+# Ordem automática: do parse mais rápido para o mais lento
+AUTO_ORDER = ["csv", "calamine", "values_api", "openpyxl"]
+
+def available_backends(get_worksheet=None):
+    backends = []
+    for name in AUTO_ORDER:
+        if name == "values_api":
+            if get_worksheet is not None and not using_fixtures():
+                backends.append(name)
+        elif FILE_BACKENDS[name][3]():
+            backends.append(name)
+    return backends
+
+def read_sheet(document_id, gid, fixture_name, text_columns=None, numeric_columns=None, get_worksheet=None):
+    """
+    Lê uma aba do Google Sheets com o backend de ingestão mais rápido disponível.
+
+    Tenta, em ordem: exportação CSV (parser C do pandas, dtypes explícitos),
+    XLSX com calamine, API de valores do Sheets (arrays crus via gspread) e,
+    por último, XLSX com openpyxl. Um backend que falha passa para o próximo.
+    Todos mantêm as linhas em branco: a posição no DataFrame corresponde à linha
+    da planilha (posição 0 = linha 2), usada pelo SheetSync e pelo sheet_row.
+
+    Args:
+        document_id, gid: Planilha e aba
+        fixture_name: Nome base (sem extensão) do arquivo local em DATASET_FIXTURES_DIR
+        text_columns: Colunas lidas como texto
+        numeric_columns: Colunas convertidas para número (removendo "$" e ",")
+        get_worksheet: função gid -> gspread.Worksheet (habilita o backend values_api)
+    """
+    forced = os.environ.get(BACKEND_ENV)
+    backends = [forced] if forced else available_backends(get_worksheet)
+    last_error = None
+    for name in backends:
+        try:
+            if name == "values_api":
+                values = get_worksheet(gid).get_values(value_render_option="UNFORMATTED_VALUE", date_time_render_option="FORMATTED_STRING")
+                return values_to_frame(values, numeric_columns)
+            fmt, extension, reader, _available = FILE_BACKENDS[name]
+            if using_fixtures():
+                source = os.path.join(os.environ[FIXTURES_DIR_ENV], f"{fixture_name}.{extension}")
+                if not os.path.exists(source):
+                    continue
+            else:
+                source = export_url(document_id, gid, fmt)
+            return reader(source, text_columns, numeric_columns)
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Backend de ingestão '{name}' falhou para a aba {gid}: {e}")
+    raise RuntimeError(f"Nenhum backend de ingestão conseguiu ler a aba {gid}: {last_error}")
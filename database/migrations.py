@@ -0,0 +1,93 @@
+"""
+Migrações do MongoDB.
+
+Uso (na raiz do repositório, com .streamlit/secrets.toml configurado):
+    python -m database.migrations backfill-area
+    python -m database.migrations create-indexes
+    python -m database.migrations hash-passwords
+    python -m database.migrations all
+"""
+import sys
+import logging
+from database.mongodb_utils import get_database, create_area_indexes, AREA_ROLES, AREA_INDEXES
+from database.auth import hash_password, HASH_PREFIX
+
+logger = logging.getLogger(__name__)
+
+def backfill_area(db):
+    """
+    Preenche o campo 'area' de documentos antigos a partir da role do autor.
+
+    Documentos sem 'area' eram associados à área pela role de admin do usuário
+    (ex: timesheet_admin -> 'timesheet'). Autores admin de mais de uma área não
+    têm uma área única: seus documentos ficam sem 'area' e continuam aparecendo
+    em todas essas áreas pelo filtro de area_query. Como o filtro também cobre
+    documentos ainda não migrados, a migração pode rodar antes ou depois do deploy.
+    """
+    areas_by_user = {}
+    for area, role in AREA_ROLES.items():
+        for user in db['users'].find({"roles": role}, {"_id": 1}):
+            areas_by_user.setdefault(user["_id"], []).append(area)
+    updated = {}
+    for area in AREA_ROLES:
+        user_ids = [user_id for user_id, areas in areas_by_user.items() if areas == [area]]
+        if not user_ids:
+            continue
+        for collection_name in AREA_INDEXES:
+            result = db[collection_name].update_many(
+                {"area": {"$exists": False}, "user_id": {"$in": user_ids}},
+                {"$set": {"area": area}}
+            )
+            updated[(collection_name, area)] = result.modified_count
+            logger.info(f"{collection_name}: {result.modified_count} documentos marcados com area='{area}'")
+    shared = [user_id for user_id, areas in areas_by_user.items() if len(areas) > 1]
+    for collection_name in AREA_INDEXES:
+        remaining = db[collection_name].count_documents({"area": {"$exists": False}})
+        if remaining:
+            kept = db[collection_name].count_documents({"area": {"$exists": False}, "user_id": {"$in": shared}})
+            logger.warning(
+                f"{collection_name}: {remaining} documentos continuam sem 'area' "
+                f"({kept} de autores admin de mais de uma área)"
+            )
+    return updated
+
+def create_indexes(db):
+    """Índices por área e o índice único de 'login' em users"""
+    create_area_indexes(db)
+    db['users'].create_index("login", unique=True)
+
+def hash_passwords(db):
+    """
+    Regrava com hash PBKDF2 as senhas legadas em texto puro (o login também faz
+    isso sob demanda, mas só para quem entra no app).
+    """
+    updated = 0
+    for user in db['users'].find({"password": {"$exists": True, "$not": {"$regex": f"^{HASH_PREFIX}\\$"}}}, {"password": 1}):
+        if not isinstance(user.get("password"), str) or not user["password"]:
+            continue
+        db['users'].update_one({"_id": user["_id"]}, {"$set": {"password": hash_password(user["password"])}})
+        updated += 1
+    logger.info(f"users: {updated} senhas regravadas com hash")
+    return updated
+
+COMMANDS = {
+    'backfill-area': backfill_area,
+    'create-indexes': create_indexes,
+    'hash-passwords': hash_passwords,
+}
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO)
+    command = argv[0] if argv else ''
+    if command not in COMMANDS and command != 'all':
+        print(__doc__)
+        return 1
+    db = get_database()
+    for name, run in COMMANDS.items():
+        if command in (name, 'all'):
+            logger.info(f"Executando {name}")
+            run(db)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
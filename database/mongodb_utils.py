@@ -1,7 +1,12 @@
 import streamlit as st
+import logging
 from pymongo import MongoClient
 from urllib.parse import quote_plus
 from bson import ObjectId
+from datetime import datetime
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 def get_mongo_uri():
     username = st.secrets["mongodb"]["username"]
@@ -11,22 +16,81 @@ def get_mongo_uri():
     uri = f"mongodb+srv://{username}:{password_escaped}@{cluster}/?retryWrites=true&w=majority&appName=BusinessOperationsReview&tls=true&tlsAllowInvalidCertificates=false"
     return uri
 
+# Valores padrão do pool; podem ser sobrescritos em st.secrets["mongodb"]
+DEFAULT_MAX_POOL_SIZE = 20
+DEFAULT_MAX_IDLE_TIME_MS = 300000
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 10000
+
+# Diretório de usuários (user_id -> nome) compartilhado entre sessões
+_user_directory = TTLCache(maxsize=2048, ttl=600)
+
+@st.cache_resource(show_spinner=False)
+def get_mongo_client():
+    """
+    Retorna o MongoClient compartilhado por todo o processo.
+
+    O cliente é criado uma única vez (lookup SRV + handshake TLS) e mantém um
+    pool de conexões reutilizado por todos os helpers e sessões. Configurável via
+    st.secrets["mongodb"]: max_pool_size, max_idle_time_ms, server_selection_timeout_ms.
+    """
+    config = st.secrets["mongodb"]
+    return MongoClient(
+        get_mongo_uri(),
+        tls=True,
+        tlsAllowInvalidCertificates=False,
+        maxPoolSize=int(config.get("max_pool_size", DEFAULT_MAX_POOL_SIZE)),
+        maxIdleTimeMS=int(config.get("max_idle_time_ms", DEFAULT_MAX_IDLE_TIME_MS)),
+        serverSelectionTimeoutMS=int(config.get("server_selection_timeout_ms", DEFAULT_SERVER_SELECTION_TIMEOUT_MS)),
+    )
+
+def get_database():
+    """Retorna o database configurado usando o cliente compartilhado"""
+    return get_mongo_client()[st.secrets["mongodb"]["database"]]
+
+# Role de administrador de cada área (documentos sem 'area' são associados por ela)
+AREA_ROLES = {
+    'timesheet': 'timesheet_admin',
+    'permit': 'permits_admin',
+    'accounting': 'accounting_admin',
+}
+
+# Índices compostos das coleções filtradas por área
+AREA_INDEXES = {
+    'monthly_highlights': [
+        [("area", 1), ("year", 1), ("month", 1)],
+        [("area", 1), ("user_id", 1), ("year", 1), ("month", 1)],
+    ],
+    'monthly_opportunities': [
+        [("area", 1), ("year", 1), ("month", 1)],
+        [("area", 1), ("user_id", 1), ("year", 1), ("month", 1)],
+    ],
+    'action_plans': [
+        [("area", 1), ("created_at", 1)],
+        [("area", 1), ("user_id", 1), ("created_at", 1)],
+    ],
+}
+
+def create_area_indexes(db):
+    """Cria (idempotente) os índices de AREA_INDEXES"""
+    for collection_name, indexes in AREA_INDEXES.items():
+        for keys in indexes:
+            db[collection_name].create_index(keys)
+
+@st.cache_resource(show_spinner=False)
+def ensure_area_indexes():
+    """Garante os índices por área uma única vez por processo"""
+    try:
+        create_area_indexes(get_database())
+        return True
+    except Exception as e:
+        logger.warning(f"Não foi possível criar os índices por área: {e}")
+        return False
+
 def get_users_by_role(role):
-    """Busca todos os usuários que possuem uma determinada role"""
+    """Busca os ids dos usuários que possuem uma determinada role"""
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
-        users_collection = db['users']
-        
-        # Buscar usuários que possuem a role especificada
-        users = list(users_collection.find({"roles": role}))
-        
-        # Log para debug
-        print(f"Encontrados {len(users)} usuários com role '{role}'")
-        for user in users:
-            print(f"  - {user.get('name', 'Sem nome')} (ID: {user.get('_id')})")
-        
+        db = get_database()
+        users = db['users'].find({"roles": role}, {"_id": 1})
         return [str(user["_id"]) for user in users]
     except Exception as e:
         st.error(f"Erro ao buscar usuários por role '{role}': {e}")
@@ -42,9 +106,7 @@ def get_collection_data(collection_name, include_id=False, user_role_filter=None
         user_role_filter: Role para filtrar usuários (ex: 'permits_admin', 'timesheet_admin')
     """
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True,tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
+        db = get_database()
         collection = db[collection_name]
         
         # Se há filtro por role, buscar usuários com essa role
@@ -70,6 +132,30 @@ def get_collection_data(collection_name, include_id=False, user_role_filter=None
         st.error(f"Erro ao carregar dados da coleção '{collection_name}': {e}")
         return []
 
+def area_query(collection_name, area):
+    """
+    Filtro por área de uma coleção
+
+    Documentos sem o campo 'area' (anteriores à migração backfill-area, ou de
+    autores admin de mais de uma área) são associados à área pela role de admin
+    do autor. Em action_plans o documento precisa ser da área E de um admin dela.
+    """
+    if not area:
+        return {}
+    role = AREA_ROLES.get(area)
+    user_ids = get_users_by_role(role) if role else []
+    if not user_ids:
+        return {"area": area}
+    user_object_ids = [ObjectId(user_id) for user_id in user_ids]
+    if collection_name == 'action_plans':
+        return {"area": area, "user_id": {"$in": user_object_ids}}
+    return {
+        "$or": [
+            {"area": area},
+            {"area": {"$exists": False}, "user_id": {"$in": user_object_ids}},
+        ]
+    }
+
 def get_collection_data_by_area(collection_name, include_id=False, area_filter=None):
     """
     Carrega dados de uma coleção com filtro por área/tab
@@ -80,111 +166,177 @@ def get_collection_data_by_area(collection_name, include_id=False, area_filter=N
         area_filter: Área para filtrar (ex: 'timesheet', 'permit')
     """
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
+        db = get_database()
         collection = db[collection_name]
-        
-        # Se há filtro por área, filtrar documentos por essa área
-        if area_filter:
-            # Para dados existentes que não têm campo 'area', usar filtro por role do usuário
-            if area_filter == 'timesheet':
-                user_ids = get_users_by_role('timesheet_admin')
-            elif area_filter == 'permit':
-                user_ids = get_users_by_role('permits_admin')
-            elif area_filter == 'accounting':
-                user_ids = get_users_by_role('accounting_admin')
-            else:
-                user_ids = []
-            if user_ids:
-                user_object_ids = [ObjectId(user_id) for user_id in user_ids]
-                # Se for action_plans, filtrar E (não OU)
-                if collection_name == 'action_plans':
-                    filter_query = {"user_id": {"$in": user_object_ids}, "area": area_filter}
-                else:
-                    filter_query = {
-                        "$or": [
-                            {"area": area_filter},
-                            {"user_id": {"$in": user_object_ids}}
-                        ]
-                    }
-            else:
-                filter_query = {"area": area_filter}
-        else:
-            filter_query = {}
-        
+        ensure_area_indexes()
+
+        filter_query = area_query(collection_name, area_filter)
+
         if include_id:
             data = list(collection.find(filter_query))
         else:
             data = list(collection.find(filter_query, {"_id": 0}))
-        
-        # Log para debug
-        print(f"Coleção '{collection_name}' - Filtro: {area_filter} - Encontrados: {len(data)} documentos")
-        
         return data
     except Exception as e:
         st.error(f"Erro ao carregar dados da coleção '{collection_name}': {e}")
         return []
 
-def insert_document(collection_name, document):
+# Campos que a barra lateral das páginas realmente renderiza
+SIDEBAR_PROJECTIONS = {
+    'monthly_highlights': {"user_id": 1, "year": 1, "month": 1, "positive": 1, "negative": 1},
+    'monthly_opportunities': {"user_id": 1, "year": 1, "month": 1, "opportunity_list": 1},
+    'action_plans': {"user_id": 1, "title": 1, "description": 1, "created_at": 1, "area": 1, "subplans": 1},
+}
+
+def build_period_query(collection_name, area, year, month=None):
+    """
+    Monta o filtro por área e período de uma coleção
+
+    action_plans é filtrado pelo intervalo de created_at; as demais coleções
+    pelos campos year/month.
+    """
+    # Os selects das páginas entregam inteiros do numpy, que o BSON não codifica
+    year = int(year)
+    month = int(month) if month else None
+    query = area_query(collection_name, area)
+    if collection_name == 'action_plans':
+        if month:
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        else:
+            start = datetime(year, 1, 1)
+            end = datetime(year + 1, 1, 1)
+        query["created_at"] = {"$gte": start, "$lt": end}
+    else:
+        query["year"] = year
+        if month:
+            query["month"] = month
+    return query
+
+def find_by_period(collection_name, area, year, month=None, projection=None, skip=0, limit=0):
+    """
+    Busca documentos de uma área filtrando ano/mês no próprio MongoDB
+
+    Args:
+        collection_name: 'monthly_highlights', 'monthly_opportunities' ou 'action_plans'
+        area: Área dos documentos (ex: 'timesheet', 'permit')
+        year: Ano selecionado
+        month: Mês selecionado (None ou 0 = ano completo)
+        projection: Campos retornados (padrão: SIDEBAR_PROJECTIONS da coleção)
+        skip, limit: Paginação (limit=0 = sem limite)
+    """
+    try:
+        ensure_area_indexes()
+        collection = get_database()[collection_name]
+        query = build_period_query(collection_name, area, year, month)
+        if projection is None:
+            projection = SIDEBAR_PROJECTIONS.get(collection_name)
+        sort = [("created_at", 1)] if collection_name == 'action_plans' else [("year", 1), ("month", 1)]
+        cursor = collection.find(query, projection).sort(sort).skip(skip).limit(limit)
+        return list(cursor)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados da coleção '{collection_name}': {e}")
+        return []
+
+def insert_document(collection_name, document, raise_errors=False):
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
+        db = get_database()
         collection = db[collection_name]
         result = collection.insert_one(document)
         return str(result.inserted_id)
     except Exception as e:
+        # Escritas em segundo plano (write_queue) tratam o erro fora do script
+        if raise_errors:
+            raise
         st.error(f"Erro ao inserir documento na coleção '{collection_name}': {e}")
         return None
 
-def update_document(collection_name, filter_query, update_fields):
+def update_document(collection_name, filter_query, update_fields, raise_errors=False):
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
+        db = get_database()
         collection = db[collection_name]
         result = collection.update_one(filter_query, {"$set": update_fields})
+        _invalidate_users_cache(collection_name, filter_query)
         return result.modified_count > 0
     except Exception as e:
+        # Escritas em segundo plano (write_queue) tratam o erro fora do script
+        if raise_errors:
+            raise
         st.error(f"Erro ao atualizar documento na coleção '{collection_name}': {e}")
         return False
 
-def delete_document(collection_name, filter_query):
+def delete_document(collection_name, filter_query, raise_errors=False):
     try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
+        db = get_database()
         collection = db[collection_name]
         result = collection.delete_one(filter_query)
+        _invalidate_users_cache(collection_name, filter_query)
         return result.deleted_count > 0
     except Exception as e:
+        # Escritas em segundo plano (write_queue) tratam o erro fora do script
+        if raise_errors:
+            raise
         st.error(f"Erro ao remover documento da coleção '{collection_name}': {e}")
         return False
 
-def get_user_name(user_id):
-    """Busca o nome do usuário na collection 'users' pelo user_id"""
-    try:
-        uri = get_mongo_uri()
-        client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
-        db = client[st.secrets["mongodb"]["database"]]
-        users_collection = db['users']
-        
-        # Converter user_id para ObjectId se for string, ou usar diretamente se já for ObjectId
-        if isinstance(user_id, str):
-            try:
-                user_id_obj = ObjectId(user_id)
-            except:
-                return 'ID de usuário inválido'
-        else:
-            user_id_obj = user_id
-            
-        user = users_collection.find_one({"_id": user_id_obj})
-        
-        if user:
-            return user.get('name', 'Usuário não encontrado')
+def get_user_names(user_ids):
+    """
+    Resolve nomes de vários usuários com uma única consulta $in na collection 'users'
+
+    Os nomes ficam no diretório de usuários em memória (TTL/LRU), compartilhado
+    entre sessões; só os ids ausentes no cache vão ao banco.
+
+    Returns:
+        dict {str(user_id): nome}
+    """
+    names = {}
+    lookup = {}
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        key = str(user_id)
+        if key in names or key in lookup:
+            continue
+        if isinstance(user_id, ObjectId):
+            lookup[key] = user_id
+        elif ObjectId.is_valid(key):
+            lookup[key] = ObjectId(key)
         else:
-            return 'Usuário não encontrado'
+            names[key] = 'ID de usuário inválido'
+
+    cached, missing = _user_directory.get_many(list(lookup))
+    names.update(cached)
+    if not missing:
+        return names
+
+    try:
+        db = get_database()
+        users = db['users'].find({"_id": {"$in": [lookup[key] for key in missing]}}, {"name": 1})
+        found = {str(user["_id"]): user.get('name', 'Usuário não encontrado') for user in users}
     except Exception as e:
-        st.error(f"Erro ao buscar usuário: {e}")
-        return 'Erro ao buscar usuário' 
\ No newline at end of file
+        st.error(f"Erro ao buscar usuários: {e}")
+        names.update({key: 'Erro ao buscar usuário' for key in missing})
+        return names
+
+    for key in missing:
+        name = found.get(key, 'Usuário não encontrado')
+        _user_directory.set(key, name)
+        names[key] = name
+    return names
+
+def get_user_name(user_id):
+    """Busca o nome do usuário na collection 'users' pelo user_id"""
+    return get_user_names([user_id]).get(str(user_id), 'Usuário não encontrado')
+
+def invalidate_user_directory(user_id=None):
+    """Descarta nomes em cache (de um usuário ou de todos) após alterações em 'users'"""
+    if user_id is None:
+        _user_directory.invalidate()
+    else:
+        _user_directory.invalidate(str(user_id))
+
+def _invalidate_users_cache(collection_name, filter_query):
+    if collection_name != 'users':
+        return
+    user_id = filter_query.get('_id') if isinstance(filter_query, dict) else None
+    invalidate_user_directory(user_id if isinstance(user_id, (ObjectId, str)) else None)
@@ -0,0 +1,239 @@
+import time
+import logging
+import threading
+
+from gspread.utils import rowcol_to_a1, absolute_range_name
+
+from database.sheet_sync import SheetSync
+
+logger = logging.getLogger(__name__)
+
+APPEND, UPDATE, DELETE = "append", "update", "delete"
+
+class PendingWrite:
+    """
+    Resultado de uma escrita enfileirada no MutationBuffer.
+
+    Attributes:
+        kind: "append", "update" ou "delete"
+        row: linha da planilha (para appends, preenchida após o flush)
+        values: valores da linha (append/update)
+        context: dados do chamador repassados ao listener da aba
+        ok: None enquanto pendente; True/False após o flush
+        error: exceção da chamada que falhou
+        written_at: momento (time.time()) em que o flush começou
+        response: resposta da API (appends: a do values.append do lote, com os
+            valores gravados em updates.updatedData)
+    """
+
+    def __init__(self, kind, gid, row=None, values=None, context=None):
+        self.kind = kind
+        self.gid = gid
+        self.row = row
+        self.values = values
+        self.context = context or {}
+        self.ok = None
+        self.error = None
+        self.written_at = None
+        self.response = None
+        self._event = threading.Event()
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Espera o flush e devolve ok (None se o tempo acabar antes)"""
+        self._event.wait(timeout)
+        return self.ok
+
+    def _finish(self, error=None):
+        self.ok = error is None
+        self.error = error
+        self._event.set()
+
+class MutationBuffer:
+    """
+    Buffer de escritas no Google Sheets, por aba.
+
+    Appends, edições e remoções enfileirados viram, no flush, no máximo três
+    chamadas por aba: um batch_update com todas as edições, um batch_update da
+    planilha com as remoções (de baixo para cima) e um values.append com as
+    linhas novas (a resposta já traz os valores gravados, sem releitura). O flush acontece quando a aba junta max_writes escritas,
+    max_delay segundos após a primeira escrita pendente, ou em commit().
+
+    As linhas de update()/delete() referem-se à planilha antes do lote (a mesma
+    numeração do snapshot em memória): as edições são aplicadas primeiro e as
+    remoções de baixo para cima, para que uma não desloque a outra.
+
+    Depois de cada flush, o listener da aba (listen) recebe as escritas do lote,
+    na ordem em que foram aplicadas (edições, remoções, appends), para atualizar
+    o estado em memória uma única vez.
+
+    Args:
+        get_worksheet: função gid -> gspread.Worksheet
+        max_writes: escritas pendentes por aba que disparam o flush
+        max_delay: segundos até o flush automático (None = só por tamanho/commit)
+        value_input_option: como o Sheets interpreta os valores escritos; RAW grava
+            o texto como veio (sem fórmulas nem conversão pela localidade da planilha)
+        on_error: função gid chamada quando uma gravação da aba falha (ex.: descartar
+            o handle da aba em cache, que pode ter sido renomeada ou recriada)
+    """
+
+    def __init__(self, get_worksheet, max_writes=50, max_delay=2.0, value_input_option="RAW", on_error=None):
+        self.get_worksheet = get_worksheet
+        self.on_error = on_error
+        self.max_writes = max_writes
+        self.max_delay = max_delay
+        self.value_input_option = value_input_option
+        self._pending = {}
+        self._listeners = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._api_calls = 0
+
+    def listen(self, gid, fn):
+        """Registra fn(writes), chamada após cada flush da aba gid"""
+        self._listeners[gid] = fn
+
+    def append(self, gid, values, context=None):
+        return self._queue(PendingWrite(APPEND, gid, values=list(values), context=context))
+
+    def update(self, gid, sheet_row, values, context=None):
+        return self._queue(PendingWrite(UPDATE, gid, row=sheet_row, values=list(values), context=context))
+
+    def delete(self, gid, sheet_row, context=None):
+        return self._queue(PendingWrite(DELETE, gid, row=sheet_row, context=context))
+
+    def _queue(self, write):
+        with self._lock:
+            pending = self._pending.setdefault(write.gid, [])
+            if write.kind == DELETE:
+                # A mesma linha removida duas vezes no lote apagaria a linha de baixo
+                for queued in pending:
+                    if queued.kind == DELETE and queued.row == write.row:
+                        return queued
+            pending.append(write)
+            full = len(pending) >= self.max_writes
+            if not full and self._timer is None and self.max_delay is not None:
+                self._timer = threading.Timer(self.max_delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush(write.gid)
+        return write
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def pending(self, gid=None):
+        """Número de escritas pendentes (de uma aba ou de todas)"""
+        with self._lock:
+            if gid is not None:
+                return len(self._pending.get(gid, []))
+            return sum(len(writes) for writes in self._pending.values())
+
+    def commit(self):
+        """Grava todas as escritas pendentes agora"""
+        return self.flush()
+
+    def flush(self, gid=None):
+        """Grava as escritas pendentes (de uma aba ou de todas) e devolve-as com o resultado"""
+        flushed = []
+        with self._flush_lock:
+            with self._lock:
+                gids = [gid] if gid is not None else list(self._pending)
+                batches = [(g, self._pending.pop(g, [])) for g in gids]
+                if not self._pending and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            for tab, writes in batches:
+                if writes:
+                    self._flush_tab(tab, writes)
+                    flushed.extend(writes)
+        return flushed
+
+    def _call(self, writes, fn):
+        """Executa uma chamada da API para um grupo de escritas; a falha marca só esse grupo"""
+        if not writes:
+            return None
+        try:
+            self._api_calls += 1
+            return fn()
+        except Exception as e:
+            logger.error(f"Falha ao gravar {len(writes)} escrita(s) ({writes[0].kind}): {e}")
+            for write in writes:
+                write.error = e
+            self._failed(writes[0].gid)
+            return None
+
+    def _failed(self, gid):
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(gid)
+        except Exception as e:
+            logger.warning(f"Falha no tratamento de erro da aba {gid}: {e}")
+
+    def _append(self, worksheet, appends):
+        # Equivale ao append_rows do gspread, pedindo os valores gravados na resposta
+        # renderizados como o SheetSync os lê (hash da última linha sem nova leitura)
+        return worksheet.spreadsheet.values_append(
+            absolute_range_name(worksheet.title),
+            params={
+                "valueInputOption": self.value_input_option,
+                "includeValuesInResponse": True,
+                "responseValueRenderOption": "UNFORMATTED_VALUE",
+                "responseDateTimeRenderOption": "FORMATTED_STRING",
+            },
+            body={"values": [w.values for w in appends]},
+        )
+
+    def _flush_tab(self, gid, writes):
+        started = time.perf_counter()
+        written_at = time.time()
+        for write in writes:
+            write.written_at = written_at
+        updates = [w for w in writes if w.kind == UPDATE]
+        deletes = sorted((w for w in writes if w.kind == DELETE), key=lambda w: w.row, reverse=True)
+        appends = [w for w in writes if w.kind == APPEND]
+        try:
+            worksheet = self.get_worksheet(gid)
+        except Exception as e:
+            logger.error(f"Aba {gid} indisponível para gravação: {e}")
+            self._failed(gid)
+            for write in writes:
+                write._finish(e)
+            return
+
+        self._call(updates, lambda: worksheet.batch_update(
+            [{"range": f"{rowcol_to_a1(w.row, 1)}:{rowcol_to_a1(w.row, len(w.values))}", "values": [w.values]} for w in updates],
+            value_input_option=self.value_input_option,
+        ))
+        self._call(deletes, lambda: worksheet.spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS", "startIndex": w.row - 1, "endIndex": w.row}}}
+            for w in deletes
+        ]}))
+        response = self._call(appends, lambda: self._append(worksheet, appends))
+        if response is not None:
+            rows = SheetSync.appended_rows(response)
+            for offset, write in enumerate(appends):
+                write.response = response
+                write.row = rows[0] + offset if rows else None
+
+        applied = updates + deletes + appends
+        listener = self._listeners.get(gid)
+        if listener is not None:
+            try:
+                listener([w for w in applied if w.error is None])
+            except Exception as e:
+                logger.warning(f"Falha ao aplicar o lote da aba {gid} em memória: {e}")
+        for write in applied:
+            write._finish(write.error)
+        logger.info(f"Aba {gid}: {len(writes)} escrita(s) gravada(s) em {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def stats(self):
+        return {"pending": self.pending(), "api_calls": self._api_calls}
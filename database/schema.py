@@ -0,0 +1,150 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+def coerce_numeric(series):
+    """Converte para número, aceitando valores formatados ("$1,234.50")"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    cleaned = series.astype(str).str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(cleaned.replace({"": None, "nan": None, "None": None}), errors="coerce")
+
+def coerce_datetime(series, fmt=None):
+    """Converte para datetime; com fmt, tenta o formato fixo antes do parse genérico"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if fmt is None:
+        return pd.to_datetime(series, errors="coerce")
+    parsed = pd.to_datetime(series, format=fmt, errors="coerce")
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], errors="coerce")
+    return parsed
+
+def downcast_numeric(series, tolerance=0.005):
+    """
+    Reduz o tipo numérico: inteiros para o menor inteiro que comporta os valores
+    e floats para float32 quando o erro de arredondamento fica abaixo de tolerance
+    (meio centavo por padrão), mantendo float64 caso contrário.
+    """
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+        narrow = series.astype(np.float32)
+        error = (narrow.astype(np.float64) - series).abs().max()
+        if pd.isna(error) or error < tolerance:
+            return narrow
+    return series
+
+def memory_usage(data):
+    """Bytes ocupados por um DataFrame ou tupla de DataFrames (inclui strings)"""
+    parts = data if isinstance(data, tuple) else (data,)
+    return int(sum(df.memory_usage(deep=True).sum() for df in parts))
+
+class DatasetSchema:
+    """
+    Schema declarativo de um dataset, aplicado uma única vez na carga.
+
+    O DataFrame tipado resultante é o que fica no DatasetStore (e no snapshot
+    local), então as páginas não repetem conversões a cada rerun.
+
+    Args:
+        renames: {coluna de origem: coluna final}
+        text: colunas finais mantidas como texto
+        numeric: colunas finais convertidas para número
+        dates: {coluna final: formato strftime ou None}
+        categories: colunas de dimensão guardadas como categorical, com um
+            dicionário ordenado por dataset (cat.categories serve de lista de opções)
+        period: coluna de data que gera as colunas derivadas year/month;
+            linhas com data inválida nessa coluna são descartadas
+        downcast: reduz os tipos numéricos (inclusive year/month)
+        strip_columns: remove espaços dos nomes das colunas de origem
+        row_number: nome da coluna derivada com o número da linha na planilha
+            (cabeçalho na linha 1), calculado antes de descartar linhas
+
+    Linhas totalmente em branco são sempre descartadas.
+    """
+
+    def __init__(self, renames=None, text=None, numeric=None, dates=None, categories=None, period=None, downcast=True, strip_columns=True, row_number=None):
+        self.renames = renames or {}
+        self.text = list(text or [])
+        self.numeric = list(numeric or [])
+        self.dates = dict(dates or {})
+        self.categories = list(categories or [])
+        self.period = period
+        self.downcast = downcast
+        self.strip_columns = strip_columns
+        self.row_number = row_number
+
+    @property
+    def derived(self):
+        derived = ["year", "month"] if self.period else []
+        return derived + ([self.row_number] if self.row_number else [])
+
+    def source_columns(self, df):
+        """Colunas que vêm da origem (sem as derivadas), na ordem do DataFrame"""
+        return [column for column in df.columns if column not in self.derived]
+
+    def apply(self, df, row_numbers=None):
+        """
+        Devolve uma cópia tipada de df (nomes, tipos, datas e colunas derivadas).
+        row_numbers: linhas da planilha de cada linha de df (padrão: a partir da 2)
+        """
+        if self.strip_columns:
+            df = df.rename(columns=lambda column: str(column).strip())
+        df = df.rename(columns=self.renames)
+        source = list(df.columns)
+        if self.row_number:
+            df = df.assign(**{self.row_number: np.arange(2, len(df) + 2) if row_numbers is None else list(row_numbers)})
+        df = df.dropna(how="all", subset=source)
+        columns = {}
+        for column in self.text:
+            if column in df.columns:
+                columns[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        for column in self.numeric:
+            if column in df.columns:
+                columns[column] = coerce_numeric(df[column])
+        for column, fmt in self.dates.items():
+            if column in df.columns:
+                columns[column] = coerce_datetime(df[column], fmt)
+        df = df.assign(**columns)
+        if self.period:
+            df = df.dropna(subset=[self.period])
+            df = df.assign(
+                year=df[self.period].dt.year.astype(int),
+                month=df[self.period].dt.month.astype(int),
+            )
+        columns = {}
+        for column in self.categories:
+            if column in df.columns:
+                values = df[column]
+                columns[column] = pd.Categorical(values, categories=sorted(values.dropna().unique()))
+        if self.downcast:
+            for column in self.numeric + self.derived:
+                if column in df.columns:
+                    columns[column] = downcast_numeric(df[column])
+        df = df.assign(**columns)
+        return df.reset_index(drop=True)
+
+    def concat(self, previous, appended):
+        """
+        Concatena dois DataFrames tipados por este schema, unindo os dicionários
+        das colunas categóricas (sem isso o pandas voltaria a usar object).
+        """
+        columns_prev, columns_new = {}, {}
+        for column in self.categories:
+            if column in previous.columns and column in appended.columns:
+                merged = sorted(set(previous[column].cat.categories) | set(appended[column].cat.categories))
+                columns_prev[column] = previous[column].cat.set_categories(merged)
+                columns_new[column] = appended[column].cat.set_categories(merged)
+        df = pd.concat([previous.assign(**columns_prev), appended.assign(**columns_new)], ignore_index=True)
+        if self.downcast:
+            df = df.assign(**{column: downcast_numeric(df[column]) for column in self.numeric + self.derived if column in df.columns})
+        return df
+
+    def replace(self, df, position, rows):
+        """Substitui a linha na posição position por rows (já tipadas por apply; vazio = remover)"""
+        head, tail = df.iloc[:position], df.iloc[position + 1:]
+        return self.concat(self.concat(head, rows), tail)
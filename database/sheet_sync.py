@@ -0,0 +1,228 @@
+import re
+import hashlib
+import logging
+import threading
+import pandas as pd
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from gspread.utils import rowcol_to_a1
+from database.dataset_store import using_fixtures
+from database.ingestion import values_to_frame
+
+logger = logging.getLogger(__name__)
+
+# Depois de N sincronizações incrementais seguidas, faz uma carga completa por segurança
+FULL_RELOAD_EVERY = 6
+
+def row_hash(values):
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode("utf-8")).hexdigest()
+
+def content_hash(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+class SheetSync:
+    """
+    Sincronização condicional de uma planilha do Google Sheets.
+
+    Antes de baixar a exportação, consulta o modifiedTime do arquivo no Drive
+    (uma chamada de metadados). Desativada com DATASET_FIXTURES_DIR. Se não mudou, o snapshot atual é mantido. Se
+    mudou e as abas só receberam linhas no final, busca apenas essas linhas pela
+    API do gspread; caso contrário, o chamador faz a carga completa.
+
+    Args:
+        get_worksheet: função gid -> gspread.Worksheet
+    """
+
+    def __init__(self, get_worksheet):
+        self.get_worksheet = get_worksheet
+        self.signal = None
+        self._pending_signal = None
+        self._tabs = {}
+        self._incremental_syncs = 0
+        # True quando a última carga só acrescentou linhas (lido pelo DatasetStore)
+        self.appended_only = False
+        # O estado é alterado pelos listeners do MutationBuffer (threads de escrita)
+        # e pela thread de atualização do DatasetStore (fetch_appended/commit)
+        self._lock = threading.RLock()
+
+    def _modified_time(self, gid):
+        try:
+            spreadsheet = self.get_worksheet(gid).spreadsheet
+            response = spreadsheet.client.request(
+                "get",
+                f"{DRIVE_FILES_API_V3_URL}/{spreadsheet.id}",
+                params={"fields": "modifiedTime", "supportsAllDrives": True},
+            )
+            return response.json().get("modifiedTime")
+        except Exception as e:
+            logger.warning(f"Não foi possível ler o modifiedTime da planilha: {e}")
+            return None
+
+    def unchanged(self, gid):
+        """True se a planilha não mudou desde o último commit()"""
+        signal = None if using_fixtures() else self._modified_time(gid)
+        with self._lock:
+            self.appended_only = False
+            self._pending_signal = signal
+            return signal is not None and signal == self.signal
+
+    def commit(self):
+        with self._lock:
+            self.signal = self._pending_signal
+
+    def state(self):
+        """Estado serializável (gravado junto com o snapshot local)"""
+        with self._lock:
+            # Cópia: o snapshot é serializado em outra thread
+            return {"signal": self.signal, "tabs": {gid: dict(tab) for gid, tab in self._tabs.items()}}
+
+    def restore(self, state):
+        with self._lock:
+            self.signal = state.get("signal")
+            self._tabs = {gid: dict(tab) for gid, tab in (state.get("tabs") or {}).items()}
+
+    def _tail_values(self, worksheet, first_row, width):
+        # Intervalo aberto (ex.: A120:I): o row_count do handle em cache não
+        # acompanha as linhas acrescentadas depois que ele foi aberto
+        last_column = re.sub(r"\d+", "", rowcol_to_a1(1, width))
+        return worksheet.get_values(
+            f"{rowcol_to_a1(first_row, 1)}:{last_column}",
+            value_render_option="UNFORMATTED_VALUE",
+            date_time_render_option="FORMATTED_STRING",
+        )
+
+    def remember(self, gid, df):
+        """Registra o estado de uma aba após uma carga completa (linhas e hash da última)"""
+        with self._lock:
+            self._tabs.pop(gid, None)
+            self._incremental_syncs = 0
+            self.appended_only = False
+            if df.empty or using_fixtures():
+                return
+            try:
+                worksheet = self.get_worksheet(gid)
+                filled = df.dropna(how="all")
+                if filled.empty:
+                    return
+                last_row = int(filled.index[-1]) + 2  # posição 0 = linha 2 (abaixo do cabeçalho)
+                values = self._tail_values(worksheet, last_row, len(df.columns))
+                self._tabs[gid] = {"last_row": last_row, "last_row_hash": row_hash(values[0]) if values else None, "width": len(df.columns)}
+            except Exception as e:
+                logger.warning(f"Não foi possível registrar o estado da aba {gid}: {e}")
+
+    @staticmethod
+    def appended_rows(response):
+        """(primeira, última) linha escrita por um append_row/append_rows (updatedRange da resposta), ou None"""
+        try:
+            match = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?", response["updates"]["updatedRange"])
+            first = int(match.group(1))
+            return first, int(match.group(2) or first)
+        except Exception:
+            return None
+
+    @staticmethod
+    def appended_row(response):
+        """Linha da planilha escrita por um append_row (a partir do updatedRange da resposta)"""
+        rows = SheetSync.appended_rows(response)
+        return rows[0] if rows else None
+
+    def record_append(self, gid, response):
+        """
+        Atualiza o estado da aba após um append_row/append_rows feito pelo próprio
+        app, para que a próxima sincronização não traga de novo as linhas já
+        aplicadas em memória.
+        """
+        with self._lock:
+            state = self._tabs.get(gid)
+            if state is None:
+                return
+            try:
+                rows = self.appended_rows(response)
+                if rows is None or rows[0] != state["last_row"] + 1:
+                    # Outra escrita entrou antes: a próxima sincronização faz a carga completa
+                    self._tabs.pop(gid, None)
+                    return
+                # Valores gravados, devolvidos na própria resposta do append (includeValuesInResponse)
+                written = response["updates"]["updatedData"]["values"]
+                state["last_row"] = rows[1]
+                state["last_row_hash"] = row_hash(written[-1])
+            except Exception as e:
+                logger.warning(f"Não foi possível registrar o append na aba {gid}: {e}")
+                self._tabs.pop(gid, None)
+
+    def record_update(self, gid, sheet_row):
+        """Registra a edição de uma linha (só a última linha afeta o estado)"""
+        with self._lock:
+            state = self._tabs.get(gid)
+            if state is not None and sheet_row >= state["last_row"]:
+                self._tabs.pop(gid, None)
+
+    def record_delete(self, gid, sheet_row):
+        """Registra a remoção de uma linha (as de baixo sobem uma posição)"""
+        with self._lock:
+            state = self._tabs.get(gid)
+            if state is None:
+                return
+            if sheet_row < state["last_row"]:
+                state["last_row"] -= 1
+            else:
+                self._tabs.pop(gid, None)
+
+    def fetch_appended(self, gid, previous, schema=None):
+        """
+        Retorna previous + linhas novas se a aba só recebeu linhas no final, o
+        próprio previous se a aba não mudou, ou None quando é preciso uma carga completa.
+        Com schema (DatasetSchema), as linhas novas são tipadas antes da concatenação.
+        """
+        with self._lock:
+            state = self._tabs.get(gid)
+            if state is None or previous is None or self._incremental_syncs >= FULL_RELOAD_EVERY:
+                return None
+            try:
+                worksheet = self.get_worksheet(gid)
+                columns = schema.source_columns(previous) if schema is not None else list(previous.columns)
+                width = len(columns)
+                values = self._tail_values(worksheet, state["last_row"], width)
+            except Exception as e:
+                logger.warning(f"Falha na sincronização incremental da aba {gid}: {e}")
+                return None
+            # A última linha conhecida precisa estar intacta; senão houve edição/remoção
+            if not values or row_hash(values[0]) != state["last_row_hash"]:
+                return None
+            filled = [idx for idx, row in enumerate(values) if any(str(v).strip() for v in row)]
+            last_idx = filled[-1] if filled else 0
+            if last_idx == 0:
+                return previous
+            new_idx = [idx for idx in filled if idx > 0]
+            # Mesma conversão da carga completa (células vazias viram None), para os
+            # tipos e categorias não dependerem do caminho de sincronização
+            appended = values_to_frame([columns] + [values[idx] for idx in new_idx])
+            if schema is not None:
+                appended = schema.apply(appended, row_numbers=[state["last_row"] + idx for idx in new_idx])
+            state["last_row"] += last_idx
+            state["last_row_hash"] = row_hash(values[last_idx])
+            self._incremental_syncs += 1
+            self.appended_only = True
+            logger.info(f"Aba {gid}: {len(new_idx)} linhas novas sincronizadas")
+            if schema is not None:
+                return schema.concat(previous, appended)
+            return pd.concat([previous, appended], ignore_index=True)
+
+class ContentSync:
+    """Fingerprint por hash do conteúdo, para origens sem metadados de revisão (CSV público)"""
+
+    def __init__(self):
+        self.signal = None
+        self._pending_signal = None
+
+    def unchanged(self, raw):
+        self._pending_signal = content_hash(raw)
+        return self._pending_signal == self.signal
+
+    def commit(self):
+        self.signal = self._pending_signal
+
+    def state(self):
+        return {"signal": self.signal}
+
+    def restore(self, state):
+        self.signal = state.get("signal")
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+
+import gspread
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import Request
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+CREDENTIALS_PATH = os.path.join("antique", "credentials.json")
+
+# Renova o token de acesso quando faltar menos que isso para expirar
+REFRESH_MARGIN_SECONDS = 300
+
+class SheetsClient:
+    """
+    Cliente gspread autorizado e compartilhado pelo processo.
+
+    As credenciais são lidas do disco e autorizadas uma única vez; o gspread usa
+    uma AuthorizedSession (sessão HTTP persistente, com keep-alive). O token é
+    renovado antes de expirar e os handles de planilha/aba ficam em cache, de
+    modo que uma escrita custa só a chamada da própria escrita.
+
+    Args:
+        credentials_path: arquivo JSON da conta de serviço
+        scopes: escopos OAuth
+    """
+
+    def __init__(self, credentials_path=CREDENTIALS_PATH, scopes=SCOPES):
+        self.credentials_path = credentials_path
+        self.scopes = list(scopes)
+        self._credentials = None
+        self._client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    def _authorize(self):
+        self._credentials = Credentials.from_service_account_file(self.credentials_path, scopes=self.scopes)
+        self._credentials.refresh(Request())
+        self._client = gspread.authorize(self._credentials)
+        logger.info("Cliente do Google Sheets autorizado")
+
+    def _refresh_if_needed(self):
+        expiry = self._credentials.expiry
+        if expiry is None:
+            return
+        # google-auth guarda expiry como datetime UTC sem fuso
+        remaining = expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)
+        if remaining.total_seconds() < REFRESH_MARGIN_SECONDS:
+            self._credentials.refresh(Request())
+            logger.info("Token do Google Sheets renovado")
+
+    def client(self):
+        """Cliente gspread autorizado (token válido)"""
+        with self._lock:
+            if self._client is None:
+                self._authorize()
+            else:
+                self._refresh_if_needed()
+            return self._client
+
+    def spreadsheet(self, document_id):
+        """Handle da planilha (open_by_key só na primeira vez)"""
+        client = self.client()
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(document_id)
+            if spreadsheet is None:
+                spreadsheet = client.open_by_key(document_id)
+                self._spreadsheets[document_id] = spreadsheet
+            return spreadsheet
+
+    def worksheet(self, document_id, gid):
+        """Handle da aba gid (metadados buscados só na primeira vez)"""
+        spreadsheet = self.spreadsheet(document_id)
+        key = (document_id, int(gid))
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+            if worksheet is None:
+                started = time.perf_counter()
+                worksheet = spreadsheet.get_worksheet_by_id(int(gid))
+                self._worksheets[key] = worksheet
+                logger.info(f"Aba {gid} aberta em {(time.perf_counter() - started) * 1000:.0f} ms")
+            return worksheet
+
+    def forget(self, document_id=None, gid=None):
+        """Descarta handles em cache (ex.: aba removida/recriada); sem argumentos, descarta todos"""
+        with self._lock:
+            if document_id is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+            elif gid is None:
+                self._spreadsheets.pop(document_id, None)
+                self._worksheets = {key: ws for key, ws in self._worksheets.items() if key[0] != document_id}
+            else:
+                self._worksheets.pop((document_id, int(gid)), None)
+
+# Instância única compartilhada por todos os módulos de dados
+sheets_client = SheetsClient()
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from pyarrow import feather
+
+logger = logging.getLogger(__name__)
+
+# Diretório dos snapshots locais (Feather) dos datasets
+SNAPSHOT_DIR_ENV = "DATASET_SNAPSHOT_DIR"
+DEFAULT_SNAPSHOT_DIR = ".snapshots"
+
+# Incrementar quando o formato/colunas dos datasets mudarem; snapshots antigos são ignorados
+SNAPSHOT_SCHEMA_VERSION = 6
+
+# Gravações serializadas por dataset e última versão gravada de cada um
+_locks = {}
+_locks_lock = threading.Lock()
+_saved_versions = {}
+
+def snapshot_dir():
+    return os.environ.get(SNAPSHOT_DIR_ENV, DEFAULT_SNAPSHOT_DIR)
+
+def _meta_path(name):
+    return os.path.join(snapshot_dir(), f"{name}.json")
+
+def _part_path(name, snapshot_id, idx):
+    return os.path.join(snapshot_dir(), f"{name}.{snapshot_id}.{idx}.feather")
+
+def _lock(name):
+    with _locks_lock:
+        return _locks.setdefault(name, threading.Lock())
+
+def _remove_old_parts(name, snapshot_id):
+    """Apaga as partes de snapshots anteriores do dataset"""
+    pattern = re.compile(rf"{re.escape(name)}\.([0-9a-f]{{32}})\.\d+\.feather$")
+    for file_name in os.listdir(snapshot_dir()):
+        match = pattern.match(file_name)
+        if match and match.group(1) != snapshot_id:
+            try:
+                os.remove(os.path.join(snapshot_dir(), file_name))
+            except OSError:
+                pass
+
+def save_snapshot(name, data, sync_state=None, version=None):
+    """
+    Grava o dataset (DataFrame ou tupla de DataFrames) em Feather, com um JSON de
+    metadados (versão do schema, estado de sincronização da origem, data).
+
+    Cada gravação usa arquivos próprios (id do snapshot no nome) e o JSON é
+    gravado por último, apontando para as partes e o número de linhas de cada
+    uma; uma queda no meio da gravação deixa o snapshot anterior intacto.
+    As gravações de um dataset são serializadas, e uma versão mais antiga que a
+    última gravada (threads fora de ordem) é descartada.
+
+    Args:
+        version: versão do dataset no DatasetStore (None = sempre grava)
+    """
+    parts = list(data) if isinstance(data, tuple) else [data]
+    with _lock(name):
+        if version is not None and _saved_versions.get(name, -1) >= version:
+            return False
+        snapshot_id = uuid.uuid4().hex
+        try:
+            os.makedirs(snapshot_dir(), exist_ok=True)
+            for idx, df in enumerate(parts):
+                tmp_path = f"{_part_path(name, snapshot_id, idx)}.tmp"
+                df.reset_index(drop=True).to_feather(tmp_path)
+                os.replace(tmp_path, _part_path(name, snapshot_id, idx))
+            meta = {
+                "schema_version": SNAPSHOT_SCHEMA_VERSION,
+                "snapshot_id": snapshot_id,
+                "version": version,
+                "parts": len(parts),
+                "rows": [len(df) for df in parts],
+                "is_tuple": isinstance(data, tuple),
+                "sync": sync_state,
+                "saved_at": time.time(),
+            }
+            tmp_path = f"{_meta_path(name)}.{snapshot_id}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(meta, file)
+            os.replace(tmp_path, _meta_path(name))
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o snapshot de '{name}': {e}")
+            return False
+        if version is not None:
+            _saved_versions[name] = version
+        _remove_old_parts(name, snapshot_id)
+        return True
+
+def load_snapshot(name):
+    """Retorna (dados, metadados) do snapshot, ou None se não houver um compatível"""
+    try:
+        with open(_meta_path(name), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Metadados do snapshot de '{name}' inválidos: {e}")
+        return None
+    if meta.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+        logger.info(f"Snapshot de '{name}' ignorado: versão de schema {meta.get('schema_version')}")
+        return None
+    try:
+        # memory_map é do leitor do pyarrow (o pd.read_feather não aceita o argumento)
+        parts = [feather.read_feather(_part_path(name, meta["snapshot_id"], idx), memory_map=True) for idx in range(meta["parts"])]
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o snapshot de '{name}': {e}")
+        return None
+    # Partes de outra gravação (ou incompletas) não batem com os metadados
+    if [len(df) for df in parts] != meta.get("rows"):
+        logger.warning(f"Snapshot de '{name}' ignorado: partes não correspondem aos metadados")
+        return None
+    data = tuple(parts) if meta.get("is_tuple") else parts[0]
+    return data, meta
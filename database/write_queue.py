@@ -0,0 +1,245 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Journal local das escritas pendentes (JSONL), relido na inicialização
+JOURNAL_PATH_ENV = "WRITE_JOURNAL_PATH"
+DEFAULT_JOURNAL_PATH = os.path.join(".journal", "writes.jsonl")
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 1.0
+
+# Resultados concluídos guardados para as notificações das sessões
+MAX_FINISHED = 500
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+def journal_path():
+    return os.environ.get(JOURNAL_PATH_ENV, DEFAULT_JOURNAL_PATH)
+
+class WriteJob:
+    """Escrita enfileirada: operação registrada + argumentos serializáveis (BSON/JSON estendido)"""
+
+    def __init__(self, op, resource, args=(), kwargs=None, label=None, owner=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.op = op
+        self.resource = resource
+        self.args = list(args)
+        self.kwargs = kwargs or {}
+        self.label = label or op
+        self.owner = owner
+        self.status = PENDING
+        self.error = None
+        self.attempts = 0
+        self.finished_at = None
+        self.notified = False
+
+    def record(self):
+        return {
+            "id": self.id,
+            "op": self.op,
+            "resource": self.resource,
+            "args": self.args,
+            "kwargs": self.kwargs,
+            "label": self.label,
+        }
+
+class WriteQueue:
+    """
+    Fila de escritas em segundo plano, ordenada por recurso.
+
+    submit() grava a escrita no journal local e devolve na hora; um worker por
+    recurso (ex.: coleção do MongoDB) executa as escritas daquele
+    recurso na ordem de chegada, com novas tentativas em caso de erro. Recursos
+    diferentes gravam em paralelo.
+
+    O journal (JSONL, com fsync) registra cada escrita e depois seu desfecho;
+    na inicialização, escritas sem desfecho são reenfileiradas quando a operação
+    correspondente é registrada (register), e o journal é compactado.
+
+    As operações são funções registradas por nome; uma operação que levanta
+    exceção ou devolve False conta como falha. Como uma tentativa que expirou
+    pode ter sido aplicada na origem, as operações precisam ser seguras de
+    repetir (novas tentativas e reexecução pelo journal), como os inserts com
+    _id definido antes do submit. Os listeners (listen) são
+    chamados ao fim de cada escrita, com sucesso ou não, para desfazer/confirmar
+    atualizações otimistas; o status fica disponível em jobs() para a interface.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or journal_path()
+        self._ops = {}
+        self._listeners = []
+        self._queues = {}
+        self._workers = {}
+        self._jobs = {}
+        self._finished = deque()
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._recovered = self._read_journal()
+        # O diretório do journal só é criado na primeira escrita (sem efeito colateral no import)
+        self._journal_ready = os.path.exists(self.path)
+        if self._journal_ready:
+            self._compact()
+
+    def _read_journal(self):
+        """Escritas do journal que não chegaram a um desfecho, na ordem original"""
+        pending = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json_util.loads(line)
+                    except Exception:
+                        # Linha truncada por uma queda no meio da gravação
+                        continue
+                    if "status" in record:
+                        pending.pop(record["id"], None)
+                    else:
+                        pending[record["id"]] = record
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning(f"Não foi possível ler o journal de escritas: {e}")
+            return []
+        if pending:
+            logger.info(f"{len(pending)} escrita(s) pendente(s) recuperada(s) do journal")
+        return [
+            WriteJob(r["op"], r["resource"], r.get("args", ()), r.get("kwargs"), r.get("label"), job_id=r["id"])
+            for r in pending.values()
+        ]
+
+    def _compact(self):
+        """Reescreve o journal só com as escritas recuperadas"""
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                for job in self._recovered:
+                    file.write(json_util.dumps(job.record()) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Não foi possível compactar o journal de escritas: {e}")
+
+    def _append_journal(self, record):
+        with self._journal_lock:
+            try:
+                # Argumento não serializável: a escrita segue só em memória, sem journal
+                line = json_util.dumps(record) + "\n"
+                if not self._journal_ready:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._journal_ready = True
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(line)
+                    file.flush()
+                    os.fsync(file.fileno())
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar no journal de escritas: {e}")
+
+    def register(self, op, fn):
+        """Registra a operação op e reenfileira as escritas dela recuperadas do journal"""
+        self._ops[op] = fn
+        recovered = [job for job in self._recovered if job.op == op]
+        if recovered:
+            self._recovered = [job for job in self._recovered if job.op != op]
+            for job in recovered:
+                self._enqueue(job)
+
+    def listen(self, fn):
+        """Registra fn(job), chamada quando uma escrita termina (done ou failed)"""
+        self._listeners.append(fn)
+
+    def submit(self, op, resource, *args, label=None, owner=None, **kwargs):
+        """
+        Enfileira uma escrita e devolve o WriteJob sem esperar a gravação.
+
+        Args:
+            op: nome da operação registrada
+            resource: recurso cuja ordem de escrita é preservada (ex.: "mongo:action_plans")
+            label: texto mostrado nas notificações
+            owner: sessão que pediu a escrita (recebe as notificações)
+        """
+        if op not in self._ops:
+            raise KeyError(f"Operação de escrita não registrada: {op}")
+        job = WriteJob(op, resource, args, kwargs, label, owner)
+        self._append_journal(job.record())
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queues.setdefault(job.resource, deque()).append(job)
+            worker = self._workers.get(job.resource)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._drain, args=(job.resource,), name=f"writer-{job.resource}", daemon=True)
+                self._workers[job.resource] = worker
+                worker.start()
+
+    def _drain(self, resource):
+        while True:
+            with self._lock:
+                queue = self._queues.get(resource)
+                if not queue:
+                    self._workers.pop(resource, None)
+                    return
+                job = queue[0]
+            self._run(job)
+            with self._lock:
+                queue.popleft()
+
+    def _run(self, job):
+        fn = self._ops[job.op]
+        while True:
+            job.attempts += 1
+            try:
+                result = fn(*job.args, **job.kwargs)
+                if result is False:
+                    raise RuntimeError("a operação não foi concluída")
+                job.status = DONE
+                break
+            except Exception as e:
+                if job.attempts >= MAX_ATTEMPTS:
+                    job.status = FAILED
+                    job.error = str(e)
+                    logger.error(f"Escrita '{job.label}' falhou após {job.attempts} tentativa(s): {e}")
+                    break
+                time.sleep(RETRY_DELAY_SECONDS * job.attempts)
+        job.finished_at = time.time()
+        self._append_journal({"id": job.id, "status": job.status, "error": job.error})
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                logger.warning(f"Falha no listener da escrita '{job.label}': {e}")
+        with self._lock:
+            self._finished.append(job)
+            while len(self._finished) > MAX_FINISHED:
+                self._jobs.pop(self._finished.popleft().id, None)
+
+    def jobs(self, owner=None, status=None):
+        """Escritas conhecidas (de uma sessão e/ou com um status), da mais antiga para a mais nova"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            job for job in jobs
+            if (owner is None or job.owner == owner) and (status is None or job.status == status)
+        ]
+
+    def pending(self, owner=None):
+        return self.jobs(owner, PENDING)
+
+# Instância única compartilhada pelo processo
+write_queue = WriteQueue()
@@ -2,8 +2,10 @@ import streamlit as st
 import altair as alt
 import pandas as pd
 from datetime import datetime
-from database.database_accounting_indicators import load_data_accounting_indicators, filtrar_dados_accounting
-from database.mongodb_utils import get_collection_data_by_area, get_user_name
+from database.database_accounting_indicators import load_data_accounting_indicators, filtrar_dados_accounting, get_accounting_cube, get_balance_series
+from database.aggregate_cube import with_date
+from database.mongodb_utils import get_user_names
+from database.area_data import get_area_data
 from utils.modal import show_manage_modal
 import io
 import datetime as dt
@@ -14,25 +16,14 @@ if not st.session_state.get('authenticated', False):
     st.stop()
 
 def show_screen(user_data):
-    df = st.session_state.get('accounting_indicators_data_cache')
-    if df is None:
+    if not st.session_state.get('accounting_indicators_data_loaded'):
         st.error('Dados não carregados. Refaça o login ou recarregue a página.')
         return
-    # Conversão explícita dos tipos necessários para o gráfico funcionar
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df["Open balance"] = (
-        df["Open balance"]
-        .astype(str)
-        .str.replace(",", "", regex=False)
-        .replace("nan", None)
-        .astype(float)
-    )
-    df = df.dropna(subset=["Date"])
-    df["month"] = df["Date"].dt.month.astype(int)
-    df["year"] = df["Date"].dt.year.astype(int)
-    # Filtros
-    aging_intervals = ["All"] + sorted(df["Aging Intervals"].dropna().unique())
-    categories = sorted(df["Category"].dropna().unique())
+    # Snapshot compartilhado e já tipado (schema aplicado na carga): não alterar in-place
+    df = load_data_accounting_indicators()
+    # Filtros (opções vêm do dicionário das colunas categóricas)
+    aging_intervals = ["All"] + list(df["Aging Intervals"].cat.categories)
+    categories = list(df["Category"].cat.categories)
     seg_options = ["All", "Receivables"]
     if "accounting_segmented_control" not in st.session_state:
         st.session_state.accounting_segmented_control = "All"
@@ -43,14 +34,13 @@ def show_screen(user_data):
     selected_type = st.session_state.accounting_segmented_control
     selected_aging = st.session_state.accounting_aging_pill
     selected_categories = st.session_state.accounting_category_multiselect
-    # Aplicar filtros manualmente (como era antes)
-    filtered = df.copy()
-    if selected_type == "Receivables":
-        filtered = filtered[filtered["Transaction type"] == "Invoice"]
-    if selected_aging and selected_aging != "All":
-        filtered = filtered[filtered["Aging Intervals"] == selected_aging]
-    if selected_categories:
-        filtered = filtered[filtered["Category"].isin(selected_categories)]
+    # Filtros pelo índice do dataset (sem copiar o DataFrame)
+    filter_args = dict(
+        tipo="Invoice" if selected_type == "Receivables" else None,
+        aging=selected_aging,
+        categorias=selected_categories,
+    )
+    filtered = filtrar_dados_accounting(**filter_args)
     # Filtros de ano e mês
     available_years = sorted(filtered["year"].dropna().unique().astype(int))
     if not available_years:
@@ -63,7 +53,7 @@ def show_screen(user_data):
             else available_years[-1] if available_years 
             else None
         )
-    filtered_year = filtered[filtered["year"] == st.session_state['selected_year_accounting_indicators']]
+    filtered_year = filtrar_dados_accounting(ano=st.session_state['selected_year_accounting_indicators'], **filter_args)
     available_months = sorted(filtered_year["month"].dropna().unique().astype(int))
     if 'selected_month_accounting_indicators' not in st.session_state or (
         st.session_state['selected_month_accounting_indicators'] not in available_months
@@ -73,23 +63,17 @@ def show_screen(user_data):
     if st.session_state['selected_month_accounting_indicators'] == 0:
         filtered_month = filtered_year
     else:
-        filtered_month = filtered_year[filtered_year["month"] == st.session_state['selected_month_accounting_indicators']]
+        filtered_month = filtrar_dados_accounting(
+            ano=st.session_state['selected_year_accounting_indicators'],
+            mes=st.session_state['selected_month_accounting_indicators'],
+            **filter_args
+        )
     # Definir ano/mês selecionados
     selected_year = st.session_state['selected_year_accounting_indicators']
     selected_month = st.session_state['selected_month_accounting_indicators']
     # --- USAR DADOS DO MONGODB PARA OS CARDS LATERAIS ---
-    action_plans = get_collection_data_by_area('action_plans', area_filter='accounting')
-    monthly_highlights = st.session_state.get('accounting_monthly_highlights_cache', [])
-    monthly_opportunities = st.session_state.get('accounting_monthly_opportunities_cache', [])
-    # Filtrar conforme ano/mês selecionados
-    if selected_month == 0:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year]
-    else:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year and p['created_at'].month == selected_month]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year and h.get('month') == selected_month]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year and o.get('month') == selected_month]
+    # Filtrar conforme ano/mês selecionados (no próprio MongoDB)
+    filtered_highlights, filtered_opportunities, filtered_action_plans = get_area_data('accounting').sidebar(selected_year, selected_month)
     # Filtros horizontalizados no topo (container sozinho, ponta a ponta)
     with st.container(border=True):
         col0, col1, col2, col3 = st.columns([1.3, 2, 3, 3], gap="small", vertical_alignment="center")
@@ -157,19 +141,26 @@ def show_screen(user_data):
             selected_month = st.session_state['selected_month_accounting_indicators']
             aging_interval_is_specific = selected_aging and selected_aging != "All"
 
+            # Fatias do cubo de agregados (Open balance por data e dimensões)
+            cube = get_accounting_cube()
+            by = ["year", "month", "day"] + (["Aging Intervals"] if not aging_interval_is_specific and selected_type == "Receivables" else [])
+            color = alt.Color('Aging Intervals:N', title='Aging Intervals') if len(by) > 3 else None
+            cube_filters = dict(
+                year=st.session_state['selected_year_accounting_indicators'],
+                equals={
+                    "Transaction type": "Invoice" if selected_type == "Receivables" else None,
+                    "Aging Intervals": selected_aging if aging_interval_is_specific else None,
+                },
+                isin={"Category": selected_categories},
+            )
+
             if selected_month == 0:
-                # Ano completo: fechamento mensal
-                last_days = filtered_year.groupby('month')['Date'].max().reset_index()
-                merged = filtered_year.merge(last_days, on=['month', 'Date'])
-                if aging_interval_is_specific:
-                    chart_data = merged[merged["Aging Intervals"] == selected_aging].groupby(['Date'], as_index=False)['Open balance'].sum()
-                    color = None
-                elif selected_type == "Receivables":
-                    chart_data = merged.groupby(['Date', 'Aging Intervals'], as_index=False)['Open balance'].sum()
-                    color = alt.Color('Aging Intervals:N', title='Aging Intervals')
-                else:
-                    chart_data = merged.groupby(['Date'], as_index=False)['Open balance'].sum()
-                    color = None
+                # Ano completo: fechamento mensal, da série pré-calculada por versão do dataset
+                chart_data = get_balance_series().closing(
+                    year=st.session_state['selected_year_accounting_indicators'],
+                    by_aging=color is not None,
+                    **filter_args
+                )
 
                 # Adicionar coluna de mês abreviado para o eixo X
                 chart_data['month_str'] = chart_data['Date'].dt.strftime('%b')
@@ -190,16 +181,9 @@ def show_screen(user_data):
                 st.altair_chart(chart, use_container_width=True)
             else:
                 # Mês específico: valores diários
-                filtered_month = filtered_month.copy()
-                if aging_interval_is_specific:
-                    chart_data = filtered_month[filtered_month["Aging Intervals"] == selected_aging].groupby(["Date"], as_index=False)["Open balance"].sum()
-                    color = None
-                elif selected_type == "Receivables":
-                    chart_data = filtered_month.groupby(["Date", "Aging Intervals"], as_index=False)["Open balance"].sum()
+                chart_data = with_date(cube.rollup(by, month=selected_month, **cube_filters))
+                if color is not None:
                     color = alt.Color('Aging Intervals:N', title='Intervalo Etário')
-                else:
-                    chart_data = filtered_month.groupby("Date", as_index=False)["Open balance"].sum()
-                    color = None
 
                 # Adicionar coluna de dia para o eixo X
                 chart_data['day_str'] = chart_data['Date'].dt.strftime('%d')
@@ -221,6 +205,8 @@ def show_screen(user_data):
             st.dataframe(filtered_month, use_container_width=True, hide_index=True)
     # COLUNA LATERAL: Monthly Highlights, Opportunities, Action Plans
     with col_lateral:
+        # Resolver os nomes dos responsáveis com uma única consulta
+        user_names = get_user_names([d.get('user_id') for d in filtered_highlights + filtered_opportunities])
         with st.container(border=True):
             # 1. Monthly Highlights
             st.subheader(":material/rocket_launch: Monthly Highlights")
@@ -234,10 +220,7 @@ def show_screen(user_data):
                 for (month, year), highlights_list in sorted(highlights_by_month.items(), key=lambda x: (x[1][0].get('year', 0), x[1][0].get('month', 0))):
                     user_name = "Usuário não informado"
                     if highlights_list and 'user_id' in highlights_list[0] and highlights_list[0]['user_id']:
-                        try:
-                            user_name = get_user_name(highlights_list[0]['user_id'])
-                        except Exception as e:
-                            user_name = f"Erro ao buscar usuário: {e}"
+                        user_name = user_names.get(str(highlights_list[0]['user_id']), 'Usuário não encontrado')
                     with st.expander(f"{user_name} • {month}/{year}"):
                         for highlight in highlights_list:
                             col_pos, col_neg = st.columns(2)
@@ -270,10 +253,7 @@ def show_screen(user_data):
                 for (month, year), opp_list in sorted(opportunities_by_month.items(), key=lambda x: (x[1][0].get('year', 0), x[1][0].get('month', 0))):
                     user_name = "Usuário não informado"
                     if opp_list and 'user_id' in opp_list[0] and opp_list[0]['user_id']:
-                        try:
-                            user_name = get_user_name(opp_list[0]['user_id'])
-                        except Exception as e:
-                            user_name = f"Erro ao buscar usuário: {e}"
+                        user_name = user_names.get(str(opp_list[0]['user_id']), 'Usuário não encontrado')
                     with st.expander(f"{user_name} • {month}/{year}"):
                         opp_blocks = []
                         for opp in opp_list:
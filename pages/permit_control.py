@@ -4,9 +4,11 @@ import altair as alt
 from datetime import datetime
 import logging
 from database.database_permit_control import *
-from database.mongodb_utils import get_collection_data, get_user_name, get_collection_data_by_area
+from database.mongodb_utils import get_collection_data, get_user_names
+from database.area_data import get_area_data
 from utils.modal import show_manage_modal
-from database.database_permit_control import load_data_permit_control, filtrar_dados_permit
+from database.database_permit_control import load_data_permit_control, filtrar_dados_permit, get_permit_cube, get_permit_display
+from utils.permit_list import show_permit_list
 import io
 import datetime as dt
 
@@ -19,29 +21,16 @@ if not st.session_state.get('authenticated', False):
 
 def show_screen(user_data):
     """Main function to display the permit control screen"""
-    df = st.session_state.get('permit_control_data_cache')
-    if df is None:
+    if not st.session_state.get('permit_control_data_loaded'):
         st.error('Dados não carregados. Refaça o login ou recarregue a página.')
         return
+    # Snapshot compartilhado e já tipado (schema aplicado na carga): não alterar in-place
+    df = load_data_permit_control()
 
-    # Dados do MongoDB agora também do cache
-    action_plans = get_collection_data_by_area('action_plans', area_filter='permit')
-    monthly_highlights = st.session_state.get('permit_monthly_highlights_cache')
-    monthly_opportunities = st.session_state.get('permit_monthly_opportunities_cache')
-    if action_plans is None or monthly_highlights is None or monthly_opportunities is None:
-        st.error('Dados de destaques, oportunidades ou planos de ação não carregados. Refaça o login ou recarregue a página.')
-        return
-    
-    # Process data
-    df["Request Date"] = pd.to_datetime(df["Request Date"], errors="coerce")
-    df = df.dropna(subset=["Request Date"])  # Remove linhas com datas inválidas
-    df["month"] = df["Request Date"].dt.month.astype(int)
-    df["year"] = df["Request Date"].dt.year.astype(int)
-    
-    # Get unique values
-    models = sorted(df["Model"].dropna().unique())
-    situations = sorted(df["Situation"].dropna().unique())
-    jobsites = sorted(df["Jobsite"].dropna().unique())
+    # Opções dos filtros: dicionário das colunas categóricas (já ordenado)
+    models = list(df["Model"].cat.categories)
+    situations = list(df["Situation"].cat.categories)
+    jobsites = list(df["Jobsite"].cat.categories)
 
     # Initialize session state
     if 'model_select_permit_control' not in st.session_state:
@@ -64,7 +53,7 @@ def show_screen(user_data):
             else None
         )
     selected_year = st.session_state['selected_year_permit_control']
-    filtered_year = df[df["year"] == selected_year]
+    filtered_year = filtrar_dados_permit(ano=selected_year)
     available_months = sorted(filtered_year["month"].dropna().unique().astype(int))
     if 'selected_month_permit_control' not in st.session_state or (
         st.session_state['selected_month_permit_control'] not in available_months
@@ -103,9 +92,8 @@ def show_screen(user_data):
     selected_situation = st.session_state.situation_select_permit_control
     selected_jobsites = st.session_state.jobsites_multiselect_permit_control
     
-    # --- USAR FUNÇÃO CACHEADA PARA FILTRAR ---
+    # --- FILTRAR PELO ÍNDICE DO DATASET (sem copiar o DataFrame) ---
     filtered_month = filtrar_dados_permit(
-        df,
         ano=selected_year,
         mes=selected_month,
         modelo=selected_model,
@@ -118,14 +106,7 @@ def show_screen(user_data):
     selected_month = st.session_state['selected_month_permit_control']
 
     # Filtrar dados do MongoDB conforme ano/mês selecionados
-    if selected_month == 0:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year]
-    else:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year and p['created_at'].month == selected_month]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year and h.get('month') == selected_month]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year and o.get('month') == selected_month]
+    filtered_highlights, filtered_opportunities, filtered_action_plans = get_area_data('permit').sidebar(selected_year, selected_month)
 
     # Duas colunas principais para dados
     col_dados, col_lateral = st.columns([7, 3], gap="small")
@@ -165,10 +146,11 @@ def show_screen(user_data):
                     key="selected_month_permit_control"
                 )
             
-            # Gráfico de contagem por situação
+            # Gráfico de contagem por situação (fatias do cubo de agregados)
+            cube = get_permit_cube()
             if st.session_state['selected_month_permit_control'] == 0:
                 # Gráfico anual - contagem por mês para cada situação
-                chart_data = filtered_year.groupby(["month", "Situation"]).size().reset_index(name="count")
+                chart_data = cube.rollup(["month", "Situation"], year=selected_year)
                 chart_data = chart_data.sort_values("month")
                 months_labels = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
                 chart_data["month_name"] = chart_data["month"].apply(lambda x: months_labels[x-1] if 1 <= x <= 12 else str(x))
@@ -199,8 +181,16 @@ def show_screen(user_data):
                 st.altair_chart(chart, use_container_width=True)
             else:
                 # Gráfico mensal - contagem por dia para cada situação
-                chart_data = filtered_month.groupby([filtered_month["Request Date"].dt.day, "Situation"]).size().reset_index(name="count")
-                chart_data = chart_data.rename(columns={"Request Date": "day"})
+                chart_data = cube.rollup(
+                    ["day", "Situation"],
+                    year=selected_year,
+                    month=selected_month,
+                    equals={
+                        "Model": selected_model if selected_model != "All" else None,
+                        "Situation": selected_situation if selected_situation != "All" else None,
+                    },
+                    isin={"Jobsite": selected_jobsites},
+                )
                 chart_data = chart_data.sort_values("day")
                 
                 base = alt.Chart(chart_data).encode(
@@ -277,51 +267,11 @@ def show_screen(user_data):
 
             # Container com cards dos permits
             st.markdown("### :material/cards: Permit Details")
-            with st.container(border=True, height=400):
-                for _, row in filtered_month.iterrows():
-                    with st.container(border=True):
-                        col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
-                        
-                        with col1:
-                            st.markdown(f"**{row['Model']} - {row['Jobsite']}**")
-                            st.markdown(f"**Location:** {row['LOT/ADDRESS']}")
-                            if pd.notna(row["Observation"]):
-                                st.markdown(f"**Observation:** {row['Observation']}")
-                        
-                        with col2:
-                            st.markdown("**Timeline**")
-                            request_date = pd.to_datetime(row["Request Date"])
-                            st.markdown(f"**Request:** {request_date.strftime('%m/%d/%Y')}")
-                            
-                            if pd.notna(row["Application Date"]):
-                                app_date = pd.to_datetime(row["Application Date"])
-                                st.markdown(f"**Application:** {app_date.strftime('%m/%d/%Y')}")
-                            
-                            if pd.notna(row["Issue Date"]):
-                                issue_date = pd.to_datetime(row["Issue Date"])
-                                st.markdown(f"**Issue:** {issue_date.strftime('%m/%d/%Y')}")
-                        
-                        with col3:
-                            st.markdown("**Status**")
-                            situation = row["Situation"]
-                            if situation == "Issued":
-                                st.markdown(f":green[{situation}]")
-                            elif situation == "Applied":
-                                st.markdown(f":blue[{situation}]")
-                            else:
-                                st.markdown(f":orange[{situation}]")
-                        
-                        with col4:
-                            if pd.notna(row["Permit File"]) and row["Permit File"].strip():
-                                st.link_button(
-                                    ":material/draft: See permit",
-                                    row["Permit File"],
-                                    use_container_width=True
-                                )
-                            else:
-                                st.markdown("*No file*")
+            show_permit_list(filtered_month, get_permit_display(), key="permit_list_permit_control")
 
     with col_lateral:
+        # Resolver os nomes dos responsáveis com uma única consulta
+        user_names = get_user_names([d.get('user_id') for d in filtered_highlights + filtered_opportunities])
         with st.container(border=True):
             # 1. Monthly Highlights
             st.subheader(":material/rocket_launch: Monthly Highlights")
@@ -337,7 +287,7 @@ def show_screen(user_data):
                     # Buscar o nome do usuário responsável pelo primeiro highlight da lista
                     user_name = "Usuário não encontrado"
                     if highlights_list and 'user_id' in highlights_list[0]:
-                        user_name = get_user_name(highlights_list[0]['user_id'])
+                        user_name = user_names.get(str(highlights_list[0]['user_id']), 'Usuário não encontrado')
                     
                     with st.expander(f"{user_name} • {month}/{year}"):
                         for highlight in highlights_list:
@@ -374,7 +324,7 @@ def show_screen(user_data):
                     # Buscar o nome do usuário responsável pela primeira opportunity da lista
                     user_name = "Usuário não encontrado"
                     if opp_list and 'user_id' in opp_list[0]:
-                        user_name = get_user_name(opp_list[0]['user_id'])
+                        user_name = user_names.get(str(opp_list[0]['user_id']), 'Usuário não encontrado')
                     
                     with st.expander(f"{user_name} • {month}/{year}"):
                         opp_blocks = []
@@ -3,9 +3,10 @@ import altair as alt
 import pandas as pd
 from datetime import datetime
 from database.database_timesheet_analysis import *
-from database.mongodb_utils import get_collection_data, get_user_name, get_collection_data_by_area
+from database.mongodb_utils import get_collection_data, get_user_names
+from database.area_data import get_area_data
 from utils.modal import show_manage_modal
-from database.database_timesheet_analysis import load_data, filtrar_dados_timesheet
+from database.database_timesheet_analysis import load_data, filtrar_dados_timesheet, get_timesheet_cube
 import io
 import datetime as dt
 
@@ -15,35 +16,16 @@ if not st.session_state.get('authenticated', False):
     st.stop()
 
 def show_screen(user_data):
-    data = st.session_state.get('timesheet_analysis_data_cache')
-    if data is None:
+    if not st.session_state.get('timesheet_analysis_data_loaded'):
         st.error('Dados não carregados. Refaça o login ou recarregue a página.')
         return
-    df_t1, df_t2 = data
+    # Snapshots compartilhados e já tipados (schema aplicado na carga): não alterar in-place
+    df_t1, df_t2 = load_data()
 
-    # Dados do MongoDB agora também do cache
-    action_plans = st.session_state.get('timesheet_action_plans_cache')
-    monthly_highlights = st.session_state.get('timesheet_monthly_highlights_cache')
-    monthly_opportunities = st.session_state.get('timesheet_monthly_opportunities_cache')
-    if action_plans is None or monthly_highlights is None or monthly_opportunities is None:
-        st.error('Dados de destaques, oportunidades ou planos de ação não carregados. Refaça o login ou recarregue a página.')
-        return
-    # Carregar dados do MongoDB filtrados por área 'timesheet'
-    action_plans = get_collection_data_by_area('action_plans', area_filter='timesheet')
-    monthly_highlights = get_collection_data_by_area('monthly_highlights', include_id=True, area_filter='timesheet')
-    monthly_opportunities = get_collection_data_by_area('monthly_opportunities', include_id=True, area_filter='timesheet')
-
-    # Process data
-    df_t1.columns = df_t1.columns.str.strip()
-    df_t1["date_t1"] = pd.to_datetime(df_t1["date_t1"], errors="coerce")
-    df_t1 = df_t1.dropna(subset=["date_t1"])  # Remove linhas com datas inválidas
-    df_t1["month"] = df_t1["date_t1"].dt.month.astype(int)
-    df_t1["year"] = df_t1["date_t1"].dt.year.astype(int)
-    
-    # Get unique values
-    teams = sorted(df_t1["team_t1"].dropna().unique())
-    all_errors = sorted(df_t1["error_t1"].dropna().unique())
-    corporations = ["All"] + sorted(df_t1["corporation_t1"].dropna().astype(str).unique())
+    # Opções dos filtros: dicionário das colunas categóricas (já ordenado)
+    teams = list(df_t1["team_t1"].cat.categories)
+    all_errors = list(df_t1["error_t1"].cat.categories)
+    corporations = ["All"] + list(df_t1["corporation_t1"].cat.categories)
 
     # Initialize session state with basic values only
     if 'corporation_select_timesheet_analysis2' not in st.session_state:
@@ -67,7 +49,7 @@ def show_screen(user_data):
             else None
         )
     selected_year = st.session_state['selected_year_timesheet_analysis2']
-    filtered_year = df_t1[df_t1["year"] == selected_year]
+    filtered_year = filtrar_dados_timesheet(ano=selected_year)
     available_months = sorted(filtered_year["month"].dropna().unique().astype(int))
     if 'selected_month_timesheet_analysis2' not in st.session_state or (
         st.session_state['selected_month_timesheet_analysis2'] not in available_months
@@ -105,26 +87,13 @@ def show_screen(user_data):
     selected_corporation = st.session_state.corporation_select_timesheet_analysis2
     selected_teams = st.session_state.teams_multiselect_timesheet_analysis2
     selected_errors = st.session_state.errors_multiselect_timesheet_analysis2
-    
-    # Filtrar dados pelo ano e mês selecionados
-    if selected_month == 0:
-        filtered_month = filtered_year
-    else:
-        filtered_month = filtered_year[filtered_year["month"] == selected_month]
 
     # Definir os filtros de ano e mês selecionados
     selected_year = st.session_state['selected_year_timesheet_analysis2']
     selected_month = st.session_state['selected_month_timesheet_analysis2']
 
     # Filtrar dados do MongoDB conforme ano/mês selecionados
-    if selected_month == 0:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year]
-    else:
-        filtered_action_plans = [p for p in action_plans if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == selected_year and p['created_at'].month == selected_month]
-        filtered_highlights = [h for h in monthly_highlights if h.get('year') == selected_year and h.get('month') == selected_month]
-        filtered_opportunities = [o for o in monthly_opportunities if o.get('year') == selected_year and o.get('month') == selected_month]
+    filtered_highlights, filtered_opportunities, filtered_action_plans = get_area_data('timesheet').sidebar(selected_year, selected_month)
 
     # Duas colunas principais para dados
     col_dados, col_lateral = st.columns([7, 3], gap="small")
@@ -162,10 +131,12 @@ def show_screen(user_data):
                     format_func=lambda x: months_labels_with_all[months_options_with_all.index(x)],
                     key="selected_month_timesheet_analysis2"
                 )
-            # Gráfico, métricas, tabelas Teams/Errors
+            # Gráfico, métricas, tabelas Teams/Errors: fatias do cubo de agregados
+            cube = get_timesheet_cube()
+            period = dict(year=selected_year, month=st.session_state['selected_month_timesheet_analysis2'])
             # NOVO GRÁFICO DE CONTAGEM
             if st.session_state['selected_month_timesheet_analysis2'] == 0:
-                chart_data = filtered_year.groupby("month").size().reset_index(name="event_count")
+                chart_data = cube.rollup(["month"], **period).rename(columns={"count": "event_count"})[["month", "event_count"]]
                 chart_data = chart_data.sort_values("month")
                 months_labels = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
                 chart_data["month_name"] = chart_data["month"].apply(lambda x: months_labels[x-1] if 1 <= x <= 12 else str(x))
@@ -188,8 +159,7 @@ def show_screen(user_data):
                 )
                 st.altair_chart(chart, use_container_width=True)
             else:
-                chart_data = filtered_month.groupby(filtered_month["date_t1"].dt.day).size().reset_index(name="event_count")
-                chart_data = chart_data.rename(columns={"date_t1": "day"})
+                chart_data = cube.rollup(["day"], **period).rename(columns={"count": "event_count"})[["day", "event_count"]]
                 chart_data = chart_data.sort_values("day")
                 base = alt.Chart(chart_data).encode(
                     x=alt.X('day:O', axis=alt.Axis(title='Day')),
@@ -211,9 +181,10 @@ def show_screen(user_data):
                 st.altair_chart(chart, use_container_width=True)
 
             # MÉTRICAS PERSONALIZADAS USANDO FILTERED_MONTH
-            total_errors = int(filtered_month.shape[0])
-            total_added = filtered_month['add_value_t1'].sum()
-            total_removed = filtered_month['remove_value_t1'].sum()
+            totals = cube.totals(**period)
+            total_errors = int(totals["count"])
+            total_added = totals["add_value_t1"]
+            total_removed = totals["remove_value_t1"]
             col1, col2, col3 = st.columns([1, 2, 2], gap="small")
             with col1:
                 st.markdown(f"<div style='color:#222;font-size:2em;font-weight:400;'>{total_errors}</div>", unsafe_allow_html=True)
@@ -227,23 +198,25 @@ def show_screen(user_data):
 
             # Dataframes filtrados pelo mês
             st.markdown("### :material/groups: Teams")
-            team_df = filtered_month.groupby("team_t1").agg(
-                Error_Count=("team_t1", "count"),
-                Added_Value=("add_value_t1", "sum"),
-                Removed_Value=("remove_value_t1", "sum")
-            ).reset_index().sort_values("Error_Count", ascending=False)
+            team_df = cube.rollup(["team_t1"], **period).rename(columns={
+                "count": "Error_Count",
+                "add_value_t1": "Added_Value",
+                "remove_value_t1": "Removed_Value"
+            }).sort_values("Error_Count", ascending=False)
             st.dataframe(team_df, use_container_width=True, hide_index=True)
             st.markdown("### :material/close: Errors")
-            error_df = filtered_month.groupby("error_t1").agg(
-                Count=("error_t1", "count"),
-                Added_Value=("add_value_t1", "sum"),
-                Removed_Value=("remove_value_t1", "sum")
-            ).reset_index().sort_values("Count", ascending=False)
+            error_df = cube.rollup(["error_t1"], **period).rename(columns={
+                "count": "Count",
+                "add_value_t1": "Added_Value",
+                "remove_value_t1": "Removed_Value"
+            }).sort_values("Count", ascending=False)
             st.dataframe(error_df, use_container_width=True, hide_index=True)
 
             st.warning("É necessário adicionar o controle de erros internos do Office para o timesheet como um novo st.dataframe.")
 
     with col_lateral:
+        # Resolver os nomes dos responsáveis com uma única consulta
+        user_names = get_user_names([d.get('user_id') for d in filtered_highlights + filtered_opportunities])
         with st.container(border=True):
             # 1. Monthly Highlights
             st.subheader(":material/rocket_launch: Monthly Highlights")
@@ -259,7 +232,7 @@ def show_screen(user_data):
                     # Buscar o nome do usuário responsável pelo primeiro highlight da lista
                     user_name = "Usuário não encontrado"
                     if highlights_list and 'user_id' in highlights_list[0]:
-                        user_name = get_user_name(highlights_list[0]['user_id'])
+                        user_name = user_names.get(str(highlights_list[0]['user_id']), 'Usuário não encontrado')
                     
                     with st.expander(f"{user_name} • {month}/{year}"):
                         for highlight in highlights_list:
@@ -296,7 +269,7 @@ def show_screen(user_data):
                     # Buscar o nome do usuário responsável pela primeira opportunity da lista
                     user_name = "Usuário não encontrado"
                     if opp_list and 'user_id' in opp_list[0]:
-                        user_name = get_user_name(opp_list[0]['user_id'])
+                        user_name = user_names.get(str(opp_list[0]['user_id']), 'Usuário não encontrado')
                     
                     with st.expander(f"{user_name} • {month}/{year}"):
                         opp_blocks = []
@@ -0,0 +1,68 @@
+import os
+import re
+import sys
+
+import pytest
+
+# Testes rodados da raiz do repositório: `python -m pytest -q`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import snapshot_store
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    """Snapshots locais num diretório temporário, sem modo offline nem fixtures"""
+    directory = tmp_path / "snapshots"
+    monkeypatch.setenv(snapshot_store.SNAPSHOT_DIR_ENV, str(directory))
+    monkeypatch.delenv("DATASET_OFFLINE", raising=False)
+    monkeypatch.delenv("DATASET_FIXTURES_DIR", raising=False)
+    monkeypatch.setattr(snapshot_store, "_saved_versions", {})
+    return directory
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def values_append(self, range, params=None, body=None):
+        self.worksheet.calls.append("values_append")
+        rows = [list(values) for values in body["values"]]
+        first = len(self.worksheet.rows) + 1
+        self.worksheet.rows.extend(rows)
+        return {"updates": {
+            "updatedRange": f"{range}!A{first}:C{len(self.worksheet.rows)}",
+            "updatedData": {"values": rows},
+        }}
+
+    def batch_update(self, body):
+        self.worksheet.calls.append("delete")
+        for request in body["requests"]:
+            del self.worksheet.rows[request["deleteDimension"]["range"]["startIndex"]]
+
+
+class FakeWorksheet:
+    """Aba em memória com a parte da API do gspread usada por SheetSync e MutationBuffer"""
+
+    def __init__(self, rows):
+        self.id = 0
+        self.title = "Sheet1"
+        self.rows = [list(row) for row in rows]
+        self.calls = []
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def get_values(self, range_name, value_render_option=None, date_time_render_option=None):
+        self.calls.append("get_values")
+        first = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        return [list(row) for row in self.rows[first - 1:]]
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls.append("update")
+        for item in data:
+            row = int(re.match(r"[A-Z]+(\d+)", item["range"]).group(1))
+            self.rows[row - 1] = list(item["values"][0])
+
+
+@pytest.fixture
+def worksheet():
+    return FakeWorksheet([["name", "value"], ["a", 1], ["b", 2]])
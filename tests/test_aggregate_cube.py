@@ -0,0 +1,54 @@
+import pandas as pd
+
+from database.aggregate_cube import AggregateCube, with_date
+
+
+def frame(rows):
+    df = pd.DataFrame(rows, columns=["Date", "team", "hours"])
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df.assign(year=df["Date"].dt.year, month=df["Date"].dt.month)
+
+
+ROWS = [
+    ("2025-01-10", "a", 1.0),
+    ("2025-01-10", "a", 2.0),
+    ("2025-01-11", "b", 4.0),
+    ("2025-02-01", "a", 8.0),
+]
+
+
+def cube(rows=ROWS):
+    return AggregateCube(frame(rows), "Date", ["team"], ["hours"])
+
+
+def test_totals_and_rollup_match_the_raw_rows():
+    df = frame(ROWS)
+    result = cube().rollup(["team"], year=2025, month=1)
+
+    assert cube().totals()["hours"] == df["hours"].sum()
+    assert cube().totals(equals={"team": "a"})["count"] == 3
+    assert result.set_index("team")["hours"].to_dict() == {"a": 3.0, "b": 4.0}
+
+
+def test_extended_adds_only_rows_after_the_known_ones():
+    rows = ROWS + [("2025-02-02", "b", 16.0)]
+    extended = cube().extended(frame(rows))
+
+    assert extended.rows == 5
+    assert extended.totals()["hours"] == 31.0
+    assert cube().extended(frame(ROWS)).rows == 4
+
+
+def test_patched_adds_and_removes_rows_without_touching_the_original():
+    original = cube()
+    patched = original.patched(added=frame([("2025-03-01", "c", 5.0)]), removed=frame([ROWS[2]]))
+
+    assert set(patched.select()["team"]) == {"a", "c"}
+    assert patched.totals()["hours"] == 16.0
+    assert original.totals()["hours"] == 15.0
+
+
+def test_with_date_rebuilds_the_date_column():
+    daily = cube().rollup(["year", "month", "day"])
+
+    assert with_date(daily)["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2025-01-10", "2025-01-11", "2025-02-01"]
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from bson import ObjectId
+
+from database import auth
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    settings = {"pbkdf2_iterations": 1000, "session_secret": "test-secret", "session_ttl_hours": 1}
+    monkeypatch.setattr(auth, "_config", lambda: settings)
+    monkeypatch.setattr(auth, "_revoked", {})
+    auth._session_cache().invalidate()
+    return settings
+
+
+@pytest.fixture
+def user():
+    return {"_id": ObjectId(), "login": "ana", "roles": ["timesheet_admin"]}
+
+
+def test_password_hash_round_trip():
+    stored = auth.hash_password("secret")
+
+    assert stored.startswith(auth.HASH_PREFIX + "$1000$")
+    assert auth.verify_password("secret", stored) == (True, False)
+    assert auth.verify_password("wrong", stored) == (False, False)
+
+
+def test_legacy_and_cheaper_hashes_need_upgrade(config):
+    assert auth.verify_password("secret", "secret") == (True, True)
+
+    stored = auth.hash_password("secret")
+    config["pbkdf2_iterations"] = 2000
+    assert auth.verify_password("secret", stored) == (True, True)
+
+
+def test_missing_password_never_matches():
+    assert auth.verify_password("secret", None) == (False, False)
+    assert auth.verify_password(None, auth.hash_password("secret")) == (False, False)
+
+
+def test_session_token_resumes_the_user(user):
+    token = auth.issue_session_token(user)
+
+    assert auth.resume_session(token) == user
+
+
+def test_tampered_token_is_rejected(user):
+    body, signature = auth.issue_session_token(user).split(".")
+    forged = auth._b64encode(b'{"sub":"other","exp":9999999999,"nonce":"x"}')
+
+    assert auth.resume_session(f"{forged}.{signature}") is None
+    assert auth.resume_session(f"{body}.") is None
+    assert auth.resume_session("not-a-token") is None
+
+
+def test_token_from_another_secret_is_rejected(config, user):
+    token = auth.issue_session_token(user)
+    config["session_secret"] = "rotated"
+
+    assert auth.resume_session(token) is None
+
+
+def test_expired_token_is_rejected(monkeypatch, user):
+    token = auth.issue_session_token(user)
+    now = time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + 2 * 3600)
+
+    assert auth.resume_session(token) is None
+
+
+def test_revoked_token_is_rejected_and_pruned_after_expiry(monkeypatch, user):
+    token = auth.issue_session_token(user)
+    auth.revoke_session(token)
+
+    assert auth.resume_session(token) is None
+    assert token in auth._revoked
+
+    now = time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + 2 * 3600)
+    auth.revoke_session(auth.issue_session_token(user))
+    assert token not in auth._revoked
@@ -0,0 +1,186 @@
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+from database import dataset_store as dataset_store_module
+from database.dataset_store import DatasetStore
+
+
+class Source:
+    """Origem falsa: conta as cargas e devolve um DataFrame novo a cada uma"""
+
+    def __init__(self, rows=3):
+        self.rows = rows
+        self.calls = 0
+
+    def fetch(self, previous=None):
+        self.calls += 1
+        return pd.DataFrame({"value": range(self.rows)})
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Gravações de snapshot feitas pelo store (sem tocar no disco)"""
+    calls = []
+    monkeypatch.setattr(dataset_store_module, "save_snapshot", lambda *args: calls.append(args))
+    return calls
+
+
+@pytest.fixture
+def store():
+    return DatasetStore()
+
+
+def test_get_loads_once_and_shares_the_snapshot(store, saved):
+    source = Source()
+    store.register("items", source.fetch)
+
+    first = store.get("items")
+    second = store.get("items")
+
+    assert first is second
+    assert source.calls == 1
+    assert store.version("items") == 1
+    assert len(saved) == 1
+
+
+def test_get_unregistered_dataset_raises(store):
+    with pytest.raises(KeyError):
+        store.get("missing")
+
+
+def test_invalidate_reloads_on_next_get(store, saved):
+    source = Source()
+    store.register("items", source.fetch)
+    first = store.get("items")
+
+    store.invalidate("items")
+    source.rows = 5
+    second = store.get("items")
+
+    assert second is not first
+    assert len(second) == 5
+    assert source.calls == 2
+    assert store.version("items") == 2
+
+
+def test_fetch_returning_previous_keeps_version(store, saved):
+    store.register("items", lambda previous: previous if previous is not None else pd.DataFrame({"value": [1]}))
+    first = store.get("items")
+
+    store.invalidate("items")
+
+    assert store.get("items") is first
+    assert store.version("items") == 1
+    assert len(saved) == 1
+
+
+def test_stale_get_serves_snapshot_and_refreshes_in_background(store, saved):
+    source = Source()
+    release = threading.Event()
+
+    def fetch(previous=None):
+        if previous is not None:
+            release.wait(5)
+        return source.fetch(previous)
+
+    store.register("items", fetch, ttl=0)
+    first = store.get("items")
+    time.sleep(0.01)
+
+    # A atualização fica presa em fetch: a leitura devolve o snapshot anterior na hora
+    assert store.get("items") is first
+    release.set()
+    deadline = time.time() + 5
+    while store.version("items") < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert source.calls == 2
+    assert store.version("items") == 2
+
+
+def test_mutate_patches_snapshot_and_derived_values(store, saved):
+    store.register("items", Source().fetch)
+    store.get("items")
+    builds = []
+    store.derived("items", "total", lambda df: builds.append(1) or int(df["value"].sum()))
+
+    store.mutate(
+        "items",
+        lambda df: pd.concat([df, pd.DataFrame({"value": [10]})], ignore_index=True),
+        derived={"total": lambda total, df: total + 10},
+    )
+
+    assert store.get("items")["value"].tolist() == [0, 1, 2, 10]
+    assert store.version("items") == 2
+    assert store.derived("items", "total", lambda df: builds.append(1) or int(df["value"].sum())) == 13
+    assert len(builds) == 1
+
+
+def test_mutate_before_first_load_is_ignored(store, saved):
+    source = Source()
+    store.register("items", source.fetch)
+
+    store.mutate("items", lambda df: pytest.fail("patch sem snapshot carregado"))
+
+    assert len(store.get("items")) == 3
+    assert source.calls == 1
+
+
+def test_mutate_older_than_last_load_forces_reload(store, saved):
+    source = Source()
+    store.register("items", source.fetch)
+    started = time.time() - 60
+    store.get("items")
+
+    store.mutate("items", lambda df: pytest.fail("a carga já contém a escrita"), since=started)
+    store.get("items")
+
+    assert source.calls == 2
+
+
+def test_mutate_patch_returning_none_invalidates(store, saved):
+    source = Source()
+    store.register("items", source.fetch)
+    first = store.get("items")
+
+    store.mutate("items", lambda df: None)
+
+    assert store.version("items") == 1
+    assert store.get("items") is not first
+    assert source.calls == 2
+
+
+def test_memoized_is_keyed_by_snapshot_version(store, saved):
+    store.register("items", Source().fetch)
+    store.get("items")
+    calls = []
+
+    @store.memoized("items")
+    def total(offset=0):
+        calls.append(offset)
+        return int(store.get("items")["value"].sum()) + offset
+
+    assert total() == 3
+    assert total() == 3
+    store.mutate("items", lambda df: df.assign(value=df["value"] * 2))
+    assert total() == 6
+    assert calls == [0, 0]
+
+
+def test_memoized_survives_a_refresh_without_changes(store, saved):
+    store.register("items", lambda previous: previous if previous is not None else pd.DataFrame({"value": [1, 2]}))
+    store.get("items")
+    calls = []
+
+    @store.memoized("items")
+    def total():
+        calls.append(1)
+        return int(store.get("items")["value"].sum())
+
+    assert total() == 3
+    store.invalidate("items")
+    store.get("items")
+    assert total() == 3
+    assert len(calls) == 1
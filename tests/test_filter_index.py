@@ -0,0 +1,43 @@
+import pandas as pd
+
+from database.filter_index import FilterIndex
+
+
+def frame():
+    return pd.DataFrame({
+        "team": pd.Categorical(["a", "b", "a", "c", None]),
+        "year": [2024, 2024, 2025, 2025, 2025],
+        "month": [1, 2, 1, 1, 2],
+    })
+
+
+def test_without_filters_returns_the_frame_itself():
+    df = frame()
+    index = FilterIndex(df, ["team"])
+
+    assert index.positions() is None
+    assert index.select() is df
+
+
+def test_filters_are_intersected():
+    index = FilterIndex(frame(), ["team"])
+
+    assert index.positions(year=2025).tolist() == [2, 3, 4]
+    assert index.positions(year=2025, month=1).tolist() == [2, 3]
+    assert index.positions(year=2025, equals={"team": "a"}).tolist() == [2]
+    assert index.positions(isin={"team": ["a", "c"]}).tolist() == [0, 2, 3]
+    assert index.select(month=2)["team"].tolist()[0] == "b"
+
+
+def test_empty_values_are_ignored_and_missing_values_match_nothing():
+    index = FilterIndex(frame(), ["team"])
+
+    assert index.positions(month=0, equals={"team": None}, isin={"team": []}) is None
+    assert index.positions(equals={"team": "z"}).tolist() == []
+    assert index.positions(year=2030, isin={"team": ["a"]}).tolist() == []
+
+
+def test_values_only_lists_present_values():
+    index = FilterIndex(frame(), ["team"])
+
+    assert sorted(index.values("team")) == ["a", "b", "c"]
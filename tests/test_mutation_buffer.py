@@ -0,0 +1,77 @@
+import pytest
+
+from database.mutation_buffer import MutationBuffer
+
+
+@pytest.fixture
+def buffer(worksheet):
+    return MutationBuffer(lambda gid: worksheet, max_delay=None)
+
+
+def test_flush_applies_updates_then_deletes_then_appends(buffer, worksheet):
+    worksheet.rows.append(["c", 3])
+    applied = []
+    buffer.listen(0, lambda writes: applied.extend(w.kind for w in writes))
+
+    appended = buffer.append(0, ["d", 4])
+    buffer.delete(0, 2)
+    buffer.update(0, 4, ["c", 30])
+    buffer.delete(0, 3)
+    buffer.commit()
+
+    # Linhas na numeração de antes do lote: a edição da linha 4 não é deslocada pelas remoções
+    assert worksheet.rows == [["name", "value"], ["c", 30], ["d", 4]]
+    assert worksheet.calls == ["update", "delete", "values_append"]
+    assert applied == ["update", "delete", "delete", "append"]
+    assert appended.ok and appended.row == 3
+
+
+def test_same_row_deleted_twice_is_queued_once(buffer, worksheet):
+    first = buffer.delete(0, 2)
+
+    assert buffer.delete(0, 2) is first
+    buffer.commit()
+    assert worksheet.rows == [["name", "value"], ["b", 2]]
+
+
+def test_flush_by_size(worksheet):
+    buffer = MutationBuffer(lambda gid: worksheet, max_writes=2, max_delay=None)
+
+    buffer.append(0, ["c", 3])
+    assert buffer.pending() == 1
+    buffer.append(0, ["d", 4])
+
+    assert buffer.pending() == 0
+    assert worksheet.calls == ["values_append"]
+
+
+def test_failed_call_marks_its_writes_and_calls_on_error(worksheet):
+    failed = []
+    buffer = MutationBuffer(lambda gid: worksheet, max_delay=None, on_error=failed.append)
+
+    def broken(body):
+        raise RuntimeError("quota")
+
+    worksheet.spreadsheet.batch_update = broken
+    deleted = buffer.delete(0, 2)
+    appended = buffer.append(0, ["c", 3])
+    buffer.commit()
+
+    assert deleted.wait(1) is False
+    assert isinstance(deleted.error, RuntimeError)
+    assert appended.ok
+    assert failed == [0]
+
+
+def test_unavailable_tab_fails_every_write(worksheet):
+    failed = []
+
+    def get_worksheet(gid):
+        raise LookupError("aba removida")
+
+    buffer = MutationBuffer(get_worksheet, max_delay=None, on_error=failed.append)
+    write = buffer.append(7, ["c", 3])
+    buffer.commit()
+
+    assert write.ok is False
+    assert failed == [7]
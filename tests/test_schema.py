@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from database.schema import DatasetSchema, coerce_numeric, downcast_numeric
+
+
+def schema():
+    return DatasetSchema(
+        renames={"Value": "value"},
+        text=["name"],
+        numeric=["value"],
+        dates={"Date": "%m/%d/%Y"},
+        categories=["team"],
+        period="Date",
+        row_number="sheet_row",
+    )
+
+
+def raw(rows):
+    return pd.DataFrame(rows, columns=[" name ", "team", "Value", "Date"])
+
+
+def test_coerce_numeric_accepts_formatted_values():
+    values = coerce_numeric(pd.Series(["$1,234.50", "", None, "7"]))
+
+    assert values[[0, 3]].tolist() == [1234.5, 7.0]
+    assert values[[1, 2]].isna().all()
+
+
+def test_downcast_keeps_float64_when_float32_loses_cents():
+    assert downcast_numeric(pd.Series([1, 2, 3])).dtype == np.int8
+    assert downcast_numeric(pd.Series([1.25, 2.5])).dtype == np.float32
+    assert downcast_numeric(pd.Series([123456789.01])).dtype == np.float64
+
+
+def test_apply_types_columns_and_drops_invalid_rows():
+    df = schema().apply(raw([
+        ["ana", "a", "$10.50", "01/15/2025"],
+        [None, None, None, None],
+        ["bia", "b", "3", "invalid"],
+        ["caio", "b", "4", "2025-02-01"],
+    ]))
+
+    assert df["name"].tolist() == ["ana", "caio"]
+    assert df["sheet_row"].tolist() == [2, 5]
+    assert df["month"].tolist() == [1, 2]
+    assert df["value"].dtype == np.float32
+    assert list(df["team"].cat.categories) == ["a", "b"]
+    assert schema().source_columns(df) == ["name", "team", "value", "Date"]
+
+
+def test_concat_merges_category_dictionaries():
+    previous = schema().apply(raw([["ana", "b", "1", "01/15/2025"]]))
+    appended = schema().apply(raw([["bia", "a", "2", "01/16/2025"]]), row_numbers=[3])
+
+    df = schema().concat(previous, appended)
+
+    assert isinstance(df["team"].dtype, pd.CategoricalDtype)
+    assert list(df["team"].cat.categories) == ["a", "b"]
+    assert df["team"].tolist() == ["b", "a"]
+    assert df["sheet_row"].tolist() == [2, 3]
+
+
+def test_replace_and_remove_a_row():
+    df = schema().apply(raw([["ana", "a", "1", "01/15/2025"], ["bia", "b", "2", "01/16/2025"]]))
+    edited = schema().apply(raw([["ana", "c", "5", "01/15/2025"]]))
+
+    replaced = schema().replace(df, 0, edited)
+    removed = schema().replace(df, 0, edited.iloc[0:0])
+
+    assert replaced["team"].tolist() == ["c", "b"]
+    assert removed["name"].tolist() == ["bia"]
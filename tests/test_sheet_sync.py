@@ -0,0 +1,90 @@
+import pytest
+
+from database.ingestion import values_to_frame
+from database.sheet_sync import SheetSync
+
+
+@pytest.fixture
+def sync(worksheet):
+    sync = SheetSync(lambda gid: worksheet)
+    sync.remember(0, values_to_frame(worksheet.rows))
+    return sync
+
+
+def test_fetch_appended_returns_only_new_rows(sync, worksheet):
+    previous = values_to_frame(worksheet.rows)
+    worksheet.rows.append(["c", 3])
+
+    data = sync.fetch_appended(0, previous)
+
+    assert data["name"].tolist() == ["a", "b", "c"]
+    assert sync.appended_only
+    assert sync.state()["tabs"][0]["last_row"] == 4
+
+
+def test_fetch_appended_converts_blank_cells_to_none(sync, worksheet):
+    previous = values_to_frame(worksheet.rows)
+    worksheet.rows.append(["c", ""])
+
+    data = sync.fetch_appended(0, previous)
+
+    assert data["value"].iloc[-1] is None
+
+
+def test_fetch_appended_without_changes_returns_previous(sync, worksheet):
+    previous = values_to_frame(worksheet.rows)
+
+    assert sync.fetch_appended(0, previous) is previous
+
+
+def test_edited_last_row_requires_full_reload(sync, worksheet):
+    previous = values_to_frame(worksheet.rows)
+    worksheet.rows[-1] = ["b", 20]
+    worksheet.rows.append(["c", 3])
+
+    assert sync.fetch_appended(0, previous) is None
+
+
+def test_record_append_uses_the_response_values(sync, worksheet):
+    worksheet.calls.clear()
+    response = worksheet.spreadsheet.values_append("'Sheet1'", body={"values": [["c", 3]]})
+
+    sync.record_append(0, response)
+
+    assert worksheet.calls == ["values_append"]
+    assert sync.state()["tabs"][0]["last_row"] == 4
+    # A próxima sincronização não traz de novo a linha gravada pelo app
+    previous = values_to_frame(worksheet.rows)
+    assert sync.fetch_appended(0, previous) is previous
+
+
+def test_record_append_after_another_writer_forgets_the_tab(sync, worksheet):
+    worksheet.rows.append(["x", 9])
+    response = worksheet.spreadsheet.values_append("'Sheet1'", body={"values": [["c", 3]]})
+
+    sync.record_append(0, response)
+
+    assert 0 not in sync.state()["tabs"]
+
+
+def test_record_delete_shifts_last_row(sync):
+    sync.record_delete(0, 2)
+    assert sync.state()["tabs"][0]["last_row"] == 2
+
+    sync.record_delete(0, 2)
+    assert 0 not in sync.state()["tabs"]
+
+
+def test_record_update_of_last_row_forgets_the_tab(sync):
+    sync.record_update(0, 2)
+    assert 0 in sync.state()["tabs"]
+
+    sync.record_update(0, 3)
+    assert 0 not in sync.state()["tabs"]
+
+
+def test_state_round_trip(sync):
+    restored = SheetSync(sync.get_worksheet)
+    restored.restore(sync.state())
+
+    assert restored.state() == sync.state()
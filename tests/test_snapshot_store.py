@@ -0,0 +1,103 @@
+import json
+
+import pandas as pd
+import pytest
+
+from database import snapshot_store
+from database.dataset_store import DatasetStore, OFFLINE_ENV
+from database.snapshot_store import save_snapshot, load_snapshot
+
+
+def frame(rows=3):
+    return pd.DataFrame({"name": [f"n{i}" for i in range(rows)], "value": range(rows)})
+
+
+def unreachable(previous=None):
+    raise AssertionError("a origem não deve ser acessada")
+
+
+def test_round_trip_dataframe_and_tuple():
+    assert save_snapshot("single", frame(), {"signal": "a"}, version=1)
+    assert save_snapshot("pair", (frame(2), frame(4)), version=1)
+
+    data, meta = load_snapshot("single")
+    pd.testing.assert_frame_equal(data, frame())
+    assert meta["sync"] == {"signal": "a"}
+    assert meta["version"] == 1
+
+    first, second = load_snapshot("pair")[0]
+    assert (len(first), len(second)) == (2, 4)
+
+
+def test_missing_snapshot_returns_none():
+    assert load_snapshot("missing") is None
+
+
+def test_older_version_is_not_written_over_newer():
+    assert save_snapshot("items", frame(5), version=2)
+    assert not save_snapshot("items", frame(1), version=1)
+
+    data, meta = load_snapshot("items")
+    assert len(data) == 5
+    assert meta["version"] == 2
+
+
+def test_only_current_parts_are_kept(snapshot_dir):
+    save_snapshot("items", frame(1), version=1)
+    save_snapshot("items", frame(2), version=2)
+
+    meta = json.loads((snapshot_dir / "items.json").read_text(encoding="utf-8"))
+    parts = sorted(path.name for path in snapshot_dir.glob("items.*.feather"))
+    assert parts == [f"items.{meta['snapshot_id']}.0.feather"]
+
+
+def test_parts_not_matching_meta_are_rejected(snapshot_dir):
+    save_snapshot("items", frame(3), version=1)
+    meta_path = snapshot_dir / "items.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["rows"] = [4]
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    assert load_snapshot("items") is None
+
+
+def test_other_schema_version_is_ignored(snapshot_dir):
+    save_snapshot("items", frame(), version=1)
+    meta_path = snapshot_dir / "items.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["schema_version"] = snapshot_store.SNAPSHOT_SCHEMA_VERSION - 1
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    assert load_snapshot("items") is None
+
+
+def test_offline_get_serves_the_local_snapshot(monkeypatch):
+    class Sync:
+        restored = None
+
+        def state(self):
+            return {"signal": "rev-1"}
+
+        def restore(self, state):
+            self.restored = state
+
+    online = DatasetStore()
+    online.register("items", lambda previous: frame(), sync=Sync())
+    online.get("items")
+
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    sync = Sync()
+    offline = DatasetStore()
+    offline.register("items", unreachable, sync=sync)
+
+    pd.testing.assert_frame_equal(offline.get("items"), frame())
+    assert sync.restored == {"signal": "rev-1"}
+
+
+def test_offline_get_without_snapshot_raises(monkeypatch):
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    store = DatasetStore()
+    store.register("items", unreachable)
+
+    with pytest.raises(RuntimeError):
+        store.get("items")
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+from bson import json_util
+
+from database import write_queue as write_queue_module
+from database.write_queue import WriteQueue, DONE, FAILED, PENDING
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(write_queue_module, "RETRY_DELAY_SECONDS", 0)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal" / "writes.jsonl")
+
+
+def finished(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status == PENDING and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def journal(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json_util.loads(line) for line in file if line.strip()]
+
+
+def test_submit_runs_the_op_and_records_the_outcome(path):
+    queue = WriteQueue(path)
+    calls, seen = [], []
+    queue.register("op", lambda value: calls.append(value))
+    queue.listen(seen.append)
+
+    job = queue.submit("op", "resource", 1, owner="session")
+
+    assert finished(job) == DONE
+    assert calls == [1]
+    assert seen == [job]
+    assert queue.jobs(owner="session") == [job]
+    assert [record.get("status") for record in journal(path)] == [None, DONE]
+
+
+def test_unregistered_op_raises(path):
+    with pytest.raises(KeyError):
+        WriteQueue(path).submit("missing", "resource")
+
+
+def test_journal_directory_is_created_on_first_write(path, tmp_path):
+    queue = WriteQueue(path)
+    queue.register("op", lambda: True)
+    assert not (tmp_path / "journal").exists()
+
+    finished(queue.submit("op", "resource"))
+
+    assert (tmp_path / "journal").exists()
+
+
+def test_pending_writes_are_replayed_from_the_journal(path):
+    first = WriteQueue(path)
+    first._append_journal({"id": "a", "op": "op", "resource": "r", "args": [1], "kwargs": {}, "label": "op"})
+    first._append_journal({"id": "b", "op": "op", "resource": "r", "args": [2], "kwargs": {}, "label": "op"})
+    first._append_journal({"id": "b", "status": DONE, "error": None})
+
+    calls = []
+    second = WriteQueue(path)
+    # Só a escrita sem desfecho fica no journal compactado
+    assert [record["id"] for record in journal(path)] == ["a"]
+    second.register("op", lambda value: calls.append(value))
+
+    assert finished(second.jobs()[0]) == DONE
+    assert calls == [1]
+
+
+def test_failed_attempts_are_retried(path):
+    queue = WriteQueue(path)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < write_queue_module.MAX_ATTEMPTS:
+            raise ConnectionError("timeout")
+        return True
+
+    queue.register("flaky", flaky)
+    job = queue.submit("flaky", "resource")
+
+    assert finished(job) == DONE
+    assert job.attempts == write_queue_module.MAX_ATTEMPTS
+
+
+def test_op_returning_false_fails_after_max_attempts(path):
+    queue = WriteQueue(path)
+    queue.register("broken", lambda: False)
+
+    job = queue.submit("broken", "resource")
+
+    assert finished(job) == FAILED
+    assert job.attempts == write_queue_module.MAX_ATTEMPTS
+    assert job.error
+
+
+def test_non_serializable_args_run_without_journal(path):
+    queue = WriteQueue(path)
+    calls = []
+    queue.register("op", lambda value: calls.append(value))
+    value = object()
+
+    job = queue.submit("op", "resource", value)
+
+    assert finished(job) == DONE
+    assert calls == [value]
+    assert all(record["id"] != job.id or "status" in record for record in journal(path))
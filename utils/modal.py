@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from database.mongodb_utils import get_collection_data_by_area, insert_document, update_document, delete_document
+import copy
+from database.area_data import get_area_data, SCREEN_AREAS
 from bson import ObjectId
+from utils.write_status import session_owner
 
 def set_active_tab(tab_name):
     st.session_state['active_modal_tab'] = tab_name
@@ -17,17 +19,14 @@ def _modal_dialog():
     
     # Determinar qual área usar baseado na página atual
     current_page = st.session_state.get('current_page', 'timesheet_analysis')
-    # Novo mapeamento expansivo de páginas para áreas
-    PAGE_AREA_MAP = {
-        'permit_control': 'permit',
-        'accounting_indicators': 'accounting',
-        'timesheet_analysis': 'timesheet',
-        # Adicione aqui novas páginas e áreas conforme necessário
-    }
-    # Tenta mapear, senão usa o nome da página (removendo sufixos comuns)
-    area_filter = PAGE_AREA_MAP.get(current_page)
+    # Tenta mapear (database.area_data.SCREEN_AREAS), senão usa o nome da página (removendo sufixos comuns)
+    area_filter = SCREEN_AREAS.get(current_page)
     if area_filter is None:
         area_filter = current_page.replace('_analysis', '').replace('pages/', '')
+    # Leituras e escritas passam pelo AreaData para manter o cache das páginas atualizado;
+    # as escritas vão para o write_queue e aparecem na hora (otimistas), sem travar o modal
+    area_data = get_area_data(area_filter)
+    owner = session_owner()
     
     # Obter o user_id do usuário atual
     current_user_id = st.session_state.get('user_data', {}).get('_id')
@@ -59,7 +58,7 @@ def _modal_dialog():
     with tab_map["Monthly Highlights"]:
         set_active_tab("Monthly Highlights")
         # Buscar todos os anos disponíveis para o usuário logado
-        all_highlights = get_collection_data_by_area('monthly_highlights', area_filter=area_filter, include_id=True)
+        all_highlights = area_data.all_documents('monthly_highlights')
         obj_user_id = ObjectId(current_user_id) if current_user_id else None
         years = sorted({h.get('year') for h in all_highlights if h.get('year') and h.get('user_id') == obj_user_id})
         if not years:
@@ -73,7 +72,7 @@ def _modal_dialog():
                 months_for_year = [datetime.now().month]
             month = st.selectbox("Month", options=months_for_year, index=0, key="highlight_month", on_change=lambda: set_active_tab("Monthly Highlights"))
         # Buscar highlights do banco filtrando por user_id, ano, mês, área
-        highlights = get_collection_data_by_area('monthly_highlights', area_filter=area_filter, include_id=True)
+        highlights = all_highlights
         filtered = [
             h for h in highlights
             if h.get('year') == year and h.get('month') == month and h.get('user_id') == obj_user_id
@@ -85,37 +84,35 @@ def _modal_dialog():
             neg = st.text_area("Negatives (one per line)", value="\n".join([n.get('title','') for n in h.get('negative', [])]), key=f"edit_highlight_neg")
             if st.button(":material/save: Save", key=f"save_highlight"):
                 filter_query = {'_id': h['_id']} if '_id' in h else {'year': year, 'month': month, 'user_id': current_user_id}
-                update_document('monthly_highlights', filter_query, {
+                area_data.submit('update', 'monthly_highlights', filter_query, {
                     'year': year,
                     'month': month,
                     'user_id': current_user_id,
                     'area': area_filter,
                     'positive': [{'title': t.strip()} for t in pos.splitlines() if t.strip()],
                     'negative': [{'title': t.strip()} for t in neg.splitlines() if t.strip()]
-                })
-                st.success("Updated!")
+                }, label="highlight", owner=owner)
                 st.rerun()
-            confirm_delete(":material/delete: Delete", lambda: (delete_document('monthly_highlights', {'_id': h['_id']} if '_id' in h else {'year': year, 'month': month, 'user_id': current_user_id}), st.success("Deleted!"), st.rerun()), key=f"popover_highlight")
+            confirm_delete(":material/delete: Delete", lambda: (area_data.submit('delete', 'monthly_highlights', {'_id': h['_id']} if '_id' in h else {'year': year, 'month': month, 'user_id': current_user_id}, label="highlight deletion", owner=owner), st.rerun()), key=f"popover_highlight")
         else:
             with st.form(key="add_highlight_form"):
                 pos_new = st.text_area("Positives (one per line)", key="add_highlight_pos")
                 neg_new = st.text_area("Negatives (one per line)", key="add_highlight_neg")
                 submitted = st.form_submit_button(":material/add: Save Highlight")
                 if submitted:
-                    insert_document('monthly_highlights', {
+                    area_data.submit('insert', 'monthly_highlights', {
                         'year': year,
                         'month': month,
                         'user_id': current_user_id,
                         'area': area_filter,
                         'positive': [{'title': t.strip()} for t in pos_new.splitlines() if t.strip()],
                         'negative': [{'title': t.strip()} for t in neg_new.splitlines() if t.strip()]
-                    })
-                    st.success("Added!")
+                    }, label="highlight", owner=owner)
                     st.rerun()
 
     with tab_map["Opportunities"]:
         set_active_tab("Opportunities")
-        all_opportunities = get_collection_data_by_area('monthly_opportunities', area_filter=area_filter, include_id=True)
+        all_opportunities = area_data.all_documents('monthly_opportunities')
         years = sorted({o.get('year') for o in all_opportunities if o.get('year') and o.get('user_id') == obj_user_id})
         if not years:
             years = [datetime.now().year]
@@ -127,7 +124,7 @@ def _modal_dialog():
             if not months_for_year:
                 months_for_year = [datetime.now().month]
             month = st.selectbox("Month", options=months_for_year, index=0, key="opp_month", on_change=lambda: set_active_tab("Opportunities"))
-        opportunities = get_collection_data_by_area('monthly_opportunities', area_filter=area_filter, include_id=True)
+        opportunities = all_opportunities
         filtered = [
             o for o in opportunities
             if o.get('year') == year and o.get('month') == month and o.get('user_id') == obj_user_id
@@ -153,16 +150,15 @@ def _modal_dialog():
                         'user_id': current_user_id
                     })
                 filter_query = {'_id': o['_id']} if '_id' in o else {'year': year, 'month': month, 'user_id': current_user_id}
-                update_document('monthly_opportunities', filter_query, {
+                area_data.submit('update', 'monthly_opportunities', filter_query, {
                     'year': year,
                     'month': month,
                     'user_id': current_user_id,
                     'area': area_filter,
                     'opportunity_list': new_blocks
-                })
-                st.success("Updated!")
+                }, label="opportunity", owner=owner)
                 st.rerun()
-            confirm_delete(":material/delete: Delete", lambda: (delete_document('monthly_opportunities', {'_id': o['_id']} if '_id' in o else {'year': year, 'month': month, 'user_id': current_user_id}), st.success("Deleted!"), st.rerun()), key=f"popover_opp")
+            confirm_delete(":material/delete: Delete", lambda: (area_data.submit('delete', 'monthly_opportunities', {'_id': o['_id']} if '_id' in o else {'year': year, 'month': month, 'user_id': current_user_id}, label="opportunity deletion", owner=owner), st.rerun()), key=f"popover_opp")
         else:
             with st.form(key="add_opp_form"):
                 title_new = st.text_input("Title", key="add_opp_title")
@@ -173,7 +169,7 @@ def _modal_dialog():
                     if not title_new.strip() or not challenges_new.strip() or not improvements_new.strip():
                         st.error("Title, Challenges, and Improvements are required.")
                     else:
-                        insert_document('monthly_opportunities', {
+                        area_data.submit('insert', 'monthly_opportunities', {
                             'year': year,
                             'month': month,
                             'user_id': current_user_id,
@@ -183,13 +179,12 @@ def _modal_dialog():
                                 'challenges': [c.strip() for c in challenges_new.splitlines() if c.strip()],
                                 'improvements': [i.strip() for i in improvements_new.splitlines() if i.strip()]
                             }]
-                        })
-                        st.success("Added!")
+                        }, label="opportunity", owner=owner)
                         st.rerun()
 
     with tab_map["Action Plans"]:
         set_active_tab("Action Plans")
-        all_plans = get_collection_data_by_area('action_plans', area_filter=area_filter, include_id=True)
+        all_plans = area_data.all_documents('action_plans')
         years = sorted({p.get('created_at').year for p in all_plans if p.get('created_at') and hasattr(p.get('created_at'), 'year') and p.get('user_id') == obj_user_id})
         if not years:
             years = [datetime.now().year]
@@ -201,7 +196,7 @@ def _modal_dialog():
             if not months_for_year:
                 months_for_year = [datetime.now().month]
             month = st.selectbox("Month", options=months_for_year, index=0, key="plan_month", on_change=lambda: set_active_tab("Action Plans"))
-        plans = get_collection_data_by_area('action_plans', area_filter=area_filter, include_id=True)
+        plans = all_plans
         filtered = [
             p for p in plans
             if hasattr(p.get('created_at', None), 'year') and p['created_at'].year == year and p['created_at'].month == month and p.get('user_id') == obj_user_id
@@ -217,7 +212,8 @@ def _modal_dialog():
             if key not in st.session_state:
                 if filtered:
                     # Garantir que subplans/actions tenham id
-                    plan = filtered[0].copy()
+                    # Cópia profunda: o documento vem do cache compartilhado entre sessões
+                    plan = copy.deepcopy(filtered[0])
                     for sidx, sub in enumerate(plan.get('subplans', [])):
                         if 'id' not in sub or not sub['id']:
                             sub['id'] = f"sub{sidx+1}"
@@ -364,11 +360,9 @@ def _modal_dialog():
                     plan_state['area'] = area_filter
                     if filtered:
                         filter_query = {'_id': filtered[0]['_id']} if '_id' in filtered[0] else {'year': year, 'month': month, 'user_id': current_user_id}
-                        update_document('action_plans', filter_query, plan_state)
-                        st.success("Updated!")
+                        area_data.submit('update', 'action_plans', filter_query, copy.deepcopy(plan_state), label="action plan", owner=owner)
                     else:
-                        insert_document('action_plans', plan_state)
-                        st.success("Created!")
+                        area_data.submit('insert', 'action_plans', copy.deepcopy(plan_state), label="action plan", owner=owner)
                     save_success = True
                 except Exception as e:
                     st.error(f"Erro ao salvar: {e}")
@@ -376,8 +370,7 @@ def _modal_dialog():
             def delete_plan():
                 try:
                     filter_query = {'_id': filtered[0]['_id']} if filtered and '_id' in filtered[0] else {'year': year, 'month': month, 'user_id': current_user_id}
-                    delete_document('action_plans', filter_query)
-                    st.success("Deleted!")
+                    area_data.submit('delete', 'action_plans', filter_query, label="action plan deletion", owner=owner)
                     st.session_state['modal_open'] = False
                     st.session_state['show_manage_modal'] = False
                     st.rerun()
@@ -0,0 +1,90 @@
+import math
+import streamlit as st
+
+PAGE_SIZES = [10, 25, 50, 100]
+
+def _toggle_details(key, label):
+    expanded_key = f"{key}_expanded"
+    st.session_state[expanded_key] = None if st.session_state.get(expanded_key) == label else label
+
+def _reset_page(key):
+    st.session_state[f"{key}_page"] = 1
+
+def show_permit_list(filtered, display, key="permit_list"):
+    """
+    Lista paginada e pesquisável de permits.
+
+    Só a página visível é materializada e enviada ao navegador; os detalhes
+    (observação, datas de aplicação/emissão, arquivo) só são renderizados para o
+    permit expandido.
+
+    Args:
+        filtered: DataFrame filtrado (índice = posição no snapshot)
+        display: colunas de exibição pré-calculadas do snapshot (get_permit_display)
+        key: prefixo das chaves de session_state
+    """
+    col_search, col_size, col_page = st.columns([4, 1, 1], vertical_alignment="bottom")
+    with col_search:
+        query = st.text_input(
+            "Search",
+            key=f"{key}_search",
+            placeholder="Model, jobsite, address, situation...",
+            on_change=_reset_page,
+            args=(key,),
+        ).strip().lower()
+    with col_size:
+        page_size = st.selectbox("Per page", PAGE_SIZES, key=f"{key}_page_size", on_change=_reset_page, args=(key,))
+
+    # filtered e display podem vir de versões diferentes do snapshot (write-through
+    # ou recarga entre as duas leituras): linhas ausentes do display são descartadas
+    search = display["search"].reindex(filtered.index).dropna()
+    if query:
+        search = search[search.str.contains(query, regex=False, na=False)]
+    labels = search.index
+    total_pages = max(math.ceil(len(labels) / page_size), 1)
+    # Os filtros da tela podem ter reduzido o número de páginas desde o último rerun
+    if st.session_state.get(f"{key}_page", 1) > total_pages:
+        st.session_state[f"{key}_page"] = total_pages
+    with col_page:
+        page = int(st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=f"{key}_page"))
+
+    if not len(labels):
+        st.info("No permits found")
+        return
+    start = (page - 1) * page_size
+    rows = display.reindex(labels[start:start + page_size])
+    st.caption(f"{start + 1}-{start + len(rows)} of {len(labels)} permits")
+
+    expanded = st.session_state.get(f"{key}_expanded")
+    with st.container(border=True, height=400):
+        for label, row in zip(rows.index, rows.itertuples(index=False)):
+            with st.container(border=True):
+                col1, col2, col3, col4 = st.columns([3, 1, 1, 1], vertical_alignment="center")
+                with col1:
+                    st.markdown(f"**{row.title}**  \n{row.location}")
+                with col2:
+                    st.markdown(f"**Request:** {row.request}")
+                with col3:
+                    st.markdown(row.status)
+                with col4:
+                    st.button(
+                        ":material/expand_less: Hide" if expanded == label else ":material/expand_more: Details",
+                        key=f"{key}_details_{label}",
+                        on_click=_toggle_details,
+                        args=(key, label),
+                        use_container_width=True,
+                    )
+                if expanded == label:
+                    col_info, col_file = st.columns([3, 1])
+                    with col_info:
+                        if isinstance(row.observation, str):
+                            st.markdown(f"**Observation:** {row.observation}")
+                        if isinstance(row.application, str):
+                            st.markdown(f"**Application:** {row.application}")
+                        if isinstance(row.issue, str):
+                            st.markdown(f"**Issue:** {row.issue}")
+                    with col_file:
+                        if isinstance(row.permit_file, str):
+                            st.link_button(":material/draft: See permit", row.permit_file, use_container_width=True)
+                        else:
+                            st.markdown("*No file*")
@@ -0,0 +1,83 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+class PreloadTimeout(Exception):
+    pass
+
+def run_parallel(tasks, on_progress=None, max_workers=8):
+    """
+    Executa tarefas de carga em paralelo, com timeout e isolamento de erros por tarefa.
+
+    Args:
+        tasks: dict {nome: (função sem argumentos, timeout em segundos)}
+        on_progress: callback(concluídas, total, nome, erro) chamado na thread do script
+        max_workers: número máximo de threads
+
+    Returns:
+        dict {nome: (resultado, erro)}; erro é None quando a tarefa terminou bem
+    """
+    results = {}
+    if not tasks:
+        return results
+    ctx = get_script_run_ctx()
+
+    def run(fn):
+        # Permite que st.cache_data/st.secrets funcionem dentro da thread
+        add_script_run_ctx(ctx=ctx)
+        return fn()
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), thread_name_prefix="preload")
+    started = time.monotonic()
+    pending = {}
+    for name, (fn, timeout) in tasks.items():
+        pending[executor.submit(run, fn)] = (name, started + timeout)
+
+    def finish(name, result, error):
+        results[name] = (result, error)
+        if error is not None:
+            logger.warning(f"Falha ao carregar '{name}': {error}")
+        if on_progress:
+            on_progress(len(results), len(tasks), name, error)
+
+    try:
+        while pending:
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(list(pending), timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = pending.pop(future)
+                error = future.exception()
+                finish(name, None if error else future.result(), error)
+            now = time.monotonic()
+            for future, (name, deadline) in list(pending.items()):
+                if deadline <= now:
+                    # A thread segue em segundo plano, mas a tela não espera mais por ela
+                    pending.pop(future)
+                    future.cancel()
+                    finish(name, None, PreloadTimeout(f"tempo limite excedido ({name})"))
+    finally:
+        executor.shutdown(wait=False)
+    return results
+
+# Pool compartilhado para pré-carga em segundo plano (abas ainda não abertas)
+_background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+def prefetch_in_background(tasks):
+    """
+    Dispara tarefas de carga sem esperar pelo resultado.
+
+    Útil para aquecer caches de processo (st.cache_data, AreaData) das telas que o
+    usuário ainda não abriu; erros apenas são registrados no log. As threads não
+    recebem o contexto do script, pois podem terminar depois do rerun atual.
+    """
+    def run(name, fn):
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f"Falha ao pré-carregar '{name}': {e}")
+
+    for name, (fn, _timeout) in tasks.items():
+        _background_executor.submit(run, name, fn)
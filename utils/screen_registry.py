@@ -0,0 +1,121 @@
+import time
+import pkgutil
+import logging
+import threading
+import pages
+from database.mongodb_utils import get_database
+
+logger = logging.getLogger(__name__)
+
+# Segurança para telas alteradas direto no banco (a versão cobre as alterações do app)
+SCREEN_REGISTRY_TTL = 60
+
+class Screen:
+    """Tela registrada: módulo pages.<id>, textos da collection 'screens', loader e role de admin"""
+
+    def __init__(self, id, title, description, loader=None, admin_role=None):
+        self.id = id
+        self.module = f"pages.{id}"
+        self.title = title
+        self.description = description
+        self.loader = loader
+        self.admin_role = admin_role
+
+    def is_admin(self, user_data):
+        return bool(self.admin_role) and self.admin_role in (user_data or {}).get("roles", [])
+
+class ScreenRegistry:
+    """
+    Registro das telas do app, montado uma vez por processo.
+
+    Junta os módulos existentes em pages/ (uma listagem do pacote, em vez de um
+    find_spec por tela a cada rerun), os títulos/descrições da collection
+    'screens', o loader de dados e a role de admin de cada tela. A montagem das
+    abas só consulta o registro em memória.
+
+    O registro é refeito após invalidate() (incrementa a versão) ou quando passa
+    de ttl segundos; nesse caso o registro atual continua sendo servido enquanto
+    o novo é montado em segundo plano.
+
+    Args:
+        loaders: {tela: função de carga dos dados}
+        admin_roles: {tela: role de administrador}
+        ttl: idade máxima do registro em segundos
+    """
+
+    def __init__(self, loaders=None, admin_roles=None, ttl=SCREEN_REGISTRY_TTL):
+        self.loaders = dict(loaders or {})
+        self.admin_roles = dict(admin_roles or {})
+        self.ttl = ttl
+        self.version = 0
+        self._screens = None
+        self._built_version = None
+        self._built_at = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _build(self):
+        modules = sorted(name for _, name, is_package in pkgutil.iter_modules(pages.__path__) if not is_package)
+        descriptions = {}
+        try:
+            for doc in get_database()['screens'].find({}, {"_id": 0, "title": 1, "description": 1}):
+                if doc.get('title'):
+                    descriptions[doc['title']] = doc.get('description', doc['title'])
+        except Exception as e:
+            if self._screens is not None:
+                raise
+            logger.warning(f"Erro ao carregar telas disponíveis do banco: {e}")
+        return {
+            name: Screen(
+                name,
+                title=descriptions.get(name, name),
+                description=descriptions.get(name, name),
+                loader=self.loaders.get(name),
+                admin_role=self.admin_roles.get(name),
+            )
+            for name in modules
+        }
+
+    def _rebuild(self, version):
+        try:
+            screens = self._build()
+        except Exception as e:
+            # Mantém o registro anterior; nova tentativa na próxima expiração
+            logger.warning(f"Não foi possível atualizar o registro de telas: {e}")
+            screens = None
+        with self._lock:
+            if screens is not None:
+                self._screens = screens
+                self._built_version = version
+            self._built_at = time.monotonic()
+            self._refreshing = False
+
+    def screens(self):
+        """{id: Screen} das telas existentes"""
+        with self._lock:
+            version = self.version
+            if self._screens is None:
+                first_build = True
+            else:
+                first_build = False
+                stale = self._built_version != version or time.monotonic() - self._built_at > self.ttl
+                if stale and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._rebuild, args=(version,), name="screen-registry", daemon=True).start()
+                return self._screens
+        if first_build:
+            self._rebuild(version)
+        return self._screens or {}
+
+    def get(self, screen_id):
+        return self.screens().get(screen_id)
+
+    def for_user(self, user_data):
+        """Telas do usuário (na ordem do cadastro) que existem em pages/"""
+        screens = self.screens()
+        return [screens[screen_id] for screen_id in (user_data or {}).get('screens', []) if screen_id in screens]
+
+    def invalidate(self):
+        """Incrementa a versão: a próxima consulta refaz o registro"""
+        with self._lock:
+            self.version += 1
@@ -0,0 +1,36 @@
+import uuid
+import streamlit as st
+from database.write_queue import write_queue, PENDING, DONE
+
+# Intervalo (segundos) em que o status das escritas da sessão é consultado
+STATUS_POLL_SECONDS = 2
+
+def session_owner():
+    """Identificador da sessão nas escritas do write_queue (mantido após o logout)"""
+    if '_write_owner' not in st.session_state:
+        st.session_state['_write_owner'] = uuid.uuid4().hex
+    return st.session_state['_write_owner']
+
+@st.fragment(run_every=STATUS_POLL_SECONDS)
+def _write_status(owner):
+    jobs = write_queue.jobs(owner)
+    failed = False
+    for job in jobs:
+        if job.status == PENDING or job.notified:
+            continue
+        job.notified = True
+        if job.status == DONE:
+            st.toast(f"Saved: {job.label}", icon=":material/check_circle:")
+        else:
+            failed = True
+            st.toast(f"Could not save {job.label}: {job.error}", icon=":material/error:")
+    pending = sum(1 for job in jobs if job.status == PENDING)
+    if pending:
+        st.caption(f":material/sync: Saving {pending} change(s)...")
+    if failed:
+        # A atualização otimista foi desfeita: redesenha a página com os dados do banco
+        st.rerun(scope="app")
+
+def show_write_status():
+    """Notificações (toast) e contador das escritas em segundo plano da sessão"""
+    _write_status(session_owner())